@@ -7,6 +7,7 @@ from . import tracking
 from . import graphics
 from . import lifetime
 from . import naff
+from . import ensemble
 
 import os as _os
 with open(_os.path.join(__path__[0], 'VERSION'), 'r') as _f:
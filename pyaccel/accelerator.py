@@ -1,5 +1,9 @@
 """Accelerator class."""
 
+import hashlib as _hashlib
+import io as _io
+import weakref as _weakref
+
 import numpy as _np
 
 import mathphys as _mp
@@ -19,49 +23,112 @@ class Accelerator(object):
 
     __isfrozen = False  # this is used to prevent creation of new attributes
 
+    # attributes exported by to_table. K, S and Ks are derived from the
+    # polynoms, as the properties of pyaccel.elements.Element:
+    TABLE_ATTRIBUTES = ('fam_name', 'pass_method') + \
+        tuple(_elements._SCALAR_ATTRS) + ('K', 'S', 'Ks')
+
+    # version of the columnar representation of _get_state_arrays:
+    _STATE_VERSION = 1
+
+    # whether pickled states are compressed:
+    COMPRESS_PICKLE = False
+
+    # mutation counter, incremented by _before_change:
+    _version = 0
+
+    # lazily built data, discarded whenever the lattice changes:
+    _fam_index = None
+    _pass_method_index = None
+    _spos = None
+    _segment_index = None
+    _segment_edges = None
+    _table = None
+    _fingerprint = None
+    _pickle_state = None
+
+    # copy-on-write views: while _view is (parent, indices) the lattice of
+    # _trackcpp_acc is empty and the elements are read from the parent.
+    _trackcpp_acc = None
+    _view = None
+    _views = None  # pending views of this object
+    _view_elements = None  # elements handed out by a pending view
+
     def __init__(self, **kwargs):
         """."""
         self.trackcpp_acc = self._init_accelerator(kwargs)
+        acc = kwargs.get('accelerator')
+        if isinstance(acc, Accelerator) and 'lattice' not in kwargs:
+            self._set_view(acc, _np.arange(len(acc)))
         self._init_lattice(kwargs)
 
         if 'energy' in kwargs:
-            self.trackcpp_acc.energy = kwargs['energy']
+            self._trackcpp_acc.energy = kwargs['energy']
         if 'harmonic_number' in kwargs:
-            self.trackcpp_acc.harmonic_number = kwargs['harmonic_number']
+            self._trackcpp_acc.harmonic_number = kwargs['harmonic_number']
         if 'radiation_on' in kwargs:
-            self.trackcpp_acc.radiation_on = kwargs['radiation_on']
+            self._trackcpp_acc.radiation_on = kwargs['radiation_on']
         if 'cavity_on' in kwargs:
-            self.trackcpp_acc.cavity_on = kwargs['cavity_on']
+            self._trackcpp_acc.cavity_on = kwargs['cavity_on']
         if 'vchamber_on' in kwargs:
-            self.trackcpp_acc.vchamber_on = kwargs['vchamber_on']
+            self._trackcpp_acc.vchamber_on = kwargs['vchamber_on']
 
-        if self.trackcpp_acc.energy == 0:
+        if self._trackcpp_acc.energy == 0:
             self._brho, self._velocity, self._beta, self._gamma, \
-                self.trackcpp_acc.energy = \
+                self._trackcpp_acc.energy = \
                 _mp.beam_optics.beam_rigidity(gamma=1.0)
         else:
             self._brho, self._velocity, self._beta, self._gamma, energy = \
                 _mp.beam_optics.beam_rigidity(energy=self.energy/1e9)
-            self.trackcpp_acc.energy = energy * 1e9
+            self._trackcpp_acc.energy = energy * 1e9
 
         self.__isfrozen = True
 
+    @property
+    def trackcpp_acc(self):
+        """Return the underlying trackcpp.Accelerator object.
+
+        Copies of lattices made with slices, lists or arrays of indices and
+        with Accelerator(accelerator=...) are copy-on-write views of the
+        original object, which are only materialized, that is, get their own
+        trackcpp lattice, when they or the original object are modified or
+        when this property is accessed. Elements taken from a view are bound
+        to the original object until the view is materialized, so changes
+        made directly to their trackcpp_e objects, bypassing the properties
+        of pyaccel.elements.Element, affect the original object.
+
+        """
+        if self._view is not None:
+            self._materialize()
+        return self._trackcpp_acc
+
+    @trackcpp_acc.setter
+    def trackcpp_acc(self, value):
+        """."""
+        # live views of this object must copy its elements first:
+        if self._trackcpp_acc is not None:
+            self._before_change()
+        self._trackcpp_acc = value
+
     @property
     def length(self):
         """Return lattice length [m]."""
-        return self.trackcpp_acc.get_length()
+        if self._view is not None:
+            return sum(ele.length for ele in self._get_cpp_elements())
+        return self._trackcpp_acc.get_length()
 
     @property
     def energy(self):
         """Return beam energy [eV]."""
-        return self.trackcpp_acc.energy
+        return self._trackcpp_acc.energy
 
     @energy.setter
     def energy(self, value):
         """."""
+        self._before_change(lattice=False)
         self._brho, self._velocity, self._beta, self._gamma, energy = \
             _mp.beam_optics.beam_rigidity(energy=value/1e9)
-        self.trackcpp_acc.energy = energy * 1e9
+        self._trackcpp_acc.energy = energy * 1e9
 
     @property
     def gamma_factor(self):
@@ -71,9 +138,10 @@ class Accelerator(object):
     @gamma_factor.setter
     def gamma_factor(self, value):
         """Set beam relativistic gamma factor."""
+        self._before_change(lattice=False)
         self._brho, self._velocity, self._beta, self._gamma, energy = \
             _mp.beam_optics.beam_rigidity(gamma=value)
-        self.trackcpp_acc.energy = energy * 1e9
+        self._trackcpp_acc.energy = energy * 1e9
 
     @property
     def beta_factor(self):
@@ -83,9 +151,10 @@ class Accelerator(object):
     @beta_factor.setter
     def beta_factor(self, value):
         """Set beam relativistic beta factor."""
+        self._before_change(lattice=False)
         self._brho, self._velocity, self._beta, self._gamma, energy = \
             _mp.beam_optics.beam_rigidity(beta=value)
-        self.trackcpp_acc.energy = energy * 1e9
+        self._trackcpp_acc.energy = energy * 1e9
 
     @property
     def velocity(self):
@@ -95,9 +164,10 @@ class Accelerator(object):
     @velocity.setter
     def velocity(self, value):
         """Set beam velocity [m/s]."""
+        self._before_change(lattice=False)
         self._brho, self._velocity, self._beta, self._gamma, energy = \
             _mp.beam_optics.beam_rigidity(velocity=value)
-        self.trackcpp_acc.energy = energy * 1e9
+        self._trackcpp_acc.energy = energy * 1e9
 
     @property
     def brho(self):
@@ -107,14 +177,15 @@ class Accelerator(object):
     @brho.setter
     def brho(self, value):
         """Set beam rigidity [T.m]"""
+        self._before_change(lattice=False)
         self._brho, self._velocity, self._beta, self._gamma, energy = \
             _mp.beam_optics.beam_rigidity(brho=value)
-        self.trackcpp_acc.energy = energy * 1e9
+        self._trackcpp_acc.energy = energy * 1e9
 
     @property
     def harmonic_number(self):
         """Return accelerator harmonic number."""
-        return self.trackcpp_acc.harmonic_number
+        return self._trackcpp_acc.harmonic_number
 
     @harmonic_number.setter
     def harmonic_number(self, value):
@@ -122,39 +193,232 @@ class Accelerator(object):
         if not isinstance(value, int) or value < 1:
             raise AcceleratorException(
                 'harmonic number has to be a positive integer')
-        self.trackcpp_acc.harmonic_number = value
+        self._before_change(lattice=False)
+        self._trackcpp_acc.harmonic_number = value
 
     @property
     def cavity_on(self):
         """Return cavity on state."""
-        return self.trackcpp_acc.cavity_on
+        return self._trackcpp_acc.cavity_on
 
     @cavity_on.setter
     def cavity_on(self, value):
         """Set cavity on state."""
-        if self.trackcpp_acc.harmonic_number < 1:
+        if self._trackcpp_acc.harmonic_number < 1:
             raise AcceleratorException('invalid harmonic number')
-        self.trackcpp_acc.cavity_on = value
+        self._before_change(lattice=False)
+        self._trackcpp_acc.cavity_on = value
 
     @property
     def radiation_on(self):
         """Return radiation on state."""
-        return self.trackcpp_acc.radiation_on
+        return self._trackcpp_acc.radiation_on
 
     @radiation_on.setter
     def radiation_on(self, value):
         """Set radiation on state."""
-        self.trackcpp_acc.radiation_on = value
+        self._before_change(lattice=False)
+        self._trackcpp_acc.radiation_on = value
 
     @property
     def vchamber_on(self):
         """Return vacuum chamber on state."""
-        return self.trackcpp_acc.vchamber_on
+        return self._trackcpp_acc.vchamber_on
 
     @vchamber_on.setter
     def vchamber_on(self, value):
         """Set vacuum chamber on state."""
-        self.trackcpp_acc.vchamber_on = value
+        self._before_change(lattice=False)
+        self._trackcpp_acc.vchamber_on = value
+
+    @property
+    def version(self):
+        """Return number of modifications of this object.
+
+        The counter is incremented by every change made through the methods
+        and properties of this object, of its elements and of the functions
+        of pyaccel.lattice, so it may be used as key of caches of quantities
+        derived from the model. Changes made directly to the trackcpp objects
+        are not tracked. The counter is local to this object: copies,
+        unpickled objects and objects in other processes have their own
+        counters. See `fingerprint`.
+
+        """
+        return self._version
+
+    @property
+    def fingerprint(self):
+        """Return hash of the content of the model.
+
+        SHA-1 hex digest of the flat file representation of the model, so
+        equal models have equal fingerprints, even in different processes.
+        The digest is computed once per `version`.
+
+        """
+        if self._fingerprint is None or \
+                self._fingerprint[0] != self._version:
+            stri = _trackcpp.String()
+            _trackcpp.write_flat_file_wrapper(stri, self.trackcpp_acc, False)
+            digest = _hashlib.sha1(stri.data.encode()).hexdigest()
+            self._fingerprint = (self._version, digest)
+        return self._fingerprint[1]
+
+    @property
+    def fam_index(self):
+        """Return dictionary mapping family names to element indices.
+
+        The dictionary is built on first access and discarded whenever the
+        lattice is modified through this object or its elements. Its values
+        are read-only numpy arrays of indices.
+
+        """
+        if self._fam_index is None:
+            self._build_indices()
+        return self._fam_index
+
+    @property
+    def pass_method_index(self):
+        """Return dictionary mapping pass methods to element indices.
+
+        See `fam_index`.
+
+        """
+        if self._pass_method_index is None:
+            self._build_indices()
+        return self._pass_method_index
+
+    @property
+    def spos(self):
+        """Return longitudinal position at the entrance of the elements.
+
+        The position at the end of the last element is also included. The
+        read-only array is built on first access and discarded whenever the
+        lattice is modified, like `fam_index`.
+
+        """
+        if self._spos is None:
+            lengths = self.to_table(('length', ))['length']
+            spos = _np.zeros(lengths.size + 1)
+            _np.cumsum(lengths, out=spos[1:])
+            spos.flags.writeable = False
+            self._spos = spos
+        return self._spos
+
+    @property
+    def segment_index(self):
+        """Return segment group of each element.
+
+        Segment groups are runs of consecutive elements of the same family,
+        such as the segments of a magnet split in the model, which are
+        treated as one unit by the error functions of pyaccel.lattice.
+        Distinct magnets of the same family with no element between them
+        fall in the same group. The read-only array is built on first access
+        and discarded whenever the lattice is modified, like `fam_index`.
+        See `segment_edges`.
+
+        """
+        if self._segment_index is None:
+            self._build_segment_index()
+        return self._segment_index
+
+    @property
+    def segment_edges(self):
+        """Return index of the first element of each segment group.
+
+        The number of elements is also included at the end, so the elements
+        of group g are range(segment_edges[g], segment_edges[g+1]). See
+        `segment_index`.
+
+        """
+        if self._segment_edges is None:
+            self._build_segment_index()
+        return self._segment_edges
+
+    def element_at(self, spos):
+        """Return elements at the given longitudinal positions.
+
+        Args:
+            spos (float, list, tuple, numpy.ndarray): longitudinal positions
+                [m]. Positions outside the lattice are clipped to its
+                extremities.
+
+        Returns:
+            numpy.ndarray: indices of the elements which contain the
+                positions. Zero length elements are never returned, unless
+                all elements of the lattice have zero length.
+            numpy.ndarray: fractional positions inside the elements, from 0
+                at their entrances to 1 at their ends.
+
+        """
+        pos = self.spos
+        if pos.size < 2:
+            raise AcceleratorException('lattice has no elements')
+        spos = _np.clip(_np.asarray(spos, dtype=float), 0.0, pos[-1])
+        indices = _np.searchsorted(pos, spos, side='right') - 1
+        indices = _np.minimum(indices, pos.size - 2)
+        # the last element with non-zero length ends the lattice:
+        last = _np.searchsorted(pos, pos[-1], side='left') - 1
+        indices = _np.minimum(indices, max(last, 0))
+        lengths = pos[indices+1] - pos[indices]
+        fractions = _np.zeros(spos.shape)
+        nonzero = lengths != 0
+        fractions[nonzero] = (spos - pos[indices])[nonzero] / lengths[nonzero]
+        return indices, fractions
+
+    def to_table(self, attributes=None):
+        """Return scalar attributes of all elements as numpy arrays.
+
+        The attributes are read element by element from the trackcpp
+        lattice, without creating pyaccel.elements.Element objects, and a
+        new table is built on every call. Functions of pyaccel.lattice
+        use columns of this table cached until the lattice changes.
+
+        Args:
+            attributes (list, tuple, optional): names of the attributes to
+                export, which must be in TABLE_ATTRIBUTES. Defaults to None,
+                meaning all of them.
+
+        Raises:
+            AcceleratorException: when an attribute is not supported.
+
+        Returns:
+            dict: attribute names as keys and 1D numpy arrays, with one
+                entry per element, as values.
+
+        """
+        if attributes is None:
+            attributes = self.TABLE_ATTRIBUTES
+        elif isinstance(attributes, str):
+            attributes = (attributes, )
+        for attr in attributes:
+            if attr not in self.TABLE_ATTRIBUTES:
+                raise AcceleratorException(
+                    "attribute '" + attr + "' not supported by to_table")
+
+        eles = self._get_cpp_elements()
+        table = dict()
+        for attr in attributes:
+            if attr == 'fam_name':
+                col = _np.array([ele.fam_name for ele in eles], dtype=str)
+            elif attr == 'pass_method':
+                pms = _elements.PASS_METHODS
+                col = _np.array(
+                    [pms[ele.pass_method] for ele in eles], dtype=str)
+            elif attr in ('K', 'S'):
+                idx = 1 if attr == 'K' else 2
+                col = _np.array([
+                    ele.polynom_b[idx] if len(ele.polynom_b) > idx else 0.0
+                    for ele in eles], dtype=float)
+            elif attr == 'Ks':
+                col = -_np.array([
+                    ele.polynom_a[1] if len(ele.polynom_a) > 1 else 0.0
+                    for ele in eles], dtype=float)
+            else:
+                col = _np.array(
+                    [getattr(ele, attr) for ele in eles],
+                    dtype=_elements._SCALAR_ATTRS[attr])
+            table[attr] = col
+        return table
 
     def pop(self, index):
         """."""
@@ -174,6 +438,7 @@ class Accelerator(object):
         """
         if not isinstance(element, _elements.Element):
             raise TypeError('value must be Element')
+        self._before_change()
         self.trackcpp_acc.lattice.append(element.trackcpp_e)
 
     def insert(self, index: int, element: _elements.Element):
@@ -196,6 +461,7 @@ class Accelerator(object):
         index = max(min(index, leng), -leng)
         if index < 0:
             index += leng
+        self._before_change()
         idx = self.trackcpp_acc.lattice.begin() + index
         self.trackcpp_acc.lattice.insert(idx, element.trackcpp_e)
 
@@ -203,24 +469,42 @@ class Accelerator(object):
         """."""
         if not isinstance(value, Accelerator):
             raise TypeError('value must be Accelerator')
-        if value is self:
-            value = Accelerator(accelerator=value)
-        for el in value:
-            self.append(el)
+        self._before_change()
+        lattice = self._trackcpp_acc.lattice
+        # reserve before taking references to the elements of value, which
+        # may live in this same lattice:
+        lattice.reserve(lattice.size() + len(value))
+        for ele in value._get_cpp_elements():
+            lattice.append(ele)
 
     # NOTE: make the class objects pickalable
     def __getstate__(self):
-        """."""
-        stri = _trackcpp.String()
-        _trackcpp.write_flat_file_wrapper(stri, self.trackcpp_acc, False)
-        return stri.data
+        """Return binary state, computed once per version of the object."""
+        key = (self._version, self.COMPRESS_PICKLE)
+        if self._pickle_state is None or self._pickle_state[0] != key:
+            arrs = self._get_state_arrays()
+            buf = _io.BytesIO()
+            if self.COMPRESS_PICKLE:
+                _np.savez_compressed(buf, **arrs)
+            else:
+                _np.savez(buf, **arrs)
+            self._pickle_state = (key, buf.getvalue())
+        return self._pickle_state[1]
 
-    def __setstate__(self, stridata):
+    def __setstate__(self, state):
         """."""
-        stri = _trackcpp.String(stridata)
-        acc = Accelerator()
-        _trackcpp.read_flat_file_wrapper(stri, acc.trackcpp_acc, False)
-        self.trackcpp_acc = acc.trackcpp_acc
+        if isinstance(state, str):
+            # flat file state of previous versions
+            stri = _trackcpp.String(state)
+            acc = Accelerator()
+            _trackcpp.read_flat_file_wrapper(stri, acc.trackcpp_acc, False)
+        else:
+            with _np.load(_io.BytesIO(state)) as data:
+                arrs = {key: data[key] for key in data.files}
+            acc = Accelerator._from_state_arrays(arrs)
+        self.__dict__.update(acc.__dict__)
+        self._brho, self._velocity, self._beta, self._gamma, _ = \
+            _mp.beam_optics.beam_rigidity(energy=self.energy/1e9)
 
     def __setattr__(self, key, value):
         """."""
@@ -233,6 +517,7 @@ class Accelerator(object):
         if isinstance(index, slice):
             start, stop, step = index.indices(len(self))
             index = set(range(start, stop, step))
+        self._before_change()
         if isinstance(index, (int, _np.int_)):
             self.trackcpp_acc.lattice.erase(
                 self.trackcpp_acc.lattice.begin() + int(index))
@@ -243,30 +528,23 @@ class Accelerator(object):
                     self.trackcpp_acc.lattice.begin() + int(i))
 
     def __getitem__(self, index):
-        """."""
+        """Return element or copy-on-write view of a part of the lattice."""
         if isinstance(index, (int, _np.int_)):
-            ele = _elements.Element()
-            ele.trackcpp_e = self.trackcpp_acc.lattice[int(index)]
-            return ele
+            return self._get_element(index)
         elif isinstance(index, (list, tuple, _np.ndarray)):
             try:
                 index = _np.array(index, dtype=int)
             except TypeError:
                 raise TypeError('invalid index')
-            lattice = _trackcpp.CppElementVector()
-            for i in index:
-                lattice.append(self.trackcpp_acc.lattice[int(i)])
-        elif isinstance(index, slice):
-            lattice = self.trackcpp_acc.lattice[index]
-        else:
+        elif not isinstance(index, slice):
             raise TypeError('invalid index')
         acc = Accelerator(
-            lattice=lattice,
-            energy=self.trackcpp_acc.energy,
-            harmonic_number=self.trackcpp_acc.harmonic_number,
-            cavity_on=self.trackcpp_acc.cavity_on,
-            radiation_on=self.trackcpp_acc.radiation_on,
-            vchamber_on=self.trackcpp_acc.vchamber_on)
+            energy=self._trackcpp_acc.energy,
+            harmonic_number=self._trackcpp_acc.harmonic_number,
+            cavity_on=self._trackcpp_acc.cavity_on,
+            radiation_on=self._trackcpp_acc.radiation_on,
+            vchamber_on=self._trackcpp_acc.vchamber_on)
+        acc._set_view(self, _np.arange(len(self))[index])
         return acc
 
     def __setitem__(self, index, value):
@@ -281,6 +559,7 @@ class Accelerator(object):
         else:
             raise TypeError('invalid index')
 
+        self._before_change()
         if isinstance(value, (list, tuple, _np.ndarray, Accelerator)):
             if not all([isinstance(v, _elements.Element) for v in value]):
                 raise TypeError('invalid value')
@@ -292,33 +571,33 @@ class Accelerator(object):
         else:
             raise TypeError('invalid value')
 
+    def __iter__(self):
+        """."""
+        for i in range(len(self)):
+            yield self._get_element(i)
+
     def __len__(self):
         """."""
-        return self.trackcpp_acc.lattice.size()
+        if self._view is not None:
+            return len(self._view[1])
+        return self._trackcpp_acc.lattice.size()
 
     def __str__(self):
         """."""
         rst = ''
-        rst += 'energy         : ' + str(self.trackcpp_acc.energy) + ' eV'
-        rst += '\nharmonic_number: ' + str(self.trackcpp_acc.harmonic_number)
-        rst += '\ncavity_on      : ' + str(self.trackcpp_acc.cavity_on)
-        rst += '\nradiation_on   : ' + str(self.trackcpp_acc.radiation_on)
-        rst += '\nvchamber_on    : ' + str(self.trackcpp_acc.vchamber_on)
-        rst += '\nlattice size   : ' + str(len(self.trackcpp_acc.lattice))
+        rst += 'energy         : ' + str(self._trackcpp_acc.energy) + ' eV'
+        rst += '\nharmonic_number: ' + str(self._trackcpp_acc.harmonic_number)
+        rst += '\ncavity_on      : ' + str(self._trackcpp_acc.cavity_on)
+        rst += '\nradiation_on   : ' + str(self._trackcpp_acc.radiation_on)
+        rst += '\nvchamber_on    : ' + str(self._trackcpp_acc.vchamber_on)
+        rst += '\nlattice size   : ' + str(len(self))
         rst += '\nlattice length : ' + str(self.length) + ' m'
         return rst
 
     def __add__(self, other):
         """."""
-        if isinstance(other, _elements.Element):
-            acc = self[:]
-            acc.append(other)
-            return acc
-        elif isinstance(other, Accelerator):
-            acc = self[:]
-            for elem in other:
-                acc.append(elem)
-            return acc
+        if isinstance(other, (_elements.Element, Accelerator)):
+            return self._concatenate(self, other)
         else:
             msg = "unsupported operand type(s) for +: '" + \
                     self.__class__.__name__ + "' and '" + \
@@ -328,9 +607,7 @@ class Accelerator(object):
     def __radd__(self, other):
         """."""
         if isinstance(other, _elements.Element):
-            acc = self[:]
-            acc.insert(0, other)
-            return acc
+            return self._concatenate(other, self)
         # if other is of type Accelerator, the __add__ method of other will
         # be called, so we don't need to treat this case here.
         else:
@@ -352,12 +629,7 @@ class Accelerator(object):
                     radiation_on=self.radiation_on,
                     vchamber_on=self.vchamber_on)
             else:
-                acc = self[:]
-                other -= 1
-                while other > 0:
-                    acc += self[:]
-                    other -= 1
-                return acc
+                return self._concatenate(*(int(other)*[self]))
         else:
             msg = "unsupported operand type(s) for +: '" + \
                     other.__class__.__name__ + "' and '" + \
@@ -376,14 +648,309 @@ class Accelerator(object):
 
     # --- private methods ---
 
+    def _before_change(self, lattice=True):
+        """Discard cached data. Must be called before the model changes.
+
+        Args:
+            lattice (bool, optional): whether the lattice will change, in
+                which case this object and its views are materialized.
+                Use False for changes of energy and flags. Defaults to True.
+
+        """
+        if lattice:
+            self._materialize()
+            for view in list((self._views or dict()).values()):
+                view._materialize()
+        self._version += 1
+        self._fam_index = None
+        self._pass_method_index = None
+        self._spos = None
+        self._segment_index = None
+        self._segment_edges = None
+        self._table = None
+
+    def _set_view(self, parent, indices):
+        if parent._view is not None:
+            parent, pindices = parent._view
+            indices = pindices[indices]
+        self._view = (parent, indices)
+        if parent._views is None:
+            parent._views = _weakref.WeakValueDictionary()
+        parent._views[id(self)] = self
+
+    def _materialize(self):
+        """Copy selected elements of the parent to this object's lattice."""
+        if self._view is None:
+            return
+        (parent, indices), self._view = self._view, None
+        parent._views.pop(id(self), None)
+        plattice = parent._trackcpp_acc.lattice
+        lattice = self._trackcpp_acc.lattice
+        lattice.reserve(len(indices))
+        for i in indices:
+            lattice.append(plattice[int(i)])
+
+        # rebind elements handed out while this object was a view:
+        eles, self._view_elements = self._view_elements, None
+        for ele in list((eles or dict()).values()):
+            ele.trackcpp_e = lattice[ele._idx]
+
+    def _get_element(self, index):
+        """Return Element bound to the trackcpp element at index."""
+        if self._view is None:
+            return _elements.Element._bind(
+                self._trackcpp_acc.lattice[int(index)], self)
+        parent, indices = self._view
+        idx = range(len(indices))[index]
+        ele = _elements.Element._bind(
+            parent._trackcpp_acc.lattice[int(indices[idx])], self, idx)
+        if self._view_elements is None:
+            self._view_elements = _weakref.WeakValueDictionary()
+        self._view_elements[id(ele)] = ele
+        return ele
+
+    def _concatenate(self, *operands):
+        """Return new Accelerator with the elements of the operands.
+
+        The operands are Accelerators or Elements and the parameters of the
+        result are the ones of this object. When all operands are
+        Accelerators sharing the same original object, the result is a
+        copy-on-write view of it. Otherwise its lattice is reserved once
+        and filled in a single pass.
+
+        """
+        roots, blocks = set(), []
+        for opr in operands:
+            if isinstance(opr, Accelerator):
+                root, indices = opr._view or (opr, _np.arange(len(opr)))
+                roots.add(id(root))
+                blocks.append(indices)
+            else:
+                roots.add(None)
+
+        acc = Accelerator(accelerator=self, lattice=[])
+        acc._trackcpp_acc.energy = self.energy
+        if len(roots) == 1 and None not in roots:
+            acc._set_view(root, _np.concatenate(blocks))
+            return acc
+
+        eles = []
+        for opr in operands:
+            if isinstance(opr, Accelerator):
+                eles.extend(opr._get_cpp_elements())
+            else:
+                eles.append(opr.trackcpp_e)
+        lattice = acc._trackcpp_acc.lattice
+        lattice.reserve(len(eles))
+        for ele in eles:
+            lattice.append(ele)
+        return acc
+
+    def _get_cpp_elements(self, indices=None):
+        """Return trackcpp elements without materializing views."""
+        if self._view is not None:
+            parent, pindices = self._view
+            lattice = parent._trackcpp_acc.lattice
+            if indices is not None:
+                pindices = pindices[_np.asarray(indices, dtype=int)]
+            return [lattice[int(i)] for i in pindices]
+        lattice = self._trackcpp_acc.lattice
+        if indices is None:
+            indices = range(lattice.size())
+        return [lattice[int(i)] for i in indices]
+
+    def _get_state_arrays(self):
+        """Return columnar representation of the model as numpy arrays.
+
+        Family names and kicktable file names are stored once, in tables
+        indexed by integer codes, and polynoms are stored concatenated,
+        along with their sizes.
+
+        """
+        eles = self._get_cpp_elements()
+        nr_eles = len(eles)
+        acc = self._trackcpp_acc
+        arrs = {
+            'state_version': _np.array(self._STATE_VERSION),
+            'energy': _np.array(acc.energy, dtype=float),
+            'harmonic_number': _np.array(acc.harmonic_number, dtype=int),
+            'cavity_on': _np.array(acc.cavity_on, dtype=bool),
+            'radiation_on': _np.array(acc.radiation_on, dtype=bool),
+            'vchamber_on': _np.array(acc.vchamber_on, dtype=bool),
+            }
+
+        fam_names = _np.array([ele.fam_name for ele in eles], dtype=str)
+        arrs['fam_names'], arrs['fam_codes'] = _np.unique(
+            fam_names, return_inverse=True)
+        arrs['pass_method'] = _np.array(
+            [ele.pass_method for ele in eles], dtype=int)
+        for attr, typ in _elements._SCALAR_ATTRS.items():
+            if attr != 'kicktable_idx':
+                arrs[attr] = _np.array(
+                    [getattr(ele, attr) for ele in eles], dtype=typ)
+
+        kick_idcs = _np.array(
+            [ele.kicktable_idx for ele in eles], dtype=int)
+        kick_idcs, arrs['kicktable_codes'] = _np.unique(
+            kick_idcs, return_inverse=True)
+        arrs['kicktable_codes'] -= int(kick_idcs.size and kick_idcs[0] == -1)
+        arrs['kicktable_files'] = _np.array([
+            _trackcpp.cvar.kicktable_list[int(idx)].filename
+            for idx in kick_idcs if idx != -1], dtype=str)
+
+        for attr in ('polynom_a', 'polynom_b'):
+            pols = [getattr(ele, attr) for ele in eles]
+            arrs[attr + '_sizes'] = _np.array(
+                [len(pol) for pol in pols], dtype=int)
+            arrs[attr] = _np.array(
+                [val for pol in pols for val in pol], dtype=float)
+
+        for attr in ('t_in', 't_out', 'r_in', 'r_out', 'matrix66'):
+            shape = (6, ) if attr.startswith('t_') else (6, 6)
+            arrs[attr] = _np.zeros((nr_eles, ) + shape)
+        getvec = _elements.Element._get_coord_vector
+        getmat = _elements.Element._get_coord_matrix
+        for i, ele in enumerate(eles):
+            arrs['t_in'][i] = getvec(ele.t_in)
+            arrs['t_out'][i] = getvec(ele.t_out)
+            arrs['r_in'][i] = getmat(ele.r_in)
+            arrs['r_out'][i] = getmat(ele.r_out)
+            arrs['matrix66'][i] = _elements.Element._bind(ele).matrix66
+        return arrs
+
+    @classmethod
+    def _from_state_arrays(cls, arrs):
+        """Build Accelerator from the output of _get_state_arrays.
+
+        Only one trackcpp element is built for each group of identical
+        elements. The lattice is filled with copies of these prototypes.
+
+        """
+        version = int(arrs['state_version'])
+        if version > cls._STATE_VERSION:
+            raise AcceleratorException(
+                'unsupported state version {0:d}'.format(version))
+        acc = cls(
+            energy=float(arrs['energy']),
+            harmonic_number=int(arrs['harmonic_number']),
+            cavity_on=bool(arrs['cavity_on']),
+            radiation_on=bool(arrs['radiation_on']),
+            vchamber_on=bool(arrs['vchamber_on']))
+        # avoid rounding errors of the conversions made in __init__:
+        acc._trackcpp_acc.energy = float(arrs['energy'])
+
+        # offsets of the concatenated polynoms:
+        pol_offs = {
+            attr: _np.r_[0, _np.cumsum(arrs[attr + '_sizes'])]
+            for attr in ('polynom_a', 'polynom_b')}
+
+        # find groups of identical elements:
+        nr_eles = arrs['fam_codes'].size
+        attrs = ['fam_codes', 'pass_method', 'kicktable_codes']
+        attrs += [at for at in _elements._SCALAR_ATTRS if at in arrs]
+        cols = [arrs[at].astype(float).reshape(nr_eles, 1) for at in attrs]
+        for attr in ('t_in', 't_out', 'r_in', 'r_out', 'matrix66'):
+            arr = arrs[attr]
+            cols.append(arr.reshape(nr_eles, _np.prod(arr.shape[1:])))
+        for attr, offs in pol_offs.items():
+            sizes = arrs[attr + '_sizes']
+            pols = _np.full((nr_eles, sizes.max(initial=0)), _np.nan)
+            mask = _np.arange(pols.shape[1]) < sizes[:, None]
+            pols[mask] = arrs[attr]
+            cols.extend((sizes.astype(float).reshape(nr_eles, 1), pols))
+        rows = _np.ascontiguousarray(_np.hstack(cols))
+        rows = rows.view(_np.dtype((_np.void, rows.strides[0])))
+        _, firsts, groups = _np.unique(
+            rows.ravel(), return_index=True, return_inverse=True)
+
+        kicktables = []
+        for fname in arrs['kicktable_files']:
+            idx = _trackcpp.add_kicktable(str(fname))
+            if idx == -1:
+                raise AcceleratorException(
+                    "kicktable file '" + str(fname) + "' not found")
+            kicktables.append(idx)
+
+        protos = []
+        for i in firsts:
+            fam_name = str(arrs['fam_names'][arrs['fam_codes'][i]])
+            ele = _elements.Element(fam_name=fam_name)
+            cpp = ele.trackcpp_e
+            cpp.pass_method = int(arrs['pass_method'][i])
+            for attr, typ in _elements._SCALAR_ATTRS.items():
+                if attr in arrs:
+                    setattr(cpp, attr, typ(arrs[attr][i]))
+            code = arrs['kicktable_codes'][i]
+            cpp.kicktable_idx = -1 if code < 0 else kicktables[code]
+            for attr, offs in pol_offs.items():
+                getattr(cpp, attr)[:] = \
+                    arrs[attr][offs[i]:offs[i+1]].tolist()
+            ele.t_in = arrs['t_in'][i]
+            ele.t_out = arrs['t_out'][i]
+            ele.r_in = arrs['r_in'][i]
+            ele.r_out = arrs['r_out'][i]
+            ele.matrix66 = arrs['matrix66'][i]
+            protos.append(cpp)
+
+        lattice = acc._trackcpp_acc.lattice
+        lattice.reserve(nr_eles)
+        for grp in groups.ravel():
+            lattice.append(protos[grp])
+        return acc
+
+    def _get_table(self, attributes):
+        """Return cached read-only columns of to_table.
+
+        Missing columns are read by a single call to to_table and kept until
+        the lattice changes, like `fam_index`.
+
+        """
+        if self._table is None:
+            self._table = dict()
+        missing = [attr for attr in attributes if attr not in self._table]
+        if missing:
+            for attr, col in self.to_table(missing).items():
+                col.flags.writeable = False
+                self._table[attr] = col
+        return {attr: self._table[attr] for attr in attributes}
+
+    def _build_indices(self):
+        fams, pass_methods = dict(), dict()
+        for i, ele in enumerate(self._get_cpp_elements()):
+            fams.setdefault(ele.fam_name, []).append(i)
+            pass_methods.setdefault(
+                _elements.PASS_METHODS[ele.pass_method], []).append(i)
+        self._fam_index = self._lists2arrays(fams)
+        self._pass_method_index = self._lists2arrays(pass_methods)
+
+    def _build_segment_index(self):
+        fam_names = self._get_table(('fam_name', ))['fam_name']
+        brk = fam_names[1:] != fam_names[:-1]
+        index = _np.zeros(fam_names.size, dtype=int)
+        _np.cumsum(brk, out=index[1:])
+        edges = _np.r_[0, _np.nonzero(brk)[0] + 1, fam_names.size]
+        if not fam_names.size:
+            edges = edges[1:]
+        index.flags.writeable = False
+        edges.flags.writeable = False
+        self._segment_index, self._segment_edges = index, edges
+
+    @staticmethod
+    def _lists2arrays(dic):
+        for key, val in dic.items():
+            val = _np.array(val, dtype=int)
+            val.flags.writeable = False
+            dic[key] = val
+        return dic
+
     def _init_accelerator(self, kwargs):
         if 'accelerator' in kwargs:
             acc = kwargs['accelerator']
             if isinstance(acc, _trackcpp.Accelerator):
                 trackcpp_acc = acc  # points to the same object in memory
             elif isinstance(acc, Accelerator):  # creates another object.
+                # NOTE: the lattice is copied on write. See __init__.
                 trackcpp_acc = _trackcpp.Accelerator()
-                trackcpp_acc.lattice = acc.trackcpp_acc.lattice[:]
                 trackcpp_acc.energy = acc.energy
                 trackcpp_acc.cavity_on = acc.cavity_on
                 trackcpp_acc.radiation_on = acc.radiation_on
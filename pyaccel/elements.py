@@ -7,7 +7,8 @@ import numpy as _numpy
 
 import trackcpp as _trackcpp
 
-from .utils import interactive as _interactive, Polynom as _Polynom
+from .utils import interactive as _interactive, Polynom as _Polynom, \
+    _get_ufunc_targets, _call_ufunc
 
 
 _DBL_MAX = _trackcpp.get_double_max()
@@ -18,6 +19,77 @@ _COORD_MATRIX = _ctypes.c_double*_DIMS[0]*_DIMS[1]
 
 PASS_METHODS = _trackcpp.pm_dict
 
+# Scalar attributes of trackcpp elements and their types:
+_SCALAR_ATTRS = {
+    'length': float, 'nr_steps': int, 'hkick': float, 'vkick': float,
+    'angle': float, 'angle_in': float, 'angle_out': float, 'gap': float,
+    'fint_in': float, 'fint_out': float, 'thin_KL': float, 'thin_SL': float,
+    'frequency': float, 'voltage': float, 'phase_lag': float,
+    'hmin': float, 'hmax': float, 'vmin': float, 'vmax': float,
+    'kicktable_idx': int,
+    }
+
+
+class _CoordArray(_numpy.ndarray):
+    """View of a trackcpp coordinate array that notifies item assignments."""
+
+    _on_change = None
+
+    def __array_finalize__(self, obj):
+        """."""
+        # only views of the trackcpp memory inherit the notification:
+        if isinstance(obj, _CoordArray) and self.base is not None and \
+                _numpy.may_share_memory(self, obj):
+            self._on_change = obj._on_change
+
+    def __setitem__(self, index, value):
+        """."""
+        if self._on_change is not None:
+            self._on_change()
+        super().__setitem__(index, value)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """."""
+        # in-place operations write to the memory before __setitem__:
+        for arr in _get_ufunc_targets(method, inputs, kwargs):
+            if isinstance(arr, _CoordArray) and \
+                    arr._on_change is not None:
+                arr._on_change()
+        return _call_ufunc(
+            _CoordArray, ufunc, method, inputs, kwargs)
+
+
+class _WriteBackArray(_numpy.ndarray):
+    """Copy of trackcpp data that writes item assignments back."""
+
+    _root = None  # array holding the whole copy, for views of it
+    _write = None  # function writing the copy back to trackcpp
+
+    def __array_finalize__(self, obj):
+        """."""
+        if isinstance(obj, _WriteBackArray) and self.base is not None and \
+                _numpy.may_share_memory(self, obj):
+            self._root = obj if obj._write is not None else obj._root
+
+    def __setitem__(self, index, value):
+        """."""
+        super().__setitem__(index, value)
+        self._write_back()
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """."""
+        targets = _get_ufunc_targets(method, inputs, kwargs)
+        result = _call_ufunc(_WriteBackArray, ufunc, method, inputs, kwargs)
+        for arr in targets:
+            if isinstance(arr, _WriteBackArray):
+                arr._write_back()
+        return result
+
+    def _write_back(self):
+        root = self if self._write is not None else self._root
+        if root is not None:
+            root._write(root.view(_numpy.ndarray))
+
 
 @_interactive
 def marker(fam_name):
@@ -27,7 +99,7 @@ def marker(fam_name):
     fam_name -- family name
     """
     ele = _trackcpp.marker_wrapper(fam_name)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -38,7 +110,7 @@ def bpm(fam_name):
     fam_name -- family name
     """
     ele = _trackcpp.bpm_wrapper(fam_name)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -50,7 +122,7 @@ def drift(fam_name, length):
     length -- [m]
     """
     ele = _trackcpp.drift_wrapper(fam_name, length)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -62,7 +134,7 @@ def matrix(fam_name, length):
     length -- [m]
     """
     ele = _trackcpp.matrix_wrapper(fam_name, length)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -75,7 +147,7 @@ def hcorrector(fam_name, length=0.0, hkick=0.0):
     hkick -- horizontal kick [rad]
     """
     ele = _trackcpp.hcorrector_wrapper(fam_name, length, hkick)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -88,7 +160,7 @@ def vcorrector(fam_name, length=0.0, vkick=0.0):
     vkick -- vertical kick [rad]
     """
     ele = _trackcpp.vcorrector_wrapper(fam_name, length, vkick)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -102,7 +174,7 @@ def corrector(fam_name, length=0.0, hkick=0.0, vkick=0.0):
     vkick -- vertical kick [rad]
     """
     ele = _trackcpp.corrector_wrapper(fam_name, length, hkick, vkick)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -128,7 +200,7 @@ def rbend(fam_name, length, angle, angle_in=0.0, angle_out=0.0,
     ele = _trackcpp.rbend_wrapper(
         fam_name, length, angle, angle_in, angle_out, gap, fint_in, fint_out,
         polynom_a, polynom_b, K, S)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -142,7 +214,7 @@ def quadrupole(fam_name, length, K, nr_steps=10):
     nr_steps -- number of steps (default 10)
     """
     ele = _trackcpp.quadrupole_wrapper(fam_name, length, K, nr_steps)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -156,7 +228,7 @@ def sextupole(fam_name, length, S, nr_steps=5):
     nr_steps -- number of steps (default 5)
     """
     e = _trackcpp.sextupole_wrapper(fam_name, length, S, nr_steps)
-    return Element(element=e)
+    return Element._bind(e)
 
 
 @_interactive
@@ -172,7 +244,7 @@ def rfcavity(fam_name, length, voltage, frequency, phase_lag=0.0):
     """
     ele = _trackcpp.rfcavity_wrapper(
         fam_name, length, frequency, voltage, phase_lag)
-    return Element(element=ele)
+    return Element._bind(ele)
 
 
 @_interactive
@@ -190,7 +262,7 @@ def kickmap(
     """
     e = _trackcpp.kickmap_wrapper(
         fam_name, kicktable_fname, nr_steps, rescale_length, rescale_kicks)
-    return Element(element=e)
+    return Element._bind(e)
 
 
 def _process_polynoms(polya, polyb):
@@ -312,6 +384,10 @@ class Kicktable:
 class Element:
     """."""
 
+    # _acc is the Accelerator whose lattice holds trackcpp_e, if any, and
+    # _idx the index of the element in it, set only for copy-on-write views.
+    __slots__ = ('trackcpp_e', '_acc', '_idx', '__weakref__')
+
     _t_valid_types = (list, _numpy.ndarray)
     _r_valid_types = (_numpy.ndarray, )
 
@@ -327,6 +403,17 @@ class Element:
             raise TypeError(
                 'element must be a trackcpp.Element or a Element object.')
         self.trackcpp_e = _trackcpp.Element(element)
+        self._acc = None
+        self._idx = None
+
+    @classmethod
+    def _bind(cls, trackcpp_e, acc=None, idx=None):
+        """Return element wrapping trackcpp_e, without copying it."""
+        ele = cls.__new__(cls)
+        ele.trackcpp_e = trackcpp_e
+        ele._acc = acc
+        ele._idx = idx
+        return ele
 
     @property
     def fam_name(self):
@@ -336,6 +423,7 @@ class Element:
     @fam_name.setter
     def fam_name(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.fam_name = value
 
     @property
@@ -346,6 +434,7 @@ class Element:
     @pass_method.setter
     def pass_method(self, value):
         """."""
+        self._before_change()
         if isinstance(value, str):
             if value not in PASS_METHODS:
                 raise ValueError("pass method '" + value + "' not found")
@@ -366,6 +455,7 @@ class Element:
     @length.setter
     def length(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.length = value
 
     @property
@@ -376,6 +466,7 @@ class Element:
     @nr_steps.setter
     def nr_steps(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.nr_steps = value
 
     @property
@@ -386,6 +477,7 @@ class Element:
     @hkick.setter
     def hkick(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.hkick = value
 
     @property
@@ -396,6 +488,7 @@ class Element:
     @vkick.setter
     def vkick(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.vkick = value
 
     @property
@@ -406,6 +499,7 @@ class Element:
     @angle.setter
     def angle(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.angle = value
 
     @property
@@ -416,6 +510,7 @@ class Element:
     @angle_in.setter
     def angle_in(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.angle_in = value
 
     @property
@@ -426,6 +521,7 @@ class Element:
     @angle_out.setter
     def angle_out(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.angle_out = value
 
     @property
@@ -436,6 +532,7 @@ class Element:
     @gap.setter
     def gap(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.gap = value
 
     @property
@@ -446,6 +543,7 @@ class Element:
     @fint_in.setter
     def fint_in(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.fint_in = value
 
     @property
@@ -456,6 +554,7 @@ class Element:
     @fint_out.setter
     def fint_out(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.fint_out = value
 
     @property
@@ -466,6 +565,7 @@ class Element:
     @thin_KL.setter
     def thin_KL(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.thin_KL = value
 
     @property
@@ -476,6 +576,7 @@ class Element:
     @thin_SL.setter
     def thin_SL(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.thin_SL = value
 
     @property
@@ -486,6 +587,7 @@ class Element:
     @frequency.setter
     def frequency(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.frequency = value
 
     @property
@@ -496,6 +598,7 @@ class Element:
     @voltage.setter
     def voltage(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.voltage = value
 
     @property
@@ -506,6 +609,7 @@ class Element:
     @phase_lag.setter
     def phase_lag(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.phase_lag = value
 
     @property
@@ -520,6 +624,7 @@ class Element:
     @kicktable.setter
     def kicktable(self, value):
         """."""
+        self._before_change()
         if not isinstance(value, Kicktable):
             raise TypeError('value must be of Kicktable type')
         self.trackcpp_e.kicktable = value._kicktable
@@ -532,6 +637,7 @@ class Element:
     @hmax.setter
     def hmax(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.hmax = value
 
     @property
@@ -542,6 +648,7 @@ class Element:
     @hmin.setter
     def hmin(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.hmin = value
 
     @property
@@ -552,6 +659,7 @@ class Element:
     @vmax.setter
     def vmax(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.vmax = value
 
     @property
@@ -562,6 +670,7 @@ class Element:
     @vmin.setter
     def vmin(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.vmin = value
 
     @property
@@ -572,6 +681,7 @@ class Element:
     @K.setter
     def K(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_b[1] = value
 
     @property
@@ -582,6 +692,7 @@ class Element:
     @KL.setter
     def KL(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_b[1] = value / self.trackcpp_e.length
 
     @property
@@ -592,6 +703,7 @@ class Element:
     @KxL.setter
     def KxL(self, value):
         """."""
+        self._before_change()
         lst = list(self.trackcpp_e.matrix66[1])
         lst[0] = -value
         self.trackcpp_e.matrix66[1] = tuple(lst)
@@ -604,6 +716,7 @@ class Element:
     @KyL.setter
     def KyL(self, value):
         """."""
+        self._before_change()
         lst = list(self.trackcpp_e.matrix66[3])
         lst[2] = -value
         self.trackcpp_e.matrix66[3] = tuple(lst)
@@ -616,6 +729,7 @@ class Element:
     @S.setter
     def S(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_b[2] = value
 
     @property
@@ -625,6 +739,7 @@ class Element:
 
     @SL.setter
     def SL(self, value):
+        self._before_change()
         self.trackcpp_e.polynom_b[2] = value / self.trackcpp_e.length
 
     @property
@@ -635,6 +750,7 @@ class Element:
     @Ks.setter
     def Ks(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_a[1] = -value
 
     @property
@@ -645,6 +761,7 @@ class Element:
     @KsL.setter
     def KsL(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_a[1] = -value / self.trackcpp_e.length
 
     @property
@@ -655,6 +772,7 @@ class Element:
     @KsxL.setter
     def KsxL(self, value):
         """."""
+        self._before_change()
         lst = list(self.trackcpp_e.matrix66[1])
         lst[2] = -value
         self.trackcpp_e.matrix66[1] = tuple(lst)
@@ -667,6 +785,7 @@ class Element:
     @KsyL.setter
     def KsyL(self, value):
         """."""
+        self._before_change()
         lst = list(self.trackcpp_e.matrix66[3])
         lst[0] = -value
         self.trackcpp_e.matrix66[3] = tuple(lst)
@@ -679,6 +798,7 @@ class Element:
     @hkick_polynom.setter
     def hkick_polynom(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_b[0] = - value / self.trackcpp_e.length
 
     @property
@@ -689,50 +809,51 @@ class Element:
     @vkick_polynom.setter
     def vkick_polynom(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_a[0] = value / self.trackcpp_e.length
 
     @property
     def polynom_a(self):
         """."""
-        return _Polynom(self.trackcpp_e.polynom_a)
+        return self._get_polynom('polynom_a')
 
     @polynom_a.setter
     def polynom_a(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_a[:] = value[:]
 
     @property
     def polynom_b(self):
         """."""
-        return _Polynom(self.trackcpp_e.polynom_b)
+        return self._get_polynom('polynom_b')
 
     @polynom_b.setter
     def polynom_b(self, value):
         """."""
+        self._before_change()
         self.trackcpp_e.polynom_b[:] = value[:]
 
     @property
     def matrix66(self):
-        """."""
-        return _numpy.array(self.trackcpp_e.matrix66)
+        """Return copy of matrix66 which writes item assignments back."""
+        return Element._get_write_back_copy(
+            _numpy.array(self.trackcpp_e.matrix66), self._set_matrix66)
 
     @matrix66.setter
     def matrix66(self, value):
         """."""
-        tups = []
-        for i in range(6):
-            tups.append(tuple(float(value[i][j]) for j in range(6)))
-        for i in range(6):
-            self.trackcpp_e.matrix66[i] = tups[i]
+        self._set_matrix66(value)
 
     @property
     def t_in(self):
         """."""
-        return Element._get_coord_vector(self.trackcpp_e.t_in)
+        return self._get_coord_array('t_in', Element._get_coord_vector)
 
     @t_in.setter
     def t_in(self, value):
         """."""
+        self._before_change()
         Element._check_type(value, Element._t_valid_types)
         Element._check_size(value, _NUM_COORDS)
         Element._set_c_array_from_vector(
@@ -741,11 +862,12 @@ class Element:
     @property
     def t_out(self):
         """."""
-        return Element._get_coord_vector(self.trackcpp_e.t_out)
+        return self._get_coord_array('t_out', Element._get_coord_vector)
 
     @t_out.setter
     def t_out(self, value):
         """."""
+        self._before_change()
         Element._check_type(value, Element._t_valid_types)
         Element._check_size(value, _NUM_COORDS)
         Element._set_c_array_from_vector(
@@ -754,11 +876,12 @@ class Element:
     @property
     def r_in(self):
         """."""
-        return Element._get_coord_matrix(self.trackcpp_e.r_in)
+        return self._get_coord_array('r_in', Element._get_coord_matrix)
 
     @r_in.setter
     def r_in(self, value):
         """."""
+        self._before_change()
         Element._check_type(value, Element._r_valid_types)
         Element._check_shape(value, _DIMS)
         Element._set_c_array_from_matrix(self.trackcpp_e.r_in, _DIMS, value)
@@ -766,11 +889,12 @@ class Element:
     @property
     def r_out(self):
         """."""
-        return Element._get_coord_matrix(self.trackcpp_e.r_out)
+        return self._get_coord_array('r_out', Element._get_coord_matrix)
 
     @r_out.setter
     def r_out(self, value):
         """."""
+        self._before_change()
         Element._check_type(value, Element._r_valid_types)
         Element._check_shape(value, _DIMS)
         Element._set_c_array_from_matrix(self.trackcpp_e.r_out, _DIMS, value)
@@ -861,23 +985,71 @@ class Element:
 
     # --- private methods ---
 
+    def _before_change(self):
+        """Notify the accelerator holding this element of a change."""
+        if self._acc is not None:
+            self._acc._before_change()
+
+    def _set_matrix66(self, value):
+        self._before_change()
+        tups = []
+        for i in range(6):
+            tups.append(tuple(float(value[i][j]) for j in range(6)))
+        for i in range(6):
+            self.trackcpp_e.matrix66[i] = tups[i]
+
+    def _get_polynom(self, name):
+        """Return copy of polynom which writes item assignments back."""
+        polynom = _Polynom(getattr(self.trackcpp_e, name))
+
+        def on_change():
+            self._before_change()
+            # trackcpp_e is rebound when a copy-on-write view materializes:
+            polynom._polynom = getattr(self.trackcpp_e, name)
+
+        polynom._on_change = on_change
+        return polynom
+
+    def _get_coord_array(self, name, get_array):
+        """Return coordinate array which notifies or writes back changes.
+
+        Elements of copy-on-write views get a copy, since a view of the
+        memory of trackcpp_e could not be rebound when the view is
+        materialized by a change.
+
+        """
+        array = get_array(getattr(self.trackcpp_e, name))
+        if self._acc is not None and self._acc._view is not None:
+            return Element._get_write_back_copy(
+                array.copy(), lambda value: setattr(self, name, value))
+        return self._get_notifying_view(array)
+
+    def _get_notifying_view(self, array):
+        """Return view of array which calls _before_change on assignments."""
+        array = array.view(_CoordArray)
+        array._on_change = self._before_change
+        return array
+
+    @staticmethod
+    def _get_write_back_copy(array, write):
+        """Return array which calls write with its data on assignments."""
+        array = array.view(_WriteBackArray)
+        array._write = write
+        return array
+
     @staticmethod
     def _set_c_array_from_vector(array, size, values):
         """."""
         if not size == len(values):
             raise ValueError("array and vector must have same size")
-        for i in range(size):
-            _trackcpp.c_array_set(array, i, values[i])
+        Element._get_coord_vector(array)[:] = values
 
     @staticmethod
     def _set_c_array_from_matrix(array, shape, values):
         """."""
         if not shape == values.shape:
             raise ValueError("array and matrix must have same shape")
-        rows, cols = shape
-        for i in range(rows):
-            for j in range(cols):
-                _trackcpp.c_array_set(array, i*cols + j, values[i, j])
+        Element._get_coord_matrix(array)[:, :] = values
 
     @staticmethod
     def _check_type(value, types):
@@ -0,0 +1,355 @@
+"""Ensembles of random errors and their parallel evaluation."""
+
+import multiprocessing as _multiproc
+import traceback as _traceback
+import warnings as _warnings
+
+import numpy as _np
+
+import mathphys as _mp
+
+from . import lattice as _lattice
+from .accelerator import Accelerator as _Accelerator
+from .utils import interactive as _interactive
+
+
+class EnsembleException(Exception):
+    """."""
+
+
+# data of the ensemble evaluated by the processes of a pool:
+_WORKER_DATA = dict()
+
+
+@_interactive
+class ErrorEnsemble:
+    """Random error seeds of an accelerator model.
+
+    The errors of all seeds are drawn at once, as arrays, when they are
+    added to the ensemble. Each seed is built on demand, as a copy of the
+    nominal model with its errors applied through the functions of
+    pyaccel.lattice, and can be evaluated by a user given function in a
+    pool of processes. The random numbers are generated by
+    mathphys.functions.generate_random_numbers, so numpy.random.seed can be
+    used to reproduce an ensemble.
+
+    Examples:
+        >>> def pipeline(acc):
+        ...     twi, *_ = pyaccel.optics.calc_twiss(acc)
+        ...     return {'betax': twi.betax, 'cod': twi.rx}
+        >>> ens = ErrorEnsemble(accelerator, nr_seeds=100)
+        >>> quads = lattice.find_indices(accelerator, 'fam_name', 'QF')
+        >>> ens.add_errors('misalignment_x', quads, 40e-6)
+        >>> ens.add_errors('excitation_main', quads, 5e-4)
+        >>> with ens:  # keeps a pool of processes open
+        ...     res, failed = ens.evaluate(pipeline)
+        >>> res['betax'].shape  # (nr_seeds, len(accelerator))
+
+    """
+
+    # functions of pyaccel.lattice used to apply each type of error:
+    ERROR_TYPES = {
+        'misalignment_x': _lattice.add_error_misalignment_x,
+        'misalignment_y': _lattice.add_error_misalignment_y,
+        'rotation_roll': _lattice.add_error_rotation_roll,
+        'rotation_pitch': _lattice.add_error_rotation_pitch,
+        'rotation_yaw': _lattice.add_error_rotation_yaw,
+        'excitation_main': _lattice.add_error_excitation_main,
+        'excitation_kdip': _lattice.add_error_excitation_kdip,
+        }
+
+    def __init__(self, accelerator, nr_seeds):
+        """Create an ensemble without errors.
+
+        Args:
+            accelerator (pyaccel.accelerator.Accelerator): nominal model.
+            nr_seeds (int): number of random seeds.
+
+        """
+        self._accelerator = _Accelerator(accelerator=accelerator)
+        self._nr_seeds = int(nr_seeds)
+        self._errors = []
+        self._pool = None
+
+    def __getstate__(self):
+        """."""
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def __enter__(self):
+        """."""
+        self.open_pool()
+        return self
+
+    def __exit__(self, *args):
+        """."""
+        self.close_pool()
+
+    @property
+    def accelerator(self):
+        """Nominal accelerator model."""
+        return self._accelerator
+
+    @property
+    def nr_seeds(self):
+        """Number of random seeds."""
+        return self._nr_seeds
+
+    @property
+    def errors(self):
+        """List of errors as (error_type, groups of indices, values)."""
+        return list(self._errors)
+
+    def add_errors(self, error_type, indices, sigma, cutoff=3, mean=0.0):
+        """Draw random errors of one type for all seeds.
+
+        Args:
+            error_type (str): one of the keys of ERROR_TYPES.
+            indices (list, tuple, numpy.ndarray): indices of the elements,
+                or nested list of indices of the segments of each element,
+                as in the error functions of pyaccel.lattice.
+            sigma (float, list, tuple, numpy.ndarray): standard deviation
+                of the errors, for all elements or for each one of them.
+            cutoff (float, optional): cutoff of the normal distribution,
+                in units of sigma. Defaults to 3.
+            mean (float, list, tuple, numpy.ndarray): systematic errors.
+                Defaults to 0.0.
+
+        Raises:
+            EnsembleException: when the error type is not supported or the
+                pool of processes is open.
+
+        Returns:
+            numpy.ndarray: (nr_seeds, len(indices)) drawn errors.
+
+        """
+        if error_type not in self.ERROR_TYPES:
+            raise EnsembleException(
+                "error type '" + error_type + "' not supported")
+        self._check_pool_closed()
+        groups = self._process_indices(indices)
+        values = self._draw((len(groups), ), cutoff)
+        values *= _np.asarray(sigma, dtype=float)
+        values += _np.asarray(mean, dtype=float)
+        self._errors.append((error_type, groups, values))
+        return values.copy()
+
+    def add_multipole_errors(
+            self, indices, r0, main_monom, Bn_sigma=None, An_sigma=None,
+            Bn_syst=None, An_syst=None, cutoff=3):
+        """Draw random multipole errors for all seeds.
+
+        The errors are applied by pyaccel.lattice.add_error_multipoles, with
+        normalized polynoms given by Bn_syst + Bn_sigma * random numbers.
+
+        Args:
+            indices (list, tuple, numpy.ndarray): indices of the elements,
+                or nested list of indices of the segments of each element.
+            r0 (float): radius where the multipoles are normalized [m].
+            main_monom (int, list, tuple, numpy.ndarray): order of the main
+                field component of each element. See add_error_multipoles.
+            Bn_sigma (list, tuple, numpy.ndarray, optional): standard
+                deviation of the normal multipoles. Defaults to None.
+            An_sigma (list, tuple, numpy.ndarray, optional): standard
+                deviation of the skew multipoles. Defaults to None.
+            Bn_syst (list, tuple, numpy.ndarray, optional): systematic
+                normal multipoles. Defaults to None.
+            An_syst (list, tuple, numpy.ndarray, optional): systematic
+                skew multipoles. Defaults to None.
+            cutoff (float, optional): cutoff of the normal distribution,
+                in units of sigma. Defaults to 3.
+
+        Raises:
+            EnsembleException: when the pool of processes is open.
+
+        """
+        self._check_pool_closed()
+        groups = self._process_indices(indices)
+        nr_groups = len(groups)
+        main_monom = _np.broadcast_to(
+            _np.asarray(main_monom, dtype=int), (nr_groups, )).copy()
+
+        polynoms = []
+        for sigma, syst in ((Bn_sigma, Bn_syst), (An_sigma, An_syst)):
+            if sigma is None and syst is None:
+                polynoms.append(None)
+                continue
+            sigma = _np.array([] if sigma is None else sigma, dtype=float)
+            syst = _np.array([] if syst is None else syst, dtype=float)
+            size = max(sigma.size, syst.size)
+            pols = self._draw((nr_groups, size), cutoff)
+            pols *= _np.pad(sigma, (0, size - sigma.size))
+            pols += _np.pad(syst, (0, size - syst.size))
+            polynoms.append(pols)
+        values = (r0, main_monom) + tuple(polynoms)
+        self._errors.append(('multipoles', groups, values))
+
+    def get_seed(self, seed):
+        """Return copy of the nominal model with the errors of a seed.
+
+        Args:
+            seed (int): index of the seed.
+
+        Returns:
+            pyaccel.accelerator.Accelerator: model with errors.
+
+        """
+        acc = self._accelerator[:]
+        for error_type, groups, values in self._errors:
+            if error_type == 'multipoles':
+                r0, main_monom, bn_norm, an_norm = values
+                _lattice.add_error_multipoles(
+                    acc, groups, r0, main_monom,
+                    Bn_norm=None if bn_norm is None else bn_norm[seed],
+                    An_norm=None if an_norm is None else an_norm[seed])
+            else:
+                self.ERROR_TYPES[error_type](acc, groups, values[seed])
+        return acc
+
+    def open_pool(self, nr_procs=None):
+        """Open a pool of processes which is kept for several evaluations.
+
+        The ensemble is sent once to each process, so errors can not be
+        added while the pool is open.
+
+        Args:
+            nr_procs (int, optional): number of processes. Defaults to None,
+                meaning it is determined automatically.
+
+        """
+        if self._pool is not None:
+            return
+        self._pool = _multiproc.Pool(
+            processes=self._get_nr_procs(nr_procs),
+            initializer=_init_worker, initargs=(self, ))
+
+    def close_pool(self):
+        """Close the pool of processes."""
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def evaluate(self, function, seeds=None, nr_procs=None):
+        """Evaluate a function for the models of many seeds.
+
+        Args:
+            function (callable): function which takes an Accelerator and
+                returns a number, an array or a dictionary of them. To be
+                evaluated in parallel it must be picklable, that is, defined
+                at the top level of a module.
+            seeds (list, tuple, numpy.ndarray, optional): indices of the
+                seeds. Defaults to None, meaning all seeds.
+            nr_procs (int, optional): number of processes, in case no pool
+                is open. If 1, the evaluation is serial. Defaults to None,
+                meaning it is determined automatically.
+
+        Returns:
+            numpy.ndarray or dict: results of each seed stacked along the
+                first dimension of numpy arrays. If the function returns
+                dictionaries, a dictionary of stacked arrays is returned.
+                Results of failed seeds are filled with NaN.
+            numpy.ndarray: boolean array flagging seeds where the function
+                raised an exception. A warning with the seed and the
+                traceback of the exception is issued for each of them.
+
+        """
+        if seeds is None:
+            seeds = _np.arange(self._nr_seeds)
+        seeds = _np.array(seeds, dtype=int, ndmin=1)
+        args = [(function, int(seed)) for seed in seeds]
+
+        if self._pool is not None:
+            outs = self._pool.map(_evaluate_seed, args)
+        elif self._get_nr_procs(nr_procs) == 1:
+            outs = [_evaluate_seed(arg, self) for arg in args]
+        else:
+            self.open_pool(nr_procs)
+            try:
+                outs = self._pool.map(_evaluate_seed, args)
+            finally:
+                self.close_pool()
+
+        failed = _np.array([out[0] for out in outs], dtype=bool)
+        values = [out[1] for out in outs]
+        for seed, fail, val in zip(seeds, failed, values):
+            if fail:
+                _warnings.warn(
+                    'evaluation of seed {0:d} failed:\n{1:s}'.format(
+                        seed, val))
+        ref = next((val for val, fail in zip(values, failed) if not fail), 0.0)
+        if isinstance(ref, dict):
+            results = {
+                key: _stack_results(
+                    [None if fail else val[key]
+                     for val, fail in zip(values, failed)])
+                for key in ref}
+        else:
+            results = _stack_results(
+                [None if fail else val for val, fail in zip(values, failed)])
+        return results, failed
+
+    # --- private methods ---
+
+    def _draw(self, shape, cutoff):
+        shape = (self._nr_seeds, ) + tuple(shape)
+        nums = _mp.functions.generate_random_numbers(
+            int(_np.prod(shape)), dist_type='norm', cutoff=cutoff)
+        return nums.reshape(shape)
+
+    def _check_pool_closed(self):
+        if self._pool is not None:
+            raise EnsembleException(
+                'errors can not be added while the pool is open')
+
+    @staticmethod
+    def _process_indices(indices):
+        if isinstance(indices, (int, _np.integer)):
+            return [[int(indices)]]
+        groups = []
+        for idx in indices:
+            if isinstance(idx, (int, _np.integer)):
+                groups.append([int(idx)])
+            else:
+                groups.append([int(i) for i in idx])
+        return groups
+
+    @staticmethod
+    def _get_nr_procs(nr_procs):
+        if nr_procs is None:
+            nr_procs = _multiproc.cpu_count() - 3
+        return max(int(nr_procs), 1)
+
+
+def _init_worker(ensemble):
+    _WORKER_DATA['ensemble'] = ensemble
+
+
+def _evaluate_seed(args, ensemble=None):
+    """Return whether the evaluation failed and its result or traceback."""
+    function, seed = args
+    if ensemble is None:
+        ensemble = _WORKER_DATA['ensemble']
+    try:
+        return False, function(ensemble.get_seed(seed))
+    except Exception:
+        return True, _traceback.format_exc()
+
+
+def _stack_results(values):
+    ref = next((val for val in values if val is not None), None)
+    if ref is None:
+        return _np.full(len(values), _np.nan)
+    ref = _np.asarray(ref)
+    if ref.dtype.kind in 'biufc':
+        dtype = _np.result_type(ref.dtype, float)
+        fill = _np.nan
+    else:
+        dtype, fill = object, None
+    res = _np.full((len(values), ) + ref.shape, fill, dtype=dtype)
+    for i, val in enumerate(values):
+        if val is not None:
+            res[i] = val
+    return res
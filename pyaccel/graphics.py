@@ -1,11 +1,13 @@
 """."""
 
+import numpy as _np
 import matplotlib.pyplot as _plt
 import matplotlib.lines as _lines
 import matplotlib.collections as _collections
 import matplotlib.patches as _patches
 
 from .utils import interactive as _interactive
+from .accelerator import Accelerator as _Accelerator
 from .lattice import find_spos as _find_spos
 from .lattice import get_attribute as _get_attribute
 from .optics import calc_twiss as _calc_twiss
@@ -51,14 +53,14 @@ def plot_twiss(accelerator, twiss=None, plot_eta=True, add_lattice=True,
 
     if symmetry is not None:
         max_length = accelerator.length/symmetry
-        for idx, _ in enumerate(accelerator):
-            if spos[idx] >= max_length:
-                accelerator = accelerator[:idx]
-                spos = spos[:idx+1]
-                betax = betax[:idx+1]
-                betay = betay[:idx+1]
-                etax = etax[:idx+1]
-                break
+        beyond = _np.nonzero(spos[:len(accelerator)] >= max_length)[0]
+        if beyond.size:
+            idx = beyond[0]
+            accelerator = accelerator[:idx]
+            spos = spos[:idx+1]
+            betax = betax[:idx+1]
+            betay = betay[:idx+1]
+            etax = etax[:idx+1]
 
     is_interactive = _plt.isinteractive()
     _plt.interactive = False
@@ -144,23 +146,9 @@ def plot_vchamber(accelerator, add_lattice=True,
         xmin, xmax = xmin - 0.05 * difx, xmax + 0.05 * difx
         ymin, ymax = ymin - 0.05 * dify, ymax + 0.05 * dify
 
-        upper = []
-        for i in range(len(spos)-1):
-            x1_, y1_ = spos[i], umax[i]
-            x2_, y2_ = spos[i+1], umax[i]
-            upper.append([(x1_, y1_), (x2_, y2_)])
-            x1_, y1_ = spos[i+1], umax[i]
-            x2_, y2_ = spos[i+1], umax[i+1]
-            upper.append([(x1_, y1_), (x2_, y2_)])
+        upper = _get_step_segments(spos, umax)
         center = [[(xmin, 0), (xmax, 0)], ]
-        lower = []
-        for i in range(len(spos)-1):
-            x1_, y1_ = spos[i], umin[i]
-            x2_, y2_ = spos[i+1], umin[i]
-            lower.append([(x1_, y1_), (x2_, y2_)])
-            x1_, y1_ = spos[i+1], umin[i]
-            x2_, y2_ = spos[i+1], umin[i+1]
-            lower.append([(x1_, y1_), (x2_, y2_)])
+        lower = _get_step_segments(spos, umin)
 
         fig, axis = _plt.subplots()
         _ = fig
@@ -293,12 +281,10 @@ def draw_lattice(lattice, offset=None, height=1.0, draw_edges=False,
 
     if symmetry is not None:
         max_length = lattice.length/symmetry
-        spos = 0
-        for i, ele in enumerate(lattice):
-            spos += ele.length
-            if spos >= max_length:
-                lattice = lattice[:i]
-                break
+        ends = _np.cumsum(_get_table(lattice, ('length', ))['length'])
+        beyond = _np.nonzero(ends >= max_length)[0]
+        if beyond.size:
+            lattice = lattice[:beyond[0]]
 
     line = _lines.Line2D(
         [0, lattice.length], [offset, offset],
@@ -366,11 +352,15 @@ class _LatticeDrawer(object):
             self.patch_labels = []
 
         pos = _find_spos(lattice)
+        table = _get_table(
+            lattice, ('fam_name', 'pass_method', 'angle', 'K', 'S', 'length'))
+        lengths = table['length']
 
         if family_data is None:
             # Guess element type
-            for i in range(len(lattice)):
-                self._create_element_patch(lattice[i], pos[i])
+            types = self._guess_element_types(table)
+            for i in _np.nonzero(~_np.isin(types, ('marker', 'drift')))[0]:
+                self._create_element_patch(lengths[i], pos[i], types[i])
         else:
             # family_data is not None; we need a family_mapping to proceed
             if family_mapping is None:
@@ -398,7 +388,7 @@ class _LatticeDrawer(object):
                 for i in indices:
                     if i > len(lattice):
                         break
-                    self._create_element_patch(lattice[i], pos[i], et)
+                    self._create_element_patch(lengths[i], pos[i], et)
 
         edgec = 'black'
         self.patch_collections = {
@@ -459,125 +449,140 @@ class _LatticeDrawer(object):
                 zorder=2),
             }
 
-    def _create_element_patch(self, element, pos, element_type=None):
-        if element_type is None:
-            element_type = self._guess_element_type(element)
-
+    def _create_element_patch(self, length, pos, element_type):
         if element_type in ('marker', 'drift'):
             pass
         elif element_type == 'pulsed_magnet':
-            r = self._get_septum_core(element, pos)
+            r = self._get_septum_core(length, pos)
             self._septum_patches.append(r)
         elif element_type == 'dipole':
-            r = self._get_magnet_core(element, pos)
+            r = self._get_magnet_core(length, pos)
             self._dipole_patches.append(r)
         elif element_type == 'quadrupole':
-            r = self._get_magnet_core(element, pos)
+            r = self._get_magnet_core(length, pos)
             self._quadrupole_patches.append(r)
         elif element_type == 'sextupole':
-            r = self._get_magnet_core(element, pos)
+            r = self._get_magnet_core(length, pos)
             self._sextupole_patches.append(r)
         elif element_type == 'fast_horizontal_corrector':
-            r1 = self._get_corrector_core(element, pos)
+            r1 = self._get_corrector_core(length, pos)
             self._fast_corrector_core_patches.append(r1)
-            r2 = self._get_fast_horizontal_corrector_coil(element, pos)
+            r2 = self._get_fast_horizontal_corrector_coil(length, pos)
             self._fast_corrector_coil_patches.append(r2)
         elif element_type == 'fast_vertical_corrector':
-            r1 = self._get_corrector_core(element, pos)
+            r1 = self._get_corrector_core(length, pos)
             self._fast_corrector_core_patches.append(r1)
-            r2 = self._get_fast_vertical_corrector_coil(element, pos)
+            r2 = self._get_fast_vertical_corrector_coil(length, pos)
             self._fast_corrector_coil_patches.append(r2)
         elif element_type == 'fast_corrector':
-            r1 = self._get_corrector_core(element, pos)
+            r1 = self._get_corrector_core(length, pos)
             self._fast_corrector_core_patches.append(r1)
-            r2 = self._get_fast_horizontal_corrector_coil(element, pos)
-            r3 = self._get_fast_vertical_corrector_coil(element, pos)
+            r2 = self._get_fast_horizontal_corrector_coil(length, pos)
+            r3 = self._get_fast_vertical_corrector_coil(length, pos)
             self._fast_corrector_coil_patches.extend([r2, r3])
         elif element_type in ('slow_horizontal_corrector',
                               'horizontal_corrector'):
-            r = self._get_slow_horizontal_corrector_coil(element, pos)
+            r = self._get_slow_horizontal_corrector_coil(length, pos)
             self._slow_corrector_coil_patches.append(r)
         elif element_type in ('slow_vertical_corrector', 'vertical_corrector'):
-            r = self._get_slow_vertical_corrector_coil(element, pos)
+            r = self._get_slow_vertical_corrector_coil(length, pos)
             self._slow_corrector_coil_patches.append(r)
         elif element_type == 'skew_quadrupole':
-            r = self._get_skew_quadrupole(element, pos)
+            r = self._get_skew_quadrupole(length, pos)
             self._skew_quadrupole_coil_patches.append(r)
         elif element_type == 'bpm':
-            r = self._get_bpm(element, pos)
+            r = self._get_bpm(length, pos)
             self._bpm_patches.append(r)
         else:
             pass
 
-    def _guess_element_type(self, element):
-        if element.fam_name in ('bpm', 'BPM'):
-            return 'bpm'
-        elif element.pass_method == 'identity_pass':
-            return 'marker'
-        elif element.pass_method == 'drift_pass':
-            return 'drift'
-        elif element.fam_name in ('EjeSF', 'EjeSG', 'InjSF', 'InjSG'):
-            return 'pulsed_magnet'
-        elif element.angle != 0:
-            return 'dipole'
-        elif element.polynom_b[1] != 0:
-            return 'quadrupole'
-        elif element.polynom_b[2] != 0:
-            return 'sextupole'
-        elif element.fam_name in ('CH', 'horizontal_corrector'):
-            return 'slow_horizontal_corrector'
-        elif element.fam_name in ('CV', 'vertical_corrector'):
-            return 'slow_vertical_corrector'
-        else:
-            return 'unknown'
-
-    def _get_magnet_core(self, element, pos):
+    @staticmethod
+    def _guess_element_types(table):
+        fam_name, pass_method = table['fam_name'], table['pass_method']
+        # the first matching condition determines the type:
+        types = (
+            ('bpm', _np.isin(fam_name, ('bpm', 'BPM'))),
+            ('marker', pass_method == 'identity_pass'),
+            ('drift', pass_method == 'drift_pass'),
+            ('pulsed_magnet', _np.isin(
+                fam_name, ('EjeSF', 'EjeSG', 'InjSF', 'InjSG'))),
+            ('dipole', table['angle'] != 0),
+            ('quadrupole', table['K'] != 0),
+            ('sextupole', table['S'] != 0),
+            ('slow_horizontal_corrector', _np.isin(
+                fam_name, ('CH', 'horizontal_corrector'))),
+            ('slow_vertical_corrector', _np.isin(
+                fam_name, ('CV', 'vertical_corrector'))),
+            )
+        return _np.select(
+            [cond for _, cond in types], [typ for typ, _ in types],
+            default='unknown')
+
+    def _get_magnet_core(self, length, pos):
         corner = (pos, self._offset-self._height/2)
         return _patches.Rectangle(
-            xy=corner, width=element.length, height=self._height)
+            xy=corner, width=length, height=self._height)
 
-    def _get_septum_core(self, element, pos):
+    def _get_septum_core(self, length, pos):
         corner = (pos, self._offset-self._septum_height/2)
         return _patches.Rectangle(
-            xy=corner, width=element.length, height=self._septum_height)
+            xy=corner, width=length, height=self._septum_height)
 
-    def _get_corrector_core(self, element, pos):
+    def _get_corrector_core(self, length, pos):
         corner = (pos, self._offset-self._fast_corrector_height/2)
         return _patches.Rectangle(
-            xy=corner, width=element.length,
+            xy=corner, width=length,
             height=self._fast_corrector_height)
 
-    def _get_slow_horizontal_corrector_coil(self, element, pos):
+    def _get_slow_horizontal_corrector_coil(self, length, pos):
         corner = (
             pos-self._coil_length/2,
             self._offset+self._height/2-self._coil_height)
-        return self._get_coil(element, corner)
+        return self._get_coil(corner)
 
-    def _get_slow_vertical_corrector_coil(self, element, pos):
+    def _get_slow_vertical_corrector_coil(self, length, pos):
         corner = (pos-self._coil_length/2, self._offset-self._height/2)
-        return self._get_coil(element, corner)
+        return self._get_coil(corner)
 
-    def _get_fast_horizontal_corrector_coil(self, element, pos):
+    def _get_fast_horizontal_corrector_coil(self, length, pos):
         y = self._offset + self._fast_corrector_height/2 - self._coil_height
         corner = (pos, y)
-        return self._get_coil(element, corner)
+        return self._get_coil(corner)
 
-    def _get_fast_vertical_corrector_coil(self, element, pos):
+    def _get_fast_vertical_corrector_coil(self, length, pos):
         y = self._offset - self._fast_corrector_height/2
         corner = (pos, y)
-        return self._get_coil(element, corner)
+        return self._get_coil(corner)
 
-    def _get_skew_quadrupole(self, element, pos):
+    def _get_skew_quadrupole(self, length, pos):
         corner = (pos, self._offset-self._coil_height/2)
-        return self._get_coil(element, corner)
+        return self._get_coil(corner)
 
-    def _get_coil(self, element, corner):
-        _ = element
+    def _get_coil(self, corner):
         return _patches.Rectangle(
             xy=corner, width=self._coil_length, height=self._coil_height)
 
-    def _get_bpm(self, element, pos):
-        _ = element
+    def _get_bpm(self, length, pos):
+        _ = length
         corner = (pos-self._bpm_length/2, self._offset-self._height/20)
         return _patches.Rectangle(
             xy=corner, width=self._bpm_length, height=self._height/10)
+
+
+def _get_table(lattice, attributes):
+    if not isinstance(lattice, _Accelerator):
+        lattice = _Accelerator(lattice=lattice)
+    return lattice._get_table(attributes)
+
+
+def _get_step_segments(spos, values):
+    """Return segments of the steps of values along the elements."""
+    spos, values = _np.asarray(spos), _np.asarray(values)
+    segs = _np.empty((2*(len(spos)-1), 2, 2))
+    # horizontal segments, along each element:
+    segs[0::2, 0, 0], segs[0::2, 1, 0] = spos[:-1], spos[1:]
+    segs[0::2, :, 1] = values[:-1, None]
+    # vertical segments, at the end of each element:
+    segs[1::2, :, 0] = spos[1:, None]
+    segs[1::2, 0, 1], segs[1::2, 1, 1] = values[:-1], values[1:]
+    return segs
@@ -1,6 +1,9 @@
 """Lattice module."""
 
+import hashlib as _hashlib
 import math as _math
+import os as _os
+import re as _re
 from collections.abc import Iterable as _Iterable
 
 import numpy as _np
@@ -9,7 +12,8 @@ import mathphys as _mp
 import trackcpp as _trackcpp
 
 from .accelerator import Accelerator as _Accelerator
-from .elements import Element as _Element, marker as _marker
+from .elements import Element as _Element, marker as _marker, \
+    _SCALAR_ATTRS
 from .utils import interactive as _interactive
 
 
@@ -56,6 +60,9 @@ def shift(lattice, start: int):
     start = max(min(start, leng), -leng)
     if start < 0:
         start += leng
+    if isinstance(lattice, _Accelerator):
+        # copy-on-write view of the accelerator:
+        return lattice[_np.roll(_np.arange(leng), -start)]
     new_lattice = lattice[start:]
     for i in range(start):
         new_lattice.append(lattice[i])
@@ -80,44 +87,96 @@ def insert_marker_at_position(accelerator, fam_name: str, position: float):
             at the desired position.
 
     """
-    leng = 0.0
-    put_end = False
-    position = max(0.0, position)
-    for i, ele in enumerate(accelerator):
-        if _math.isclose(leng, position):
-            idx = i
-            break
-        leng += ele.length
-        if leng > position:
-            idx = i
+    return insert_markers_at_positions(accelerator, [position], fam_name)
+
+
+@_interactive
+def insert_markers_at_positions(accelerator, positions, fam_names):
+    """Return a copy of accelerator with markers at the desired positions.
+
+    The elements which contain the positions are split, in a single pass
+    over the lattice, to ensure the positions of the markers are respected.
+    The vacuum chamber of each marker will be defined by its closest
+    neighbor. Markers at the same position are inserted in the given order.
+
+    Args:
+        accelerator (pyaccel.accelerator.Accelerator): accelerator model.
+        positions (list, tuple, numpy.ndarray): positions in meters where to
+            insert the markers.
+        fam_names (str, list, tuple): value for the attribute fam_name of
+            each marker, or a single value for all markers.
+
+    Raises:
+        LatticeError: when fam_names and positions have different lengths.
+
+    Returns:
+        pyaccel.accelerator.Accelerator: new accelerator model with the
+            markers at the desired positions.
+
+    """
+    positions = _np.asarray(positions, dtype=float).ravel()
+    if isinstance(fam_names, str):
+        fam_names = [fam_names] * positions.size
+    elif len(fam_names) != positions.size:
+        raise LatticeError('fam_names and positions must have equal lengths.')
+
+    eles = accelerator._get_cpp_elements()
+    nr_eles = len(eles)
+    spos = find_spos(accelerator, indices='closed')
+    positions = _np.maximum(positions, 0.0)
+
+    # snap positions close to the entrance of elements:
+    nxt = _np.searchsorted(spos, positions, side='left')
+    for idcs in (_np.maximum(nxt-1, 0), _np.minimum(nxt, nr_eles)):
+        close = _np.isclose(spos[idcs], positions, rtol=1e-9, atol=0.0)
+        positions[close] = spos[idcs[close]]
+
+    # markers beyond the end of the lattice are inserted after it:
+    positions = _np.minimum(positions, _np.nextafter(spos[-1], _np.inf))
+    idcs = _np.searchsorted(spos, positions, side='left')
+    idcs = _np.minimum(idcs, nr_eles)
+    inside = (spos[idcs] != positions) & (positions <= spos[-1])
+    idcs[inside] -= 1  # index of the element to be split
+
+    order = _np.argsort(positions, kind='stable')
+    groups = dict()
+    for k in order:
+        groups.setdefault(int(idcs[k]), []).append(k)
+
+    def _get_marker(k, idx):
+        mark = _marker(fam_names[k])
+        if nr_eles:
+            cham = eles[min(idx, nr_eles-1)]
+            mark.hmin, mark.hmax = cham.hmin, cham.hmax
+            mark.vmin, mark.vmax = cham.vmin, cham.vmax
+        return mark.trackcpp_e
+
+    new_eles = []
+    for idx in range(nr_eles + 1):
+        marks = groups.get(idx, [])
+        marks_in = [k for k in marks if inside[k]]
+        new_eles.extend(_get_marker(k, idx) for k in marks if not inside[k])
+        if idx == nr_eles:
             break
-    else:
-        # in case position is larger than lattice length
-        position = leng
-        idx = i
-        put_end = True
-
-    delta = leng - position
-    new_acc = accelerator[:]
-    # in case the position is in the middle of an element we need to split
-    # that element in two parts:
-    if not _math.isclose(delta, 0.0):
-        e_len = accelerator[idx].length
-        fractions = _np.array([e_len - delta, delta])
-        fractions /= e_len
-        elems = split_element(accelerator[idx], fractions)
-        new_acc[idx] = elems[0]
-        idx += 1
-        new_acc.insert(idx, elems[1])
-
-    element = _marker(fam_name)
-    element.vmin = new_acc[idx].vmin
-    element.vmax = new_acc[idx].vmax
-    element.hmin = new_acc[idx].hmin
-    element.hmax = new_acc[idx].hmax
-    if put_end:
-        idx += 1
-    new_acc.insert(idx, element)
+        if not marks_in:
+            new_eles.append(eles[idx])
+            continue
+
+        cuts = _np.unique(positions[marks_in])
+        fractions = _np.diff(_np.r_[spos[idx], cuts, spos[idx+1]])
+        parts = split_element(_Element._bind(eles[idx]), fractions)
+        new_eles.append(parts[0].trackcpp_e)
+        for cut, part in zip(cuts, parts[1:]):
+            new_eles.extend(
+                _get_marker(k, idx) for k in marks_in
+                if positions[k] == cut)
+            new_eles.append(part.trackcpp_e)
+
+    new_acc = _Accelerator(accelerator=accelerator, lattice=[])
+    lattice = new_acc.trackcpp_acc.lattice
+    lattice.reserve(len(new_eles))
+    for ele in new_eles:
+        lattice.append(ele)
     return new_acc
 
 
@@ -236,14 +295,17 @@ def find_spos(lattice, indices='open'):
         indices or even an integer (default: 'open')
 
     """
-    leng = [0] + [elem.length for elem in lattice]
-    pos = _np.cumsum(leng)
+    if isinstance(lattice, _Accelerator):
+        pos = lattice.spos  # cached read-only array
+    else:
+        leng = [0] + [elem.length for elem in lattice]
+        pos = _np.cumsum(leng)
 
     if isinstance(indices, str):
         if indices.lower() == 'open':
-            return pos[:-1]
+            return pos[:-1].copy()
         elif indices.lower() == 'closed':
-            return pos
+            return pos.copy()
         else:
             raise TypeError('indices string not supported')
     elif isinstance(indices, (int, _np.ndarray, list)):
@@ -276,7 +338,18 @@ def find_indices(lattice, attribute_name, value, comparison=None):
       >> fun2=lambda x,y: x.startswith(y)
       >> mi_idx = find_indices(lattice,'fam_name',value='mi',comparison=fun2)
 
+    For Accelerator objects, exact matches of 'fam_name' and 'pass_method'
+    are looked up in the indices maintained by the Accelerator.
+
     """
+    if comparison is None and isinstance(value, str) and \
+            isinstance(lattice, _Accelerator):
+        if attribute_name == 'fam_name':
+            return lattice.fam_index.get(value, _np.array([])).tolist()
+        elif attribute_name == 'pass_method':
+            return lattice.pass_method_index.get(
+                value, _np.array([])).tolist()
+
     if comparison is None:
         comparison = _is_equal
     indices = []
@@ -287,6 +360,82 @@ def find_indices(lattice, attribute_name, value, comparison=None):
     return indices
 
 
+@_interactive
+def query(lattice, spos=None, **conditions):
+    """Return indices of the elements which satisfy all conditions.
+
+    The conditions are evaluated at once over columns of element attributes
+    (see pyaccel.accelerator.Accelerator.to_table), which are cached by the
+    Accelerator until its lattice changes. Regular expressions on
+    'fam_name' and 'pass_method' are matched only against the keys of the
+    fam_index and pass_method_index of the Accelerator.
+
+    Args:
+        lattice (pyaccel.accelerator.Accelerator): accelerator model.
+        spos (tuple, optional): (start, end) range of the longitudinal
+            position of the entrance of the elements [m]. Defaults to None.
+        conditions: attribute names, which must be in
+            pyaccel.accelerator.Accelerator.TABLE_ATTRIBUTES, and conditions
+            on their values, which may be:
+                str: regular expression which must match the whole value;
+                tuple: (min, max) inclusive range, None meaning no limit;
+                list, set, numpy.ndarray: allowed values;
+                callable: function which takes the column of the attribute
+                    and returns a boolean numpy array;
+                other: value for equality comparison.
+
+    Raises:
+        LatticeError: when an attribute is not supported.
+
+    Returns:
+        numpy.ndarray: sorted indices of the selected elements.
+
+    EXAMPLES:
+      >> idx = query(acc, fam_name='Q[FD]A.*', K=(2, None), spos=(10, 50))
+      >> idx = query(acc, pass_method='cavity_pass', frequency=lambda f: f>0)
+
+    """
+    if not isinstance(lattice, _Accelerator):
+        lattice = _Accelerator(lattice=lattice)
+    for attr in conditions:
+        if attr not in lattice.TABLE_ATTRIBUTES:
+            raise LatticeError(
+                "attribute '" + attr + "' not supported by query")
+
+    mask = _np.ones(len(lattice), dtype=bool)
+    if spos is not None:
+        mask &= _get_range_mask(lattice.spos[:-1], spos)
+
+    columns = [
+        attr for attr, cond in conditions.items()
+        if not (isinstance(cond, str) and attr in _INDEXED_ATTRIBUTES)]
+    table = lattice._get_table(columns)
+    for attr, cond in conditions.items():
+        if attr not in table:
+            index = getattr(lattice, _INDEXED_ATTRIBUTES[attr])
+            regex = _re.compile(cond)
+            sel = _np.zeros(mask.size, dtype=bool)
+            for key, idcs in index.items():
+                if regex.fullmatch(key):
+                    sel[idcs] = True
+            mask &= sel
+            continue
+        col = table[attr]
+        if isinstance(cond, str):
+            regex = _re.compile(cond)
+            sel = [bool(regex.fullmatch(val)) for val in col]
+            mask &= _np.array(sel, dtype=bool)
+        elif isinstance(cond, tuple):
+            mask &= _get_range_mask(col, cond)
+        elif isinstance(cond, (list, set, frozenset, _np.ndarray)):
+            mask &= _np.isin(col, list(cond))
+        elif callable(cond):
+            mask &= _np.asarray(cond(col), dtype=bool)
+        else:
+            mask &= col == cond
+    return _np.nonzero(mask)[0]
+
+
 @_interactive
 def get_attribute(lattice, attribute_name, indices='open', m=None, n=None):
     """Return a list with requested lattice data."""
@@ -301,7 +450,13 @@ def get_attribute(lattice, attribute_name, indices='open', m=None, n=None):
 
     indices, values, isflat = _process_args_errors(indices, 0.0)
 
-    if (m is not None) and (n is not None):
+    if m is None and n is None and isinstance(lattice, _Accelerator) and \
+            attribute_name in lattice.TABLE_ATTRIBUTES:
+        # columns are cached by the accelerator until its lattice changes:
+        column = lattice._get_table((attribute_name, ))[attribute_name]
+        for i, segs in enumerate(indices):
+            values[i] = column[_np.array(segs, dtype=int)].tolist()
+    elif (m is not None) and (n is not None):
         for i, segs in enumerate(indices):
             for j, seg in enumerate(segs):
                 tdata = getattr(lattice[seg], attribute_name)
@@ -335,15 +490,116 @@ def set_attribute(lattice, attribute_name, indices, values, m=None, n=None):
             for seg, val in zip(segs, vals):
                 tdata = getattr(lattice[seg], attribute_name)
                 tdata[m] = val
+    elif isinstance(lattice, _Accelerator) and (
+            attribute_name in _SCALAR_ATTRS or attribute_name == 'fam_name'):
+        set_attribute_bulk(
+            lattice, attribute_name,
+            [idx for segs in indices for idx in segs],
+            [val for vals in values for val in vals])
     else:
         for segs, vals in zip(indices, values):
             for seg, val in zip(segs, vals):
                 setattr(lattice[seg], attribute_name, val)
 
 
+@_interactive
+def set_attribute_bulk(
+        lattice, attribute_name, indices, values, m=None, n=None,
+        increment=False):
+    """Set (or increment) an attribute of many elements in one call.
+
+    Flat version of set_attribute optimized for large numbers of elements.
+    Scalar attributes (see pyaccel.accelerator.Accelerator.TABLE_ATTRIBUTES)
+    and components of 'polynom_a' and 'polynom_b' are written directly to
+    the trackcpp elements, without creating Element objects, and the
+    6-vectors 't_in', 't_out' and 6x6 matrices 'r_in', 'r_out' are written
+    through numpy views of the trackcpp arrays. Other attributes are set
+    through the Element properties.
+
+    Args:
+        lattice (pyaccel.accelerator.Accelerator): accelerator model.
+        attribute_name (str): name of the attribute.
+        indices (int, list, tuple, numpy.ndarray): flat list of indices.
+        values (float, list, tuple, numpy.ndarray): values to be written.
+            For numerical attributes they are broadcast to the shape
+            (len(indices), ) + shape of the selected attribute component,
+            for instance (len(indices), 6) for 't_in' with m=None.
+        m (int, optional): first index of array attributes.
+            Defaults to None.
+        n (int, optional): second index of matrix attributes.
+            Defaults to None.
+        increment (bool, optional): whether to add values to the current
+            ones instead of replacing them. Defaults to False.
+
+    """
+    indices = _np.array(indices, dtype=int, ndmin=1)
+    if isinstance(lattice, _Accelerator):
+        lattice._before_change()
+
+    if attribute_name in _COORD_ARRAYS:
+        key = _coord_array_key(attribute_name, m, n)
+        shape = _np.empty(_coord_array_shape(attribute_name))[key].shape
+        values = _np.broadcast_to(
+            _np.asarray(values, dtype=float), indices.shape + shape)
+        getter = _coord_array_getter(attribute_name)
+        eles = _get_trackcpp_elements(lattice, indices)
+        for ele, val in zip(eles, values):
+            arr = getter(getattr(ele, attribute_name))
+            if increment:
+                arr[key] += val
+            else:
+                arr[key] = val
+        return
+    elif attribute_name in ('polynom_a', 'polynom_b') and m is not None:
+        values = _np.broadcast_to(
+            _np.asarray(values, dtype=float), indices.shape)
+        eles = _get_trackcpp_elements(lattice, indices)
+        for ele, val in zip(eles, values):
+            pol = getattr(ele, attribute_name)
+            pol[m] = float(pol[m] + val if increment else val)
+        return
+    elif attribute_name in _SCALAR_ATTRS or attribute_name == 'fam_name':
+        if attribute_name == 'fam_name':
+            if isinstance(values, str):
+                values = len(indices) * [values]
+            conv = str
+        else:
+            conv = _SCALAR_ATTRS[attribute_name]
+            values = _np.broadcast_to(
+                _np.asarray(values, dtype=conv), indices.shape)
+        eles = _get_trackcpp_elements(lattice, indices)
+        for ele, val in zip(eles, values):
+            if increment:
+                val = getattr(ele, attribute_name) + val
+            setattr(ele, attribute_name, conv(val))
+        return
+
+    if isinstance(values, (int, float, str, _np.number)):
+        values = len(indices) * [values]
+    for idx, val in zip(indices, values):
+        ele = lattice[int(idx)]
+        if m is None:
+            if increment:
+                val = getattr(ele, attribute_name) + val
+            setattr(ele, attribute_name, val)
+            continue
+        tdata = getattr(ele, attribute_name)
+        key = m if n is None else (m, n)
+        if increment:
+            val = tdata[key] + val
+        if n is None:
+            tdata[m] = val
+        else:
+            tdata[m][n] = val
+        setattr(ele, attribute_name, tdata)
+
+
 @_interactive
 def find_dict(lattice, attribute_name):
     """Return a dict 'attribute_name' and indices of matching elements."""
+    if attribute_name == 'fam_name' and isinstance(lattice, _Accelerator):
+        return {key: val.tolist() for key, val in lattice.fam_index.items()}
+
     latt_dict = {}
     for i, ele in enumerate(lattice):
         if hasattr(ele, attribute_name):
@@ -355,44 +611,444 @@ def find_dict(lattice, attribute_name):
     return latt_dict
 
 
+class SegmentGroups(list):
+    """Nested list of the indices of the elements of segment groups.
+
+    Returned by get_segment_groups and accepted wherever the functions of
+    this module take nested lists of indices. The flat arrays of indices
+    and groups are computed once, so these functions do not regroup the
+    indices. Must not be modified.
+
+    """
+
+    def __init__(self, group_ids, indices, groups):
+        """."""
+        lens = _np.bincount(groups, minlength=len(group_ids))
+        segs = _np.split(indices, _np.cumsum(lens)[:-1]) if lens.size else []
+        super().__init__(arr.tolist() for arr in segs)
+        self.group_ids = group_ids
+        self.indices = indices
+        self.groups = groups
+
+
+@_interactive
+def find_segment_groups(lattice, fam_name):
+    """Return segment groups of some families.
+
+    Segment groups are runs of consecutive elements of the same family,
+    taken as the segments of one magnet split in the model. Distinct
+    magnets of the same family with no element between them are therefore
+    merged into one group. Nested lists of indices must be used to apply
+    errors to them separately. See
+    pyaccel.accelerator.Accelerator.segment_index.
+
+    Args:
+        lattice (pyaccel.accelerator.Accelerator): accelerator model.
+        fam_name (str, list, tuple): families of the elements.
+
+    Returns:
+        SegmentGroups: nested list with the indices of the elements of
+            each group, sorted by group, to be used by the error functions
+            of this module. The ids of the groups are in its group_ids.
+
+    EXAMPLES:
+      >> qfa = find_segment_groups(acc, 'QFA')
+      >> add_error_misalignment_x(acc, qfa, 40e-6)
+
+    """
+    if not isinstance(lattice, _Accelerator):
+        lattice = _Accelerator(lattice=lattice)
+    indices = _get_knob_indices(lattice, fam_name)
+    ids = _np.unique(lattice.segment_index[_np.array(indices, dtype=int)])
+    return get_segment_groups(lattice, ids)
+
+
+@_interactive
+def get_segment_groups(lattice, group_ids=None):
+    """Return indices of the elements of segment groups.
+
+    Args:
+        lattice (pyaccel.accelerator.Accelerator): accelerator model.
+        group_ids (int, list, tuple, numpy.ndarray, optional): ids of the
+            segment groups. Defaults to None, meaning all groups.
+
+    Returns:
+        SegmentGroups: nested list with the indices of the elements of
+            each group, to be used by the error functions of this module.
+
+    EXAMPLES:
+      >> groups = get_segment_groups(acc, acc.segment_index[[10, 20]])
+      >> add_error_misalignment_x(acc, groups, 40e-6)
+
+    """
+    if not isinstance(lattice, _Accelerator):
+        lattice = _Accelerator(lattice=lattice)
+    edges = lattice.segment_edges
+    if group_ids is None:
+        group_ids = _np.arange(edges.size - 1)
+    group_ids = _np.array(group_ids, dtype=int, ndmin=1)
+    starts, lens = edges[group_ids], _np.diff(edges)[group_ids]
+    groups = _np.repeat(_np.arange(group_ids.size), lens)
+    offsets = _np.cumsum(lens) - lens
+    indices = _np.arange(groups.size) - offsets[groups] + starts[groups]
+    return SegmentGroups(group_ids, indices, groups)
+
+
 @_interactive
 def set_knob(lattice, fam_name, attribute_name, value):
     """."""
-    if isinstance(fam_name, str):
-        idx = find_indices(lattice, 'fam_name', fam_name)
-    else:
-        idx = []
-        for famname in fam_name:
-            idx.append(find_indices(lattice, 'fam_name', famname))
-    for i in idx:
+    for i in _get_knob_indices(lattice, fam_name):
         setattr(lattice[i], attribute_name, value)
 
 
 @_interactive
 def add_knob(lattice, fam_name, attribute_name, value):
     """."""
-    if isinstance(fam_name, str):
-        idx = find_indices(lattice, 'fam_name', fam_name)
-    else:
-        idx = []
-        for famname in fam_name:
-            idx.append(find_indices(lattice, 'fam_name', famname))
-    for i in idx:
+    for i in _get_knob_indices(lattice, fam_name):
         original_value = getattr(lattice[i], attribute_name)
         new_value = original_value + value
         setattr(lattice[i], attribute_name, new_value)
 
 
 @_interactive
-def read_flat_file(filename):
-    """."""
+class Knob:
+    """Knob acting on an attribute of the elements of some families.
+
+    The elements are looked up once, when the knob is created, and grouped:
+    consecutive elements of the same family, like the segments of a magnet
+    split in the model, form a group and share the same knob value. Changes
+    are written with set_attribute_bulk and can be undone.
+
+    Supported attributes are the scalar attributes of the elements (see
+    pyaccel.accelerator.Accelerator.TABLE_ATTRIBUTES), the components m of
+    'polynom_a' and 'polynom_b' and the aliases 'K', 'S' and 'Ks'.
+
+    Examples:
+        >>> qfs = Knob(accelerator, ['QFA', 'QFB'], 'K')
+        >>> qfs.add(0.01)  # change all groups of elements
+        >>> snap = qfs.snapshot()
+        >>> qfs.set(qfs.value * 1.01)  # one value per group
+        >>> qfs.restore(snap)
+        >>> qfs.undo()  # undo the restore
+        >>> set_knobs([qfs, qds], [0.01, -0.01], increment=True)
+
+    """
+
+    # attribute, component and sign of the aliases:
+    ALIASES = {
+        'K': ('polynom_b', 1, 1.0),
+        'S': ('polynom_b', 2, 1.0),
+        'Ks': ('polynom_a', 1, -1.0)}
+
+    def __init__(self, lattice, fam_names, attribute_name, m=None):
+        """Resolve the elements of the knob and store their values.
+
+        Args:
+            lattice (pyaccel.accelerator.Accelerator): accelerator model.
+            fam_names (str, list, tuple): families of the elements.
+            attribute_name (str): attribute of the elements.
+            m (int, optional): component of 'polynom_a' and 'polynom_b'.
+                Defaults to None.
+
+        Raises:
+            LatticeError: when the attribute is not supported.
+
+        """
+        sign = 1.0
+        if attribute_name in self.ALIASES:
+            attr, m, sign = self.ALIASES[attribute_name]
+        elif attribute_name in ('polynom_a', 'polynom_b'):
+            if m is None:
+                raise LatticeError(
+                    "m must be given for attribute '" + attribute_name + "'")
+            attr = attribute_name
+        elif attribute_name in _SCALAR_ATTRS:
+            attr = attribute_name
+        else:
+            raise LatticeError(
+                "attribute '" + attribute_name + "' not supported by Knob")
+        if isinstance(fam_names, str):
+            fam_names = [fam_names]
+
+        self._lattice = lattice
+        self._attr, self._m, self._sign = attr, m, sign
+        self._fam_names = tuple(fam_names)
+        self._attribute_name = attribute_name
+
+        indices, fams = [], []
+        for i, fam in enumerate(self._fam_names):
+            idx = find_indices(lattice, 'fam_name', fam)
+            indices.extend(idx)
+            fams.extend(len(idx) * [i])
+        order = _np.argsort(indices, kind='stable')
+        self._indices = _np.array(indices, dtype=int)[order]
+        fams = _np.array(fams, dtype=int)[order]
+        if isinstance(lattice, _Accelerator):
+            brk = _np.diff(lattice.segment_index[self._indices]) != 0
+        else:
+            brk = (_np.diff(self._indices) != 1) | (_np.diff(fams) != 0)
+        self._groups = _np.r_[0, _np.cumsum(brk)][:self._indices.size]
+        self._firsts = _np.r_[0, _np.nonzero(brk)[0] + 1][:self.nr_groups]
+
+        self._base = self._read()
+        self._history = []
+
+    @property
+    def fam_names(self):
+        """Families of the elements of the knob."""
+        return self._fam_names
+
+    @property
+    def attribute_name(self):
+        """Attribute changed by the knob."""
+        return self._attribute_name
+
+    @property
+    def indices(self):
+        """Indices of the elements of the knob."""
+        return self._indices.copy()
+
+    @property
+    def groups(self):
+        """Group of each element of the knob."""
+        return self._groups.copy()
+
+    @property
+    def nr_groups(self):
+        """Number of groups of elements."""
+        return int(self._groups[-1]) + 1 if self._groups.size else 0
+
+    @property
+    def base(self):
+        """Values of the elements when the knob was created."""
+        return self._base.copy()
+
+    @property
+    def value(self):
+        """Current value of each group of elements."""
+        return self._read()[self._firsts]
+
+    def set(self, values):
+        """Set the value of the groups of elements.
+
+        Args:
+            values (float, list, tuple, numpy.ndarray): one value for all
+                groups or one value per group.
+
+        """
+        self._write(self._expand(values))
+
+    def add(self, values):
+        """Add values to the current values of the groups of elements.
+
+        Args:
+            values (float, list, tuple, numpy.ndarray): one value for all
+                groups or one value per group.
+
+        """
+        self._write(self._read() + self._expand(values))
+
+    def reset(self):
+        """Restore the values of the elements when the knob was created."""
+        self._write(self._base)
+
+    def snapshot(self):
+        """Return the current values of the elements."""
+        return self._read()
+
+    def restore(self, snapshot):
+        """Restore the values of the elements returned by snapshot."""
+        self._write(_np.asarray(snapshot, dtype=float))
+
+    def undo(self):
+        """Undo the last change made through this knob.
+
+        Raises:
+            LatticeError: when there is nothing to undo.
+
+        """
+        if not self._history:
+            raise LatticeError('nothing to undo')
+        set_attribute_bulk(
+            self._lattice, self._attr, self._indices,
+            self._history.pop() * self._sign, m=self._m)
+
+    def _read(self):
+        vals = _get_attribute_bulk(
+            self._lattice, self._attr, self._indices, m=self._m)
+        return vals.astype(float) * self._sign
+
+    def _expand(self, values):
+        values = _np.asarray(values, dtype=float)
+        return _np.broadcast_to(values, (self.nr_groups, ))[self._groups]
+
+    def _write(self, values):
+        self._history.append(self._read())
+        set_attribute_bulk(
+            self._lattice, self._attr, self._indices, values * self._sign,
+            m=self._m)
+
+
+@_interactive
+def set_knobs(knobs, values, increment=False):
+    """Set or increment many knobs at once.
+
+    Knobs acting on the same attribute of the same lattice are changed by a
+    single bulk write. The changes can be undone knob by knob.
+
+    Args:
+        knobs (list, tuple): pyaccel.lattice.Knob objects.
+        values (list, tuple): value of each knob, with one value for all
+            groups of the knob or one value per group.
+        increment (bool, optional): whether to add values to the current
+            ones instead of replacing them. Defaults to False.
+
+    """
+    writes = dict()
+    for knob, vals in zip(knobs, values):
+        curr = knob._read()
+        vals = knob._expand(vals)
+        if increment:
+            vals = vals + curr
+        knob._history.append(curr)
+        key = (id(knob._lattice), knob._attr, knob._m)
+        _, idcs, news = writes.setdefault(key, (knob._lattice, [], []))
+        idcs.append(knob._indices)
+        news.append(vals * knob._sign)
+
+    for (_, attr, m), (lattice, idcs, news) in writes.items():
+        set_attribute_bulk(
+            lattice, attr, _np.concatenate(idcs), _np.concatenate(news), m=m)
+
+
+# directory where read_flat_file stores the cached lattices, shared by all
+# processes. If None, lattices are cached only in memory:
+FLAT_FILE_CACHE_DIR = None
+
+# maximum number of lattices cached in memory by read_flat_file:
+FLAT_FILE_CACHE_SIZE = 8
+
+_FLAT_FILE_CACHE = dict()
+
+
+@_interactive
+def read_flat_file(filename, cache=False):
+    """Read accelerator from a flat file.
+
+    Args:
+        filename (str): name of the flat file.
+        cache (bool, optional): whether to use the cache of parsed lattices,
+            keyed by the path, modification time and size of the file. The
+            lattices are kept in the binary form of write_binary, in memory
+            and, if FLAT_FILE_CACHE_DIR is set, in files of that directory,
+            so that other processes also reload them without parsing the
+            flat file. Defaults to False.
+
+    Raises:
+        LatticeError: when the file can not be read.
+
+    Returns:
+        pyaccel.accelerator.Accelerator: accelerator model.
+
+    """
+    if not cache:
+        return _read_flat_file(filename)
+
+    key = _get_flat_file_key(filename)
+    arrs = _FLAT_FILE_CACHE.get(key)
+    cache_file = None
+    if arrs is None and FLAT_FILE_CACHE_DIR is not None:
+        digest = _hashlib.sha1(repr(key).encode()).hexdigest()
+        cache_file = _os.path.join(FLAT_FILE_CACHE_DIR, digest + '.npz')
+        if _os.path.isfile(cache_file):
+            with _np.load(cache_file) as data:
+                arrs = {name: data[name] for name in data.files}
+    if arrs is not None:
+        _store_flat_file_cache(key, arrs)
+        return _Accelerator._from_state_arrays(arrs)
+
+    acc = _read_flat_file(filename)
+    arrs = acc._get_state_arrays()
+    _store_flat_file_cache(key, arrs)
+    if cache_file is not None:
+        # write to a temporary file first, since other processes may be
+        # reading the cache:
+        _os.makedirs(FLAT_FILE_CACHE_DIR, exist_ok=True)
+        tmp_file = cache_file[:-4] + '.' + str(_os.getpid()) + '.tmp.npz'
+        _np.savez(tmp_file, **arrs)
+        _os.replace(tmp_file, cache_file)
+    return acc
+
+
+@_interactive
+def clear_flat_file_cache():
+    """Clear the memory cache of read_flat_file.
+
+    Files in FLAT_FILE_CACHE_DIR are not removed.
+
+    """
+    _FLAT_FILE_CACHE.clear()
+
+
+@_interactive
+def read_flat_file_elements(filename, indices=None, fam_names=None):
+    """Read selected elements of a flat file.
+
+    The file is scanned line by line and only the text of the selected
+    elements is parsed, so the whole lattice is never built. Useful for
+    very large files.
+
+    Args:
+        filename (str): name of the flat file.
+        indices (slice, range, list, tuple, numpy.ndarray, optional): indices
+            of the elements in the file. Negative indices are not supported.
+            Defaults to None, meaning all elements.
+        fam_names (str, list, tuple, optional): families of the elements.
+            Defaults to None, meaning all families.
+
+    Raises:
+        LatticeError: when the file can not be read or indices are negative.
+
+    Returns:
+        pyaccel.accelerator.Accelerator: model with the parameters of the
+            file and the selected elements, in the order of the file.
+        numpy.ndarray: indices of the selected elements in the file.
+
+    """
+    if isinstance(fam_names, str):
+        fam_names = [fam_names]
+    fam_names = None if fam_names is None else set(fam_names)
+    select, last = _get_flat_file_selector(indices)
+
+    header, blocks, selected = [], [], []
+    block, idx = None, -1
+    with open(filename, 'r') as fil:
+        for line in fil:
+            if line.startswith('###'):
+                _add_flat_file_block(block, idx, fam_names, blocks, selected)
+                idx += 1
+                block = None
+                if idx > last:
+                    break
+                if select(idx):
+                    block = []
+            elif block is not None:
+                block.append(line)
+            elif idx < 0:
+                header.append(line)
+        else:
+            _add_flat_file_block(block, idx, fam_names, blocks, selected)
+
+    text = [''.join(header)]
+    for i, blk in enumerate(blocks):
+        text.append('#### {0:04d} ####\n'.format(i) + ''.join(blk))
     energy = _mp.constants.electron_rest_energy*_mp.units.joule_2_eV
     acc = _Accelerator(energy=energy)  # energy cannot be zero
-    fname = _trackcpp.String(filename)
-    rd_ = _trackcpp.read_flat_file_wrapper(fname, acc.trackcpp_acc, True)
+    stri = _trackcpp.String(''.join(text))
+    rd_ = _trackcpp.read_flat_file_wrapper(stri, acc.trackcpp_acc, False)
     if rd_ > 0:
         raise LatticeError(_trackcpp.string_error_messages[rd_])
-    return acc
+    return acc, _np.array(selected, dtype=int)
 
 
 @_interactive
@@ -417,49 +1073,247 @@ def write_flat_file_to_string(accelerator):
     return str_.data
 
 
+@_interactive
+def write_binary(accelerator, filename, compress=False):
+    """Write accelerator to a binary file.
+
+    The model is stored in numpy .npz format, as columns of element
+    attributes plus tables of family names and kicktable file names. It is
+    an exact representation of all attributes of the elements, much faster
+    to write and read than the flat file format.
+
+    Args:
+        accelerator (pyaccel.accelerator.Accelerator): accelerator model.
+        filename (str, file): name of the file, to which the extension .npz
+            is appended if not present, or open file object.
+        compress (bool, optional): whether to compress the file.
+            Defaults to False.
+
+    """
+    arrs = accelerator._get_state_arrays()
+    if compress:
+        _np.savez_compressed(filename, **arrs)
+    else:
+        _np.savez(filename, **arrs)
+
+
+@_interactive
+def read_binary(filename):
+    """Read accelerator from a binary file created by write_binary.
+
+    Args:
+        filename (str, file): name of the file or open file object.
+
+    Returns:
+        pyaccel.accelerator.Accelerator: accelerator model.
+
+    """
+    with _np.load(filename) as data:
+        arrs = {key: data[key] for key in data.files}
+    return _Accelerator._from_state_arrays(arrs)
+
+
+@_interactive
+def diff(accelerator_a, accelerator_b):
+    """Return the differences between two models with the same length.
+
+    The attributes of all elements are read once into columns, which are
+    compared at once, so this is much faster than comparing pairs of
+    Elements. The result is compact, as only the changed values are stored,
+    and apply_patch(accelerator_a, patch) turns accelerator_a into a model
+    equal to accelerator_b.
+
+    Args:
+        accelerator_a (pyaccel.accelerator.Accelerator): reference model.
+        accelerator_b (pyaccel.accelerator.Accelerator): modified model.
+
+    Raises:
+        LatticeError: when the models have different number of elements.
+
+    Returns:
+        dict: patch with keys
+            'length': number of elements of the models;
+            'parameters': dict with the parameters of accelerator_b (energy,
+                harmonic_number, cavity_on, radiation_on, vchamber_on) that
+                differ from the ones of accelerator_a;
+            'elements': dict mapping each changed element attribute to a
+                tuple (indices, values) with the indices of the elements
+                where it differs and its values in accelerator_b. The values
+                of 'polynom_a' and 'polynom_b' are lists of arrays, since
+                polynoms may have different sizes, and the values of
+                'kicktable' are file names, '' meaning no kicktable;
+            'indices': sorted indices of all elements that differ.
+
+    """
+    if len(accelerator_a) != len(accelerator_b):
+        raise LatticeError('models have different number of elements')
+    arrs_a = accelerator_a._get_state_arrays()
+    arrs_b = accelerator_b._get_state_arrays()
+
+    params = dict()
+    for par in _PATCH_PARAMETERS:
+        if arrs_a[par] != arrs_b[par]:
+            params[par] = arrs_b[par].item()
+
+    cols_a, cols_b = _get_diff_columns(arrs_a), _get_diff_columns(arrs_b)
+    eles, changed = dict(), []
+    for attr, col_b in cols_b.items():
+        col_a = cols_a[attr]
+        if attr in ('polynom_a', 'polynom_b'):
+            # compare the sizes and the polynoms padded with zeros, since
+            # padded entries of polynoms of different sizes are masked by
+            # the comparison of the sizes:
+            sizes_a, col_a = col_a
+            sizes_b, col_b = col_b
+            size = max(col_a.shape[1], col_b.shape[1])
+            col_a = _np.pad(col_a, ((0, 0), (0, size-col_a.shape[1])))
+            col_b = _np.pad(col_b, ((0, 0), (0, size-col_b.shape[1])))
+            mask = (sizes_a != sizes_b) | _get_diff_mask(col_a, col_b)
+            idcs = _np.nonzero(mask)[0]
+            vals = [col_b[i, :sizes_b[i]] for i in idcs]
+        else:
+            idcs = _np.nonzero(_get_diff_mask(col_a, col_b))[0]
+            vals = col_b[idcs]
+        if idcs.size:
+            eles[attr] = (idcs, vals)
+            changed.append(idcs)
+
+    return {
+        'length': len(accelerator_b),
+        'parameters': params,
+        'elements': eles,
+        'indices': _np.unique(_np.concatenate(
+            changed or [_np.zeros(0, dtype=int)])),
+        }
+
+
+@_interactive
+def apply_patch(accelerator, patch):
+    """Apply, in place, the differences returned by diff.
+
+    Args:
+        accelerator (pyaccel.accelerator.Accelerator): model equal to the
+            reference model of the patch, at least in the changed elements.
+        patch (dict): output of diff.
+
+    Raises:
+        LatticeError: when the patch is for models with different length or
+            a kicktable file is not found.
+
+    """
+    if len(accelerator) != patch['length']:
+        raise LatticeError('patch is for models with different length')
+    params = patch['parameters']
+    for par, val in params.items():
+        setattr(accelerator, par, val)
+    if 'energy' in params:
+        # avoid rounding errors of the conversions of the energy setter:
+        accelerator.trackcpp_acc.energy = params['energy']
+
+    accelerator._before_change()
+    for attr, (idcs, vals) in patch['elements'].items():
+        if attr in _SCALAR_ATTRS or attr in _COORD_ARRAYS or \
+                attr == 'fam_name':
+            set_attribute_bulk(accelerator, attr, idcs, vals)
+            continue
+        eles = _get_trackcpp_elements(accelerator, idcs)
+        for ele, val in zip(eles, vals):
+            if attr == 'pass_method':
+                ele.pass_method = int(val)
+            elif attr in ('polynom_a', 'polynom_b'):
+                getattr(ele, attr)[:] = _np.asarray(val).tolist()
+            elif attr == 'matrix66':
+                _Element._bind(ele).matrix66 = val
+            elif attr == 'kicktable':
+                idx = _trackcpp.add_kicktable(str(val)) if val else -1
+                if val and idx == -1:
+                    raise LatticeError(
+                        "kicktable file '" + str(val) + "' not found")
+                ele.kicktable_idx = idx
+
+
 @_interactive
 def refine_lattice(
         accelerator, max_length=None, indices=None, fam_names=None,
-        pass_methods=None):
-    """."""
+        pass_methods=None, return_index_maps=False):
+    """Return copy of accelerator with long elements split in segments.
+
+    Args:
+        accelerator (pyaccel.accelerator.Accelerator): accelerator model.
+        max_length (float, optional): maximum length of the segments of the
+            refined elements. Defaults to 0.05.
+        indices ((list, tuple, numpy.ndarray), optional): indices of the
+            elements to be refined. Defaults to None.
+        fam_names ((list, tuple), optional): in case indices is None,
+            families of the elements to be refined. Defaults to None.
+        pass_methods ((list, tuple), optional): in case indices is None,
+            pass methods of the elements to be refined. Defaults to None.
+            If indices, fam_names and pass_methods are None, all elements
+            are refined.
+        return_index_maps (bool, optional): whether to return the index
+            maps between the original and the refined lattices.
+            Defaults to False.
+
+    Returns:
+        pyaccel.accelerator.Accelerator: refined accelerator model.
+        numpy.ndarray: (len(accelerator)+1, ) index of the first segment of
+            each element in the refined lattice, followed by the length of
+            the refined lattice, so that the segments of element i are
+            old2new[i]:old2new[i+1]. Only if return_index_maps is True.
+        numpy.ndarray: (len(new_accelerator), ) index of the original
+            element of each segment. Only if return_index_maps is True.
+
+    """
     if max_length is None:
         max_length = 0.05
 
     acc = accelerator
+    eles = acc._get_cpp_elements()
+    nr_eles = len(eles)
 
-    # Build list with indices of elements to be affected
+    # Build mask of elements to be affected
     if indices is None:
         indices = []
         # Add specified fam_names
         if fam_names is not None:
-            for fam_name in fam_names:
-                indices.extend(find_indices(acc, 'fam_name', fam_name))
+            indices.extend(
+                acc.fam_index[fam] for fam in fam_names
+                if fam in acc.fam_index)
         # Add specified pass_methods
         if pass_methods is not None:
-            for pass_method in pass_methods:
-                indices.extend(find_indices(acc, 'pass_method', pass_method))
+            indices.extend(
+                acc.pass_method_index[pm] for pm in pass_methods
+                if pm in acc.pass_method_index)
         if fam_names is None and pass_methods is None:
-            indices = list(range(len(acc)))
-
-    new_acc = _Accelerator(
-        energy=acc.energy,
-        harmonic_number=acc.harmonic_number,
-        cavity_on=acc.cavity_on,
-        radiation_on=acc.radiation_on,
-        vchamber_on=acc.vchamber_on)
-
-    indices = set(indices)
-    for i, ele in enumerate(acc):
-        if i not in indices or ele.length <= max_length:
-            elem = _Element(ele)
-            new_acc.append(elem)
+            indices = [_np.arange(nr_eles)]
+        indices = _np.concatenate([_np.array([], dtype=int)] + indices)
+    selected = _np.zeros(nr_eles, dtype=bool)
+    selected[_np.asarray(indices, dtype=int)] = True
+
+    lengths = acc.to_table(('length', ))['length']
+    nr_segs = (lengths // max_length).astype(int)
+    nr_segs += (lengths % max_length) != 0
+    nr_segs[~selected | (lengths <= max_length)] = 1
+
+    new_eles = []
+    for ele, nr_seg in zip(eles, nr_segs):
+        if nr_seg == 1:
+            new_eles.append(ele)
             continue
+        parts = split_element(_Element._bind(ele), nr_segs=nr_seg)
+        new_eles.extend(part.trackcpp_e for part in parts)
 
-        nr_segs = int(ele.length // max_length)
-        nr_segs += 1 if ele.length % max_length else 0
-        for el in split_element(ele, nr_segs=nr_segs):
-            new_acc.append(el)
-    return new_acc
+    new_acc = _Accelerator(accelerator=acc, lattice=[])
+    lattice = new_acc.trackcpp_acc.lattice
+    lattice.reserve(len(new_eles))
+    for ele in new_eles:
+        lattice.append(ele)
+
+    if not return_index_maps:
+        return new_acc
+    old2new = _np.r_[0, _np.cumsum(nr_segs)]
+    new2old = _np.repeat(_np.arange(nr_eles), nr_segs)
+    return new_acc, old2new, new2old
 
 
 @_interactive
@@ -514,13 +1368,16 @@ def set_error_misalignment_x(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    # loops over elements and sets its T1 and T2 fields
-    for segs, vals in zip(indices, values):
-        # it is possible to also have yaw errors, so:
-        yaw = (lattice[segs[0]].t_in[0] + lattice[segs[-1]].t_out[0])/2
-        for idx, val in zip(segs, vals):
-            lattice[idx].t_in[0] = yaw - val
-            lattice[idx].t_out[0] = yaw + val
+    # it is possible to also have yaw errors, so:
+    firsts, lasts = _get_groups_edges(indices)
+    yaw = _get_attribute_bulk(lattice, 't_in', firsts, m=0)
+    yaw += _get_attribute_bulk(lattice, 't_out', lasts, m=0)
+    yaw /= 2
+
+    # sets T1 and T2 fields of all elements
+    idcs, vals, grps = _flatten_args_errors(indices, values)
+    set_attribute_bulk(lattice, 't_in', idcs, yaw[grps] - vals, m=0)
+    set_attribute_bulk(lattice, 't_out', idcs, yaw[grps] + vals, m=0)
 
 
 @_interactive
@@ -542,11 +1399,10 @@ def add_error_misalignment_x(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    # loops over elements and sets its T1 and T2 fields
-    for segs, vals in zip(indices, values):
-        for idx, val in zip(segs, vals):
-            lattice[idx].t_in[0] += -val
-            lattice[idx].t_out[0] += val
+    # adds to T1 and T2 fields of all elements
+    idcs, vals, _ = _flatten_args_errors(indices, values)
+    set_attribute_bulk(lattice, 't_in', idcs, -vals, m=0, increment=True)
+    set_attribute_bulk(lattice, 't_out', idcs, vals, m=0, increment=True)
 
 
 @_interactive
@@ -597,13 +1453,16 @@ def set_error_misalignment_y(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    # loops over elements and sets its T1 and T2 fields
-    for segs, vals in zip(indices, values):
-        # it is possible to also have yaw errors, so:
-        pitch = (lattice[segs[0]].t_in[2] + lattice[segs[-1]].t_out[2])/2
-        for idx, val in zip(segs, vals):
-            lattice[idx].t_in[2] = pitch - val
-            lattice[idx].t_out[2] = pitch + val
+    # it is possible to also have pitch errors, so:
+    firsts, lasts = _get_groups_edges(indices)
+    pitch = _get_attribute_bulk(lattice, 't_in', firsts, m=2)
+    pitch += _get_attribute_bulk(lattice, 't_out', lasts, m=2)
+    pitch /= 2
+
+    # sets T1 and T2 fields of all elements
+    idcs, vals, grps = _flatten_args_errors(indices, values)
+    set_attribute_bulk(lattice, 't_in', idcs, pitch[grps] - vals, m=2)
+    set_attribute_bulk(lattice, 't_out', idcs, pitch[grps] + vals, m=2)
 
 
 @_interactive
@@ -625,11 +1484,10 @@ def add_error_misalignment_y(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    # loops over elements and sets its T1 and T2 fields
-    for segs, vals in zip(indices, values):
-        for idx, val in zip(segs, vals):
-            lattice[idx].t_in[2] += -val
-            lattice[idx].t_out[2] += val
+    # adds to T1 and T2 fields of all elements
+    idcs, vals, _ = _flatten_args_errors(indices, values)
+    set_attribute_bulk(lattice, 't_in', idcs, -vals, m=2, increment=True)
+    set_attribute_bulk(lattice, 't_out', idcs, vals, m=2, increment=True)
 
 
 @_interactive
@@ -679,25 +1537,10 @@ def set_error_rotation_roll(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    # loops over elements and sets its R1 and R2 fields
-    for segs, val in zip(indices, values):
-        cos, sin = _math.cos(val[0]), _math.sin(val[0])
-        rot = _np.diag([cos, cos, cos, cos, 1.0, 1.0])
-        rot[0, 2], rot[1, 3], rot[2, 0], rot[3, 1] = sin, sin, -sin, -sin
-        for idx in segs:
-            ele = lattice[idx]
-            if ele.angle != 0 and ele.length != 0:
-                rho = ele.length / ele.angle
-                orig_s = ele.polynom_a[0] * rho
-                # look at bndpolysymplectic4pass:
-                orig_c = ele.polynom_b[0] * rho + 1.0
-                # sin(teta)/rho:
-                ele.polynom_a[0] = (orig_s*cos + orig_c*sin)/rho
-                # (cos(teta)-1)/rho:
-                ele.polynom_b[0] = (orig_c*cos - orig_s*sin - 1.0)/rho
-            else:
-                ele.r_in = rot
-                ele.r_out = rot.T
+    # sets R1 and R2 fields of all elements with the error of its group
+    idcs, _, grps = _flatten_args_errors(indices, values)
+    angles = _np.array([val[0] for val in values], dtype=float)[grps]
+    _apply_roll_errors(lattice, idcs, angles, add=False)
 
 
 @_interactive
@@ -719,26 +1562,10 @@ def add_error_rotation_roll(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    # loops over elements and sets its R1 and R2 fields
-    for segs, val in zip(indices, values):
-        cos, sin = _math.cos(val[0]), _math.sin(val[0])
-        rot = _np.diag([cos, cos, cos, cos, 1.0, 1.0])
-        rot[0, 2], rot[1, 3], rot[2, 0], rot[3, 1] = sin, sin, -sin, -sin
-
-        for idx in segs:
-            ele = lattice[idx]
-            if ele.angle != 0 and ele.length != 0:
-                rho = ele.length / ele.angle
-                orig_s = ele.polynom_a[0] * rho
-                # look at bndpolysymplectic4pass:
-                orig_c = ele.polynom_b[0] * rho + 1.0
-                # sin(teta)/rho:
-                ele.polynom_a[0] = (orig_s*cos + orig_c*sin) / rho
-                # (cos(teta)-1)/rho:
-                ele.polynom_b[0] = (orig_c*cos - orig_s*sin - 1.0) / rho
-            else:
-                ele.r_in = _np.dot(rot, ele.r_in)
-                ele.r_out = _np.dot(ele.r_out, rot.T)
+    # composes R1 and R2 fields of all elements with the error of its group
+    idcs, _, grps = _flatten_args_errors(indices, values)
+    angles = _np.array([val[0] for val in values], dtype=float)[grps]
+    _apply_roll_errors(lattice, idcs, angles, add=True)
 
 
 @_interactive
@@ -790,23 +1617,7 @@ def set_error_rotation_pitch(lattice, indices, values):
     indices, values, _ = _process_args_errors(indices, values)
 
     # set new values to first T1 and last T2
-    for segs, ang in zip(indices, values):
-        angy = -ang[0]
-        L = sum([lattice[ii].length for ii in segs])
-        # It is possible that there is a misalignment error, so:
-        misy = (lattice[segs[0]].t_in[2] - lattice[segs[-1]].t_out[2])/2
-
-        # correction of the path length
-        old_angx = lattice[segs[0]].t_in[1]
-        path = -(L/2)*(angy*angy + old_angx*old_angx)
-
-        # Apply the errors only to the entrance of the first and exit of the
-        # last segment:
-        lattice[segs[0]].t_in[2] = -(L/2)*angy + misy
-        lattice[segs[-1]].t_out[2] = -(L/2)*angy - misy
-        lattice[segs[0]].t_in[3] = angy
-        lattice[segs[-1]].t_out[3] = -angy
-        lattice[segs[-1]].t_out[5] = path
+    _apply_rotation_errors(lattice, indices, values, coord=2, add=False)
 
 
 @_interactive
@@ -829,19 +1640,7 @@ def add_error_rotation_pitch(lattice, indices, values):
     indices, values, _ = _process_args_errors(indices, values)
 
     # set new values to first T1 and last T2. Uses small angle approximation
-    for segs, ang in zip(indices, values):
-        angy = -ang[0]
-        L = sum([lattice[ii].length for ii in segs])
-
-        # correction of the path length
-        old_angy = lattice[segs[0]].t_in[3]
-        path = -(L/2)*((angy+old_angy)*(angy+old_angy) - old_angy*old_angy)
-
-        # Apply the errors only to the entrance of the first and exit of the
-        # last segment:
-        lattice[segs[0]].t_in += _np.array([0, 0, -(L/2)*angy, angy, 0, 0])
-        lattice[segs[-1]].t_out += _np.array(
-            [0, 0, -(L/2)*angy, -angy, 0, path])
+    _apply_rotation_errors(lattice, indices, values, coord=2, add=True)
 
 
 @_interactive
@@ -892,23 +1691,7 @@ def set_error_rotation_yaw(lattice, indices, values):
     indices, values, _ = _process_args_errors(indices, values)
 
     # set new values to first T1 and last T2
-    for segs, ang in zip(indices, values):
-        angx = -ang[0]
-        L = sum([lattice[ii].length for ii in segs])
-        # It is possible that there is a misalignment error, so:
-        misx = (lattice[segs[0]].t_in[0] - lattice[segs[-1]].t_out[0])/2
-
-        # correction of the path length
-        old_angy = lattice[segs[0]].t_in[3]
-        path = -(L/2)*(angx*angx + old_angy*old_angy)
-
-        # Apply the errors only to the entrance of the first and exit of the
-        # last segment:
-        lattice[segs[0]].t_in[0] = -(L/2)*angx+misx
-        lattice[segs[-1]].t_out[0] = -(L/2)*angx-misx
-        lattice[segs[0]].t_in[1] = angx
-        lattice[segs[-1]].t_out[1] = -angx
-        lattice[segs[-1]].t_out[5] = path
+    _apply_rotation_errors(lattice, indices, values, coord=0, add=False)
 
 
 @_interactive
@@ -931,19 +1714,7 @@ def add_error_rotation_yaw(lattice, indices, values):
     indices, values, _ = _process_args_errors(indices, values)
 
     # set new values to first T1 and last T2. Uses small angle approximation
-    for segs, ang in zip(indices, values):
-        angx = -ang[0]
-        L = sum([lattice[ii].length for ii in segs])
-
-        # correction of the path length
-        old_angx = lattice[segs[0]].t_in[1]
-        path = -(L/2)*((angx+old_angx)*(angx+old_angx) - old_angx*old_angx)
-
-        # Apply the errors only to the entrance of the first and exit of the
-        # last segment:
-        lattice[segs[0]].t_in += _np.array([-(L/2)*angx, angx, 0, 0, 0, 0])
-        lattice[segs[-1]].t_out += _np.array(
-            [-(L/2)*angx, -angx, 0, 0, 0, path])
+    _apply_rotation_errors(lattice, indices, values, coord=0, add=True)
 
 
 @_interactive
@@ -965,20 +1736,31 @@ def add_error_excitation_main(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    for segs, errors in zip(indices, values):
-        for idx, error in zip(segs, errors):
-            ele = lattice[idx]
-            if ele.angle != 0:
-                rho = ele.length / ele.angle
-                # read dipole pass method!
-                ele.polynom_b[0] += error/rho
-                # ele.polynom_a[1:] *= 1 + error
-                # ele.polynom_b[1:] *= 1 + error
-            else:
-                ele.hkick *= 1 + error
-                ele.vkick *= 1 + error
-                ele.polynom_a *= 1 + error
-                ele.polynom_b *= 1 + error
+    idcs, errors, _ = _flatten_args_errors(indices, values)
+    angle = _get_attribute_bulk(lattice, 'angle', idcs)
+    isdip = angle != 0
+
+    # dipoles:
+    idx = idcs[isdip]
+    if idx.size:
+        rho = _get_attribute_bulk(lattice, 'length', idx) / angle[isdip]
+        # read dipole pass method!
+        set_attribute_bulk(
+            lattice, 'polynom_b', idx, errors[isdip]/rho, m=0,
+            increment=True)
+
+    # other elements:
+    idx, factors = _combine_duplicates(
+        idcs[~isdip], 1 + errors[~isdip], _np.multiply)
+    if idx.size:
+        hkick = _get_attribute_bulk(lattice, 'hkick', idx)
+        vkick = _get_attribute_bulk(lattice, 'vkick', idx)
+        set_attribute_bulk(lattice, 'hkick', idx, hkick*factors)
+        set_attribute_bulk(lattice, 'vkick', idx, vkick*factors)
+        eles = _get_trackcpp_elements(lattice, idx)
+        for ele, fac in zip(eles, factors):
+            ele.polynom_a[:] = [val*fac for val in ele.polynom_a]
+            ele.polynom_b[:] = [val*fac for val in ele.polynom_b]
 
 
 @_interactive
@@ -1000,13 +1782,15 @@ def add_error_excitation_kdip(lattice, indices, values):
     # processes arguments
     indices, values, _ = _process_args_errors(indices, values)
 
-    for segs, errors in zip(indices, values):
-        for idx, error in zip(segs, errors):
-            ele = lattice[idx]
-            if ele.angle == 0:
-                raise TypeError(
-                    'lattice[{0:d}] is not a Bending Magnet.'.format(idx))
-            ele.polynom_b[1] *= 1 + error
+    idcs, errors, _ = _flatten_args_errors(indices, values)
+    angle = _get_attribute_bulk(lattice, 'angle', idcs)
+    if _np.any(angle == 0):
+        idx = idcs[angle == 0][0]
+        raise TypeError(
+            'lattice[{0:d}] is not a Bending Magnet.'.format(idx))
+    idcs, factors = _combine_duplicates(idcs, 1 + errors, _np.multiply)
+    kdip = _get_attribute_bulk(lattice, 'polynom_b', idcs, m=1)
+    set_attribute_bulk(lattice, 'polynom_b', idcs, kdip*factors, m=1)
 
 
 @_interactive
@@ -1071,8 +1855,9 @@ def add_error_multipoles(lattice, indices, r0, main_monom, Bn_norm=None,
 
     indices, *_ = _process_args_errors(indices, 0.0)
 
+    main_monom = _np.array(main_monom, dtype=int, ndmin=1)
     if len(main_monom) == 1:
-        main_monom *= _np.ones(len(indices))
+        main_monom = _np.repeat(main_monom, len(indices))
     if len(main_monom) != len(indices):
         raise IndexError(
             'Length of main_monoms differs from length of indices.')
@@ -1100,6 +1885,334 @@ def add_error_multipoles(lattice, indices, r0, main_monom, Bn_norm=None,
 
 
 # --- private functions ---
+
+_COORD_ARRAYS = ('t_in', 't_out', 'r_in', 'r_out')
+
+# attributes of query matched against the indices of the Accelerator:
+_INDEXED_ATTRIBUTES = {
+    'fam_name': 'fam_index', 'pass_method': 'pass_method_index'}
+
+_PATCH_PARAMETERS = (
+    'energy', 'harmonic_number', 'cavity_on', 'radiation_on', 'vchamber_on')
+
+
+def _coord_array_shape(attribute_name):
+    if attribute_name.startswith('t_'):
+        return (6, )
+    return (6, 6)
+
+
+def _coord_array_getter(attribute_name):
+    if attribute_name.startswith('t_'):
+        return _Element._get_coord_vector
+    return _Element._get_coord_matrix
+
+
+def _coord_array_key(attribute_name, m, n):
+    if m is None:
+        return slice(None)
+    elif n is None or attribute_name.startswith('t_'):
+        return m
+    return (m, n)
+
+
+def _get_knob_indices(lattice, fam_name):
+    fam_names = [fam_name] if isinstance(fam_name, str) else fam_name
+    indices = []
+    for fam in fam_names:
+        indices.extend(find_indices(lattice, 'fam_name', fam))
+    return indices
+
+
+def _get_trackcpp_elements(lattice, indices):
+    if isinstance(lattice, _Accelerator):
+        return lattice._get_cpp_elements(indices)
+    return [lattice[int(idx)].trackcpp_e for idx in indices]
+
+
+def _get_attribute_bulk(lattice, attribute_name, indices, m=None):
+    """Return copy of numerical attribute of many elements as numpy array."""
+    indices = _np.array(indices, dtype=int, ndmin=1)
+    eles = _get_trackcpp_elements(lattice, indices)
+    if attribute_name in _COORD_ARRAYS:
+        key = _coord_array_key(attribute_name, m, None)
+        getter = _coord_array_getter(attribute_name)
+        shape = _np.empty(_coord_array_shape(attribute_name))[key].shape
+        vals = _np.zeros(indices.shape + shape)
+        for i, ele in enumerate(eles):
+            vals[i] = getter(getattr(ele, attribute_name))[key]
+        return vals
+    elif attribute_name in ('polynom_a', 'polynom_b'):
+        return _np.array(
+            [getattr(ele, attribute_name)[m] for ele in eles], dtype=float)
+    return _np.array(
+        [getattr(ele, attribute_name) for ele in eles],
+        dtype=_SCALAR_ATTRS[attribute_name])
+
+
+def _read_flat_file(filename):
+    energy = _mp.constants.electron_rest_energy*_mp.units.joule_2_eV
+    acc = _Accelerator(energy=energy)  # energy cannot be zero
+    fname = _trackcpp.String(filename)
+    rd_ = _trackcpp.read_flat_file_wrapper(fname, acc.trackcpp_acc, True)
+    if rd_ > 0:
+        raise LatticeError(_trackcpp.string_error_messages[rd_])
+    return acc
+
+
+def _get_flat_file_key(filename):
+    try:
+        stat = _os.stat(filename)
+    except OSError as err:
+        raise LatticeError(str(err)) from err
+    return (_os.path.realpath(filename), stat.st_mtime_ns, stat.st_size)
+
+
+def _store_flat_file_cache(key, arrs):
+    _FLAT_FILE_CACHE.pop(key, None)
+    _FLAT_FILE_CACHE[key] = arrs
+    while len(_FLAT_FILE_CACHE) > max(FLAT_FILE_CACHE_SIZE, 0):
+        del _FLAT_FILE_CACHE[next(iter(_FLAT_FILE_CACHE))]
+
+
+def _get_flat_file_selector(indices):
+    """Return function which selects indices and the largest index."""
+    if indices is None:
+        return (lambda idx: True), _math.inf
+    if isinstance(indices, slice):
+        start, stop, step = indices.start, indices.stop, indices.step
+        start, step = start or 0, step or 1
+        if start < 0 or (stop is not None and stop < 0) or step < 0:
+            raise LatticeError('negative indices are not supported')
+        last = _math.inf if stop is None else stop - 1
+        return (lambda idx: idx >= start and (idx - start) % step == 0), last
+    indices = set(int(idx) for idx in _np.array(indices, ndmin=1))
+    if indices and min(indices) < 0:
+        raise LatticeError('negative indices are not supported')
+    return indices.__contains__, max(indices, default=-1)
+
+
+def _add_flat_file_block(block, idx, fam_names, blocks, selected):
+    if block is None:
+        return
+    if fam_names is not None:
+        fam = next((
+            line.split()[1] for line in block
+            if line.startswith('fam_name') and len(line.split()) > 1), '')
+        if fam not in fam_names:
+            return
+    blocks.append(block)
+    selected.append(idx)
+
+
+def _get_range_mask(values, limits):
+    """Return mask of values inside the inclusive range (min, max)."""
+    vmin, vmax = limits
+    mask = _np.ones(values.shape, dtype=bool)
+    if vmin is not None:
+        mask &= values >= vmin
+    if vmax is not None:
+        mask &= values <= vmax
+    return mask
+
+
+def _get_diff_columns(arrs):
+    """Return per element columns of the output of _get_state_arrays."""
+    cols = {
+        'fam_name': arrs['fam_names'][arrs['fam_codes']],
+        'pass_method': arrs['pass_method'],
+        }
+    for attr in _SCALAR_ATTRS:
+        if attr != 'kicktable_idx':
+            cols[attr] = arrs[attr]
+    # code -1, meaning no kicktable, selects the appended empty name:
+    files = _np.append(arrs['kicktable_files'], '')
+    cols['kicktable'] = files[arrs['kicktable_codes']]
+    for attr in ('polynom_a', 'polynom_b'):
+        sizes = arrs[attr + '_sizes']
+        pols = _np.zeros((sizes.size, sizes.max(initial=0)))
+        pols[_np.arange(pols.shape[1]) < sizes[:, None]] = arrs[attr]
+        cols[attr] = (sizes, pols)
+    for attr in _COORD_ARRAYS + ('matrix66', ):
+        cols[attr] = arrs[attr]
+    return cols
+
+
+def _get_diff_mask(col_a, col_b):
+    """Return mask of the rows of col_a and col_b that differ."""
+    mask = col_a != col_b
+    if col_a.dtype.kind == 'f':
+        mask &= ~(_np.isnan(col_a) & _np.isnan(col_b))
+    return mask.reshape(mask.shape[0], -1).any(axis=1)
+
+
+def _flatten_args_errors(indices, values):
+    """Return flat indices, values and the group of each index."""
+    vals = [val for vals_ in values for val in vals_]
+    if isinstance(indices, SegmentGroups):
+        return indices.indices, _np.array(vals, dtype=float), indices.groups
+    idcs = [idx for segs in indices for idx in segs]
+    grps = [i for i, segs in enumerate(indices) for _ in segs]
+    return (
+        _np.array(idcs, dtype=int), _np.array(vals, dtype=float),
+        _np.array(grps, dtype=int))
+
+
+def _get_groups_edges(indices):
+    """Return indices of first and last segments of each group."""
+    if isinstance(indices, SegmentGroups):
+        lens = _np.bincount(indices.groups, minlength=len(indices))
+        lasts = _np.cumsum(lens) - 1
+        return indices.indices[lasts - lens + 1], indices.indices[lasts]
+    firsts = _np.array([segs[0] for segs in indices], dtype=int)
+    lasts = _np.array([segs[-1] for segs in indices], dtype=int)
+    return firsts, lasts
+
+
+def _get_groups_lengths(lattice, indices):
+    idcs, _, grps = _flatten_args_errors(indices, [[]]*len(indices))
+    leng = _get_attribute_bulk(lattice, 'length', idcs)
+    return _np.bincount(grps, weights=leng, minlength=len(indices))
+
+
+def _combine_duplicates(idcs, values, ufunc):
+    """Return unique indices and values of repeated indices combined.
+
+    Used where values are read and written in bulk, so that repeated
+    indices get all their errors, as when they are applied one by one.
+
+    """
+    uniq, inv = _np.unique(idcs, return_inverse=True)
+    if uniq.size == idcs.size:
+        return idcs, values
+    comb = _np.full(uniq.size, ufunc.identity, dtype=float)
+    ufunc.at(comb, inv, values)
+    return uniq, comb
+
+
+def _split_in_rounds(*idcs):
+    """Return positions of operations split in rounds without repetitions.
+
+    Operations conflict when they share an index in any of the arrays of
+    idcs. Each operation goes to the round after the last one holding a
+    conflicting operation, so that applying the rounds in bulk, one after
+    the other, is equivalent to applying the operations one by one.
+
+    """
+    nrops = len(idcs[0])
+    if all(_np.unique(idx).size == nrops for idx in idcs):
+        return [_np.arange(nrops)]
+    rounds = _np.zeros(nrops, dtype=int)
+    lasts = [dict() for _ in idcs]
+    for i in range(nrops):
+        rnd = max(lst.get(idx[i], -1) for lst, idx in zip(lasts, idcs)) + 1
+        for lst, idx in zip(lasts, idcs):
+            lst[idx[i]] = rnd
+        rounds[i] = rnd
+    return [_np.nonzero(rounds == rnd)[0] for rnd in range(rounds.max()+1)]
+
+
+def _get_rotation_matrices(angles):
+    cos, sin = _np.cos(angles), _np.sin(angles)
+    rot = _np.zeros((len(angles), 6, 6))
+    for i in range(4):
+        rot[:, i, i] = cos
+    rot[:, 4, 4] = 1.0
+    rot[:, 5, 5] = 1.0
+    rot[:, 0, 2], rot[:, 1, 3] = sin, sin
+    rot[:, 2, 0], rot[:, 3, 1] = -sin, -sin
+    return rot
+
+
+def _apply_roll_errors(lattice, idcs, angles, add):
+    angle = _get_attribute_bulk(lattice, 'angle', idcs)
+    leng = _get_attribute_bulk(lattice, 'length', idcs)
+    isdip = (angle != 0) & (leng != 0)
+
+    # repeated indices compose with the previous errors, so they are
+    # applied in rounds:
+    for sel in _split_in_rounds(idcs):
+        dip = isdip[sel]
+
+        # dipoles: rotation is applied to the reference orbit, through the
+        # first components of the polynoms (look at bndpolysymplectic4pass):
+        idx, ang = idcs[sel][dip], angles[sel][dip]
+        if idx.size:
+            cos, sin = _np.cos(ang), _np.sin(ang)
+            rho = leng[sel][dip] / angle[sel][dip]
+            orig_s = _get_attribute_bulk(lattice, 'polynom_a', idx, m=0)*rho
+            orig_c = _get_attribute_bulk(
+                lattice, 'polynom_b', idx, m=0)*rho + 1
+            # sin(teta)/rho:
+            set_attribute_bulk(
+                lattice, 'polynom_a', idx, (orig_s*cos + orig_c*sin)/rho,
+                m=0)
+            # (cos(teta)-1)/rho:
+            set_attribute_bulk(
+                lattice, 'polynom_b', idx, (orig_c*cos - orig_s*sin - 1)/rho,
+                m=0)
+
+        # other elements:
+        idx, ang = idcs[sel][~dip], angles[sel][~dip]
+        if idx.size:
+            rot = _get_rotation_matrices(ang)
+            rot_t = rot.transpose(0, 2, 1)
+            if add:
+                r_in = _get_attribute_bulk(lattice, 'r_in', idx)
+                r_out = _get_attribute_bulk(lattice, 'r_out', idx)
+                rot = _np.matmul(rot, r_in)
+                rot_t = _np.matmul(r_out, rot_t)
+            set_attribute_bulk(lattice, 'r_in', idx, rot)
+            set_attribute_bulk(lattice, 'r_out', idx, rot_t)
+
+
+def _apply_rotation_errors(lattice, indices, values, coord, add):
+    """Apply pitch (coord=2) or yaw (coord=0) errors to groups of segments.
+
+    The errors are applied only to the entrance of the first and exit of
+    the last segment of each group.
+
+    """
+    angs = -_np.array([ang[0] for ang in values], dtype=float)
+    lens = _get_groups_lengths(lattice, indices)
+    firsts, lasts = _get_groups_edges(indices)
+
+    # repeated groups read the errors of the previous ones, so they are
+    # applied in rounds:
+    for sel in _split_in_rounds(firsts, lasts):
+        ang, hlen = angs[sel], lens[sel]/2
+        first, last = firsts[sel], lasts[sel]
+        if add:
+            # correction of the path length
+            old_ang = _get_attribute_bulk(lattice, 't_in', first, m=coord+1)
+            path = -hlen*((ang+old_ang)*(ang+old_ang) - old_ang*old_ang)
+
+            dt_in = _np.zeros((len(first), 6))
+            dt_in[:, coord], dt_in[:, coord+1] = -hlen*ang, ang
+            dt_out = _np.zeros((len(last), 6))
+            dt_out[:, coord], dt_out[:, coord+1] = -hlen*ang, -ang
+            dt_out[:, 5] = path
+            set_attribute_bulk(lattice, 't_in', first, dt_in, increment=True)
+            set_attribute_bulk(lattice, 't_out', last, dt_out, increment=True)
+            continue
+
+        t_in = _get_attribute_bulk(lattice, 't_in', first)
+        t_out = _get_attribute_bulk(lattice, 't_out', last)
+
+        # It is possible that there is a misalignment error, so:
+        mis = (t_in[:, coord] - t_out[:, coord])/2
+
+        # correction of the path length, with the angle of the other plane:
+        old_ang = t_in[:, 3-coord]
+        path = -hlen*(ang*ang + old_ang*old_ang)
+
+        set_attribute_bulk(lattice, 't_in', first, -hlen*ang + mis, m=coord)
+        set_attribute_bulk(lattice, 't_out', last, -hlen*ang - mis, m=coord)
+        set_attribute_bulk(lattice, 't_in', first, ang, m=coord+1)
+        set_attribute_bulk(lattice, 't_out', last, -ang, m=coord+1)
+        set_attribute_bulk(lattice, 't_out', last, path, m=5)
+
+
 def _process_args_errors(indices, values):
     types = (int, _np.int_)
     isflat = False
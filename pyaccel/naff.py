@@ -7,6 +7,8 @@ size of the chaotic zones, Icarus, Volume 88, Issue 2,1990, Pages 266-291.
 (https://www.sciencedirect.com/science/article/pii/001910359090084M)
 """
 
+import multiprocessing as _multiproc
+
 import numpy as _np
 
 import trackcpp as _trackcpp
@@ -14,23 +16,51 @@ import trackcpp as _trackcpp
 from .utils import interactive as _interactive
 
 
+ENGINES = ('trackcpp', 'numpy')
+
+# Number of golden-section iterations used to locate the peak before the
+# Newton refinement, and maximum number of Newton iterations:
+_NR_GOLDEN_ITERS = 20
+_NR_NEWTON_ITERS = 8
+_GOLDEN_RATIO = (_np.sqrt(5) - 1) / 2
+
+# Shared arrays and arguments of the worker processes of naff_general:
+_WORKER_DATA = dict()
+
+
 class NaffException(Exception):
     """."""
 
 
 @_interactive
-def naff_general(signal, is_real=True, nr_ff=2, window=1):
+def naff_general(
+        signal, is_real=True, nr_ff=2, window=1, chunk_size=None,
+        parallel=False, engine='trackcpp'):
     """Calculate the first `nr_ff` fundamental frequencies of `signal`.
 
     Inputs:
         signal -- 1D or 2D Numpy array. In case of 2D Numpy array NAFF will
-            be applied to each row of `signal`;
-        is_real -- Whether to consider `signal` as real;
+            be applied to each row of `signal`. Complex signals, such as
+            x - 1j*px, may be given directly;
+        is_real -- Whether to consider `signal` as real. If None, it is
+            inferred from the dtype of `signal` (default = True);
         nr_ff -- Number of fundamental frequencies to return (default = 2);
         window -- Which window to use:  (default = 1)
             0 -- no window;
             1, 2, 3, ... -- Powers of Hanning window;
             -1 -- Exponential window;
+        chunk_size -- Maximum number of rows of `signal` processed in each
+            call to trackcpp. Bounds the memory used by the temporary real
+            and imaginary copies of the signal. If None, all rows are
+            processed at once (or split evenly among processes, when
+            `parallel` is set) (default = None);
+        parallel -- whether to parallelize calculation or not. If an integer
+            is passed that many processes will be used. If True, the number
+            of processes will be determined automatically (default = False);
+        engine -- Which implementation to use:  (default = 'trackcpp')
+            'trackcpp' -- NAFF implemented in trackcpp;
+            'numpy' -- vectorized implementation in Numpy, which processes
+                all rows of each chunk at once. See `naff_numpy`.
 
     Outputs:
         freqs -- fundamental frequencies.
@@ -40,11 +70,409 @@ def naff_general(signal, is_real=True, nr_ff=2, window=1):
         fourier -- Fourier component of the given frequencies.
             Numpy array of complex numbers with same shape as freqs.
     """
+    if engine not in ENGINES:
+        raise NaffException(
+            'engine must be one of: ' + ', '.join(ENGINES) + '.')
+
+    signal = _process_signal(signal)
+    if is_real is None:
+        is_real = not _np.iscomplexobj(signal)
+
+    nr_rows = signal.shape[0]
+    freqs = _np.zeros((nr_rows, nr_ff))
+    fourier = _np.zeros((nr_rows, nr_ff), dtype=complex)
+    if not nr_rows:
+        return _np.squeeze(freqs), _np.squeeze(fourier)
+
+    if not parallel:
+        for slc in _get_slices_chunks(nr_rows, chunk_size):
+            freqs[slc], fourier[slc] = _naff_general(
+                signal[slc], is_real, nr_ff, window, engine)
+    else:
+        nrproc = _get_number_of_processes(parallel, nr_rows)
+        if chunk_size is None:
+            chunk_size = -(-nr_rows // nrproc)
+        slcs = _get_slices_chunks(nr_rows, chunk_size)
+        # signal and results live in shared memory, so that only the
+        # slices of each chunk are sent to the processes:
+        arrays = [
+            _get_shared_array(signal.shape, signal.dtype),
+            _get_shared_array(freqs.shape, freqs.dtype),
+            _get_shared_array(fourier.shape, fourier.dtype)]
+        signal_sh, freqs, fourier = [_get_array(*arr) for arr in arrays]
+        signal_sh[:] = signal
+        initargs = (arrays, (is_real, nr_ff, window, engine))
+        with _multiproc.Pool(
+                processes=min(nrproc, len(slcs)),
+                initializer=_init_worker, initargs=initargs) as pool:
+            pool.map(_naff_general_chunk, slcs)
+
+    fourier = _np.squeeze(fourier)
+    freqs = _np.squeeze(freqs)
+
+    return freqs, fourier
+
+
+@_interactive
+def naff_numpy(signal, is_real=None, nr_ff=2, window=1, freq_guess=None):
+    """Calculate fundamental frequencies of `signal` with Numpy only.
+
+    Vectorized implementation of NAFF, mainly intended for large batches of
+    signals and as a reference for the trackcpp implementation. All rows of
+    `signal` are processed simultaneously:
+
+        1. the initial guess of each frequency is the peak of the FFT of the
+           windowed signal (or `freq_guess`, for the first frequency);
+        2. the peak of the Fourier integral, computed with Hardy's rule, is
+           bracketed by golden-section iterations and refined with Newton
+           steps on its derivative;
+        3. the components found are subtracted from the signal in bulk and
+           the procedure is repeated for the next frequency.
+
+    Memory use is of order `signal.size`, so very large batches should be
+    split with the `chunk_size` argument of `naff_general`.
+
+    Inputs:
+        signal -- 1D or 2D Numpy array. In case of 2D Numpy array NAFF will
+            be applied to each row of `signal`;
+        is_real -- Whether to consider `signal` as real. If None, it is
+            inferred from the dtype of `signal` (default = None);
+        nr_ff -- Number of fundamental frequencies to return (default = 2);
+        window -- Which window to use:  (default = 1)
+            0 -- no window;
+            1, 2, 3, ... -- Powers of Hanning window;
+            -1 -- Exponential window;
+        freq_guess -- float or 1D Numpy array with one value per row. When
+            given, it replaces the FFT guess of the first frequency
+            (default = None).
+
+    Outputs:
+        freqs -- fundamental frequencies, in the interval [-0.5, 0.5), or
+            [0, 0.5] for real signals. Numpy array with shape
+            `(signal.shape[0], nr_ff)`;
+        fourier -- Fourier component of the given frequencies.
+            Numpy array of complex numbers with same shape as freqs.
+    """
+    signal = _process_signal(signal)
+    if is_real is None:
+        is_real = not _np.iscomplexobj(signal)
+    freqs, fourier = _naff_numpy(signal, is_real, nr_ff, window, freq_guess)
+    return _np.squeeze(freqs), _np.squeeze(fourier)
+
+
+@_interactive
+class TuneTracker:
+    """Sliding-window NAFF for tune as a function of turn number.
+
+    Turn-by-turn data is consumed in blocks of arbitrary size, for instance
+    generated by successive calls to `pyaccel.tracking.ring_pass`:
+
+        >>> tracker = TuneTracker(window_size=601, step=100)
+        >>> for _ in range(nr_blocks):
+        >>>     traj, *_ = ring_pass(acc, part, nr_turns=200,
+        >>>                          turn_by_turn=True)
+        >>>     part = traj[:, -1]
+        >>>     turns, tunes, amps, phases = tracker.update(
+        >>>         traj[0, :-1] - 1j*traj[1, :-1])
+
+    Only the last `window_size` turns are kept in memory. The fundamental
+    frequency of each window is calculated with `naff_numpy`, using the
+    frequency of the previous window as initial guess, so the FFT is
+    performed only for the first window. The guess is searched only within
+    the resolution of the window, so when the amplitude found drops below
+    half of that of the previous window, as after a jump of the tune, the
+    window is analysed again starting from the FFT.
+
+    Args:
+        window_size (int): number of turns of each window. It is reduced to
+            the largest number of the form 6*q + 1 not larger than it.
+        step (int): number of turns between the start of consecutive
+            windows.
+        is_real (bool, optional): Whether to consider the signal as real. If
+            None, it is inferred from the dtype of the first block.
+            Defaults to None.
+        window (int, optional): Which window to use. See `naff_numpy`.
+            Defaults to 1.
+
+    """
+
+    def __init__(self, window_size, step, is_real=None, window=1):
+        """."""
+        window_size = int(window_size)
+        if window_size < 7:
+            raise NaffException('window_size must be at least 7.')
+        if int(step) < 1:
+            raise NaffException('step must be a positive integer.')
+        self._window_size = window_size - (window_size - 1) % 6
+        self._step = int(step)
+        self._is_real = is_real
+        self._window = window
+        self._buffer = None
+        self._buffer_start = 0
+        self._next_start = 0
+        self._guess = None
+        self._amps = None
+        self._turns = []
+        self._tunes = []
+        self._fourier = []
+
+    @property
+    def window_size(self):
+        """Number of turns of each window."""
+        return self._window_size
+
+    @property
+    def step(self):
+        """Number of turns between consecutive windows."""
+        return self._step
+
+    @property
+    def turns(self):
+        """First turn of each window already analysed."""
+        return _np.array(self._turns, dtype=int)
+
+    @property
+    def tunes(self):
+        """Fundamental frequency of each window already analysed."""
+        return _np.squeeze(_np.array(self._tunes))
+
+    @property
+    def amplitudes(self):
+        """Amplitude of the fundamental frequency of each window."""
+        return _np.squeeze(_np.abs(_np.array(self._fourier)))
+
+    @property
+    def phases(self):
+        """Phase of the fundamental frequency of each window."""
+        return _np.squeeze(_np.angle(_np.array(self._fourier)))
+
+    def update(self, block):
+        """Consume a new block of turns and analyse all complete windows.
+
+        Args:
+            block (numpy.ndarray): 1D array with one signal or 2D array with
+                one signal per row. The second index runs over turns.
+
+        Returns:
+            turns (numpy.ndarray): first turn of each new window;
+            tunes (numpy.ndarray): fundamental frequencies of the new
+                windows. The first index runs over windows;
+            amplitudes (numpy.ndarray): their amplitudes;
+            phases (numpy.ndarray): their phases.
+
+        """
+        block = _np.asarray(block)
+        if block.ndim == 1:
+            block = block[None, :]
+        if block.ndim > 2:
+            raise NaffException('Wrong number of dimensions for input array.')
+        if self._is_real is None:
+            self._is_real = not _np.iscomplexobj(block)
+
+        if self._buffer is None:
+            self._buffer = block
+        else:
+            self._buffer = _np.concatenate([self._buffer, block], axis=1)
+
+        turns, tunes, fourier = [], [], []
+        while True:
+            ini = self._next_start - self._buffer_start
+            if ini + self._window_size > self._buffer.shape[1]:
+                break
+            signal = self._buffer[:, ini:ini+self._window_size]
+            freqs, four = _naff_numpy(
+                signal, self._is_real, 1, self._window, self._guess)
+            if self._guess is not None:
+                lost = _np.abs(four[:, 0]) < self._amps/2
+                if lost.any():
+                    freqs[lost], four[lost] = _naff_numpy(
+                        signal[lost], self._is_real, 1, self._window)
+            self._guess = freqs[:, 0]
+            self._amps = _np.abs(four[:, 0])
+            turns.append(self._next_start)
+            tunes.append(freqs[:, 0])
+            fourier.append(four[:, 0])
+            self._next_start += self._step
+
+        # discard turns that will not be used by future windows:
+        ini = min(
+            self._next_start - self._buffer_start, self._buffer.shape[1])
+        self._buffer = self._buffer[:, ini:]
+        self._buffer_start += ini
+
+        self._turns.extend(turns)
+        self._tunes.extend(tunes)
+        self._fourier.extend(fourier)
+        fourier = _np.array(fourier).reshape(-1, block.shape[0])
+        tunes = _np.array(tunes).reshape(-1, block.shape[0])
+        return (
+            _np.array(turns, dtype=int), _np.squeeze(tunes),
+            _np.squeeze(_np.abs(fourier)), _np.squeeze(_np.angle(fourier)))
+
+
+def _naff_general(signal, is_real, nr_ff, window, engine):
+    if engine == 'numpy':
+        return _naff_numpy(signal, is_real, nr_ff, window)
+
+    nr_rows = signal.shape[0]
+    freqs = _np.zeros((nr_rows, nr_ff))
+    real = _np.zeros((nr_rows, nr_ff))
+    imag = _np.zeros((nr_rows, nr_ff))
+    if _np.iscomplexobj(signal):
+        sig_real = _np.ascontiguousarray(signal.real, dtype=float)
+        sig_imag = _np.ascontiguousarray(signal.imag, dtype=float)
+    else:
+        sig_real = _np.ascontiguousarray(signal, dtype=float)
+        sig_imag = _np.zeros(signal.shape)
+    _trackcpp.naff_general_wrapper(
+        sig_real, sig_imag, is_real, nr_ff, window, freqs, real, imag)
+    return freqs, real + 1j*imag
+
+
+def _get_shared_array(shape, dtype):
+    dtype = _np.dtype(dtype)
+    size = int(_np.prod(shape))*dtype.itemsize
+    return _multiproc.RawArray('b', max(size, 1)), shape, dtype
+
+
+def _get_array(raw, shape, dtype):
+    size = int(_np.prod(shape))
+    return _np.frombuffer(raw, dtype=dtype, count=size).reshape(shape)
+
+
+def _init_worker(arrays, args):
+    _WORKER_DATA['arrays'] = [_get_array(*arr) for arr in arrays]
+    _WORKER_DATA['args'] = args
+
+
+def _naff_general_chunk(slc):
+    signal, freqs, fourier = _WORKER_DATA['arrays']
+    freqs[slc], fourier[slc] = _naff_general(
+        signal[slc], *_WORKER_DATA['args'])
+
+
+def _naff_numpy(signal, is_real, nr_ff, window, freq_guess=None):
+    # work on a copy, since the components found are subtracted from it:
+    signal = _np.array(signal, dtype=complex)
+    if is_real:
+        signal.imag = 0.0
+    nr_rows, nr_pts = signal.shape
+    turns = _np.arange(nr_pts)
+    win = _get_window(window, nr_pts)
+    weights = win * _get_hardy_weights(nr_pts)
+    weights /= weights.sum()
+
+    freqs = _np.zeros((nr_rows, nr_ff))
+    fourier = _np.zeros((nr_rows, nr_ff), dtype=complex)
+    fftfreqs = _np.fft.fftfreq(nr_pts)
+    half = 1 / nr_pts
+    for i in range(nr_ff):
+        wsig = signal * weights
+        if i == 0 and freq_guess is not None:
+            center = _np.broadcast_to(
+                _np.asarray(freq_guess, dtype=float), (nr_rows, )).copy()
+        else:
+            # Hardy's weights are not used here to avoid aliasing:
+            spec = _np.abs(_np.fft.fft(signal * win, axis=1))
+            if is_real:
+                spec[:, fftfreqs < 0] = 0.0
+            center = fftfreqs[_np.argmax(spec, axis=1)]
+
+        freq = _find_peak(wsig, turns, center-half, center+half)
+        if is_real:
+            freq = _np.abs(freq)
+        amp = _fourier_integral(wsig, turns, freq)
+        freqs[:, i] = freq
+        fourier[:, i] = amp
+
+        comp = amp[:, None] * _np.exp(2j*_np.pi*freq[:, None]*turns[None, :])
+        if is_real:
+            signal -= 2*comp.real
+        else:
+            signal -= comp
+    return freqs, fourier
+
+
+def _fourier_integral(wsig, turns, freq, derivs=False):
+    expo = _np.exp(-2j*_np.pi*freq[:, None]*turns[None, :])
+    prod = wsig * expo
+    amp = prod.sum(axis=1)
+    if not derivs:
+        return amp
+    fac = -2j*_np.pi*turns
+    prod *= fac
+    damp = prod.sum(axis=1)
+    prod *= fac
+    ddamp = prod.sum(axis=1)
+    return amp, damp, ddamp
+
+
+def _find_peak(wsig, turns, low, high):
+    # golden-section search of the maximum of |A(f)| in [low, high]:
+    low, high = low.copy(), high.copy()
+    pt1 = high - _GOLDEN_RATIO*(high-low)
+    pt2 = low + _GOLDEN_RATIO*(high-low)
+    val1 = _np.abs(_fourier_integral(wsig, turns, pt1))
+    val2 = _np.abs(_fourier_integral(wsig, turns, pt2))
+    for _ in range(_NR_GOLDEN_ITERS):
+        left = val1 > val2
+        high = _np.where(left, pt2, high)
+        low = _np.where(left, low, pt1)
+        newpt = _np.where(
+            left, high - _GOLDEN_RATIO*(high-low),
+            low + _GOLDEN_RATIO*(high-low))
+        newval = _np.abs(_fourier_integral(wsig, turns, newpt))
+        pt1, pt2, val1, val2 = (
+            _np.where(left, newpt, pt2), _np.where(left, pt1, newpt),
+            _np.where(left, newval, val2), _np.where(left, val1, newval))
+    freq = (pt1 + pt2) / 2
+
+    # Newton steps on the derivative of |A(f)|^2:
+    for _ in range(_NR_NEWTON_ITERS):
+        amp, damp, ddamp = _fourier_integral(wsig, turns, freq, derivs=True)
+        grad = (amp.conj() * damp).real
+        hess = (damp.conj() * damp).real + (amp.conj() * ddamp).real
+        with _np.errstate(divide='ignore', invalid='ignore'):
+            step = _np.where(hess < 0, grad/hess, 0.0)
+        newfreq = freq - step
+        newfreq = _np.where(
+            (newfreq >= low) & (newfreq <= high), newfreq, freq)
+        if _np.array_equal(newfreq, freq):
+            break
+        freq = newfreq
+    return freq
+
+
+def _get_window(window, nr_pts):
+    if window == 0:
+        return _np.ones(nr_pts)
+    tim = _np.linspace(0, 1, nr_pts)
+    if window > 0:
+        return (1 - _np.cos(2*_np.pi*tim))**window
+    if window == -1:
+        win = _np.zeros(nr_pts)
+        tim = tim[1:-1]
+        win[1:-1] = _np.exp(-1/(tim*(1-tim)))
+        return win
+    raise NaffException('Invalid window type.')
+
+
+def _get_hardy_weights(nr_pts):
+    # composite Hardy's rule, valid for nr_pts = 6*q + 1 points:
+    weights = _np.zeros(nr_pts)
+    panel = _np.array([28, 162, 0, 220, 0, 162, 28], dtype=float)
+    for i in range(0, nr_pts-1, 6):
+        weights[i:i+7] += panel
+    return weights
+
+
+def _process_signal(signal):
+    signal = _np.asarray(signal)
     if signal.ndim == 1:
         signal = signal[None, :]
 
     if signal.ndim > 2:
-        NaffException('Wrong number of dimensions for input array.')
+        raise NaffException('Wrong number of dimensions for input array.')
 
     if (signal.shape[1]-1) % 6:
         q, r = divmod(signal.shape[1], 6)
@@ -52,15 +480,20 @@ def naff_general(signal, is_real=True, nr_ff=2, window=1):
             q -= 1
         q = 6*q+1
         signal = signal[:, :q]
+    return signal
 
-    freqs = _np.zeros((signal.shape[0], nr_ff))
-    real = _np.zeros((signal.shape[0], nr_ff))
-    imag = _np.zeros((signal.shape[0], nr_ff))
-    _trackcpp.naff_general_wrapper(
-        signal.real, signal.imag, is_real, nr_ff, window, freqs, real, imag)
 
-    fourier = real + 1j*imag
-    fourier = _np.squeeze(fourier)
-    freqs = _np.squeeze(freqs)
+def _get_number_of_processes(parallel, nr_rows):
+    nrproc = _multiproc.cpu_count() - 3
+    nrproc = nrproc if parallel is True else parallel
+    nrproc = max(nrproc, 1)
+    return min(nrproc, max(nr_rows, 1))
 
-    return freqs, fourier
+
+def _get_slices_chunks(nr_rows, chunk_size):
+    if chunk_size is None:
+        return [slice(0, nr_rows)]
+    chunk_size = max(int(chunk_size), 1)
+    return [
+        slice(i, min(i+chunk_size, nr_rows))
+        for i in range(0, nr_rows, chunk_size)]
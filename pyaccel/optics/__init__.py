@@ -9,3 +9,4 @@ from .miscellaneous import get_chromaticities, get_mcf, get_frac_tunes, \
     get_curlyh, get_revolution_frequency, get_rf_frequency, get_rf_voltage, \
     get_revolution_period, OpticsException
 from .rad_integrals import EqParamsFromRadIntegrals
+from .incremental import IncrementalOptics
@@ -35,9 +35,9 @@ def calc_transverse_acceptance(
     # physical apertures
     hmax, hmin = _np.zeros(n_twi), _np.zeros(n_twi)
     vmax, vmin = _np.zeros(n_twi), _np.zeros(n_twi)
-    for idx, ele in enumerate(accelerator):
-        hmax[idx], hmin[idx] = ele.hmax, ele.hmin
-        vmax[idx], vmin[idx] = ele.vmax, ele.vmin
+    table = accelerator.to_table(('hmax', 'hmin', 'vmax', 'vmin'))
+    hmax[:n_acc], hmin[:n_acc] = table['hmax'], table['hmin']
+    vmax[:n_acc], vmin[:n_acc] = table['vmax'], table['vmin']
     if n_twi > n_acc:
         hmax[-1], hmin[-1] = hmax[0], hmin[0]
         vmax[-1], vmin[-1] = vmax[0], vmin[0]
@@ -89,12 +89,13 @@ def calc_touschek_energy_acceptance(
     rx0 = twi0.rx
     px0 = twi0.px
 
+    parallel = kwargs.get('twiss_parallel', False)
     # positive energies
     curh_pos, ap_phys_pos, tune_pos, beta_pos = _calc_phys_apert_for_touschek(
-        accelerator, energy_offsets, rx0, px0, hmax, hmin)
+        accelerator, energy_offsets, rx0, px0, hmax, hmin, parallel)
     # negative energies
     curh_neg, ap_phys_neg, tune_neg, beta_neg = _calc_phys_apert_for_touschek(
-        accelerator, -energy_offsets, rx0, px0, hmax, hmin)
+        accelerator, -energy_offsets, rx0, px0, hmax, hmin, parallel)
 
     # Considering synchrotron oscillations, negative energy deviations will
     # turn into positive ones and vice-versa, so the apperture must be
@@ -179,31 +180,32 @@ def calc_touschek_energy_acceptance(
 
 
 def _calc_phys_apert_for_touschek(
-        accelerator, energy_offsets, rx0, px0, hmax, hmin):
+        accelerator, energy_offsets, rx0, px0, hmax, hmin, parallel=False):
     curh = _np.full((energy_offsets.size, rx0.size), _np.inf)
     tune = _np.full((2, energy_offsets.size), _np.nan)
     ap_phys = _np.zeros(energy_offsets.size)
     beta = _np.ones(energy_offsets.size)
-    try:
-        for idx, delta in enumerate(energy_offsets):
-            twi, *_ = _calc_twiss(
-                accelerator, energy_offset=delta, indices='closed')
-            if _np.any(_np.isnan(twi[0].betax)):
-                raise _OpticsException('error')
-            tune[0, idx] = twi[-1].mux / (2*_np.pi)
-            tune[1, idx] = twi[-1].muy / (2*_np.pi)
-            beta[idx] = twi[0].betax
-            rx = twi.rx
-            px = twi.px
-            betax = twi.betax
-            dcox = rx - rx0
-            dcoxp = px - px0
-            curh[idx] = _get_curlyh(betax, twi.alphax, dcox, dcoxp)
-
-            apper_loc = _np.minimum((hmax - rx)**2, (hmin + rx)**2)
-            ap_phys[idx] = _np.min(apper_loc / betax)
-    except (_OpticsException, _tracking.TrackingException):
-        pass
+
+    twi, _ = _calc_twiss(
+        accelerator, energy_offset=energy_offsets, indices='closed',
+        parallel=parallel)
+    # consider only energies below the first one where calc_twiss failed:
+    failed = _np.logical_or.accumulate(_np.isnan(twi.betax[:, 0]))
+    twi = twi[~failed]
+    if not twi.size:
+        return curh, ap_phys, tune, beta
+
+    rx = twi.rx
+    betax = twi.betax
+    tune[0, ~failed] = twi.mux[:, -1] / (2*_np.pi)
+    tune[1, ~failed] = twi.muy[:, -1] / (2*_np.pi)
+    beta[~failed] = betax[:, 0]
+    dcox = rx - rx0
+    dcoxp = twi.px - px0
+    curh[~failed] = _get_curlyh(betax, twi.alphax, dcox, dcoxp)
+
+    apper_loc = _np.minimum((hmax - rx)**2, (hmin + rx)**2)
+    ap_phys[~failed] = _np.min(apper_loc / betax, axis=1)
     return curh, ap_phys, tune, beta
 
 
@@ -26,7 +26,8 @@ from .. import lattice as _lattice
 from .. import tracking as _tracking
 from ..utils import interactive as _interactive
 
-from .miscellaneous import OpticsException as _OpticsException
+from .miscellaneous import OpticsException as _OpticsException, \
+    _get_superperiod, _extend_periodic
 
 
 class EdwardsTeng(_np.record):
@@ -626,7 +627,7 @@ class EdwardsTengArray(_np.ndarray):
 @_interactive
 def calc_edwards_teng(
         accelerator=None, init_edteng=None, indices='open',
-        energy_offset=None):
+        energy_offset=None, symmetry=1):
     """Perform linear analysis of coupled lattices.
 
     Notation is the same as in reference [3]
@@ -660,6 +661,11 @@ def calc_edwards_teng(
                     element.
             If indices is None data will be returned only at the entrance
             of the first element. Defaults to 'open'.
+        symmetry (int, optional): number of identical superperiods of the
+            ring. The periodic solution is calculated for the first one and
+            extended to the whole ring. The superperiods are assumed to be
+            identical, which is not checked. Only for periodic solutions.
+            Defaults to 1.
 
     Returns:
         pyaccel.optics.EdwardsTengArray : array of decompositions of the
@@ -667,6 +673,13 @@ def calc_edwards_teng(
         numpy.ndarray (4x4): transfer matrix of the line/ring
 
     """
+    indices = _tracking._process_indices(accelerator, indices)
+    if symmetry != 1:
+        if init_edteng is not None:
+            raise _OpticsException(
+                'symmetry is only supported for periodic solutions')
+        accelerator = _get_superperiod(accelerator, symmetry)
+
     # Since Edwards and Teng decomposition is restricted to Symplectic 4D
     # motion, we need to turn off cavity and radiation here:
     cav_stt = accelerator.cavity_on
@@ -702,7 +715,6 @@ def calc_edwards_teng(
     m44, cum_mat = _tracking.find_m44(
         accelerator, indices='closed', fixed_point=fixed_point)
 
-    indices = _tracking._process_indices(accelerator, indices)
     edteng = EdwardsTengArray(cum_mat.shape[0])
     edteng.spos = _lattice.find_spos(accelerator, indices='closed')
 
@@ -809,6 +821,13 @@ def calc_edwards_teng(
     accelerator.cavity_on = cav_stt
     accelerator.radiation_on = rad_stt
 
+    if symmetry != 1:
+        order = EdwardsTeng.ORDER
+        edteng = _np.ndarray((edteng.size, len(order)), buffer=edteng.data)
+        edteng = _extend_periodic(
+            edteng, symmetry, [order.spos, order.mu1, order.mu2, order.dl])
+        edteng = EdwardsTengArray(edteng, copy=False)
+        m44 = _np.linalg.matrix_power(m44, symmetry)
     return edteng[indices], m44
 
 
@@ -0,0 +1,267 @@
+"""Incremental calculation of linear optics."""
+
+import numpy as _np
+
+from .. import tracking as _tracking
+from ..utils import interactive as _interactive
+
+from .twiss import Twiss as _Twiss, TwissArray as _TwissArray
+from .miscellaneous import OpticsException as _OpticsException
+
+
+@_interactive
+class IncrementalOptics:
+    """Linear optics updated incrementally when few elements change.
+
+    The 6D transfer matrices of all elements, around the closed orbit, are
+    stored in a segment tree of matrix products, whose root is the one-turn
+    matrix. After some elements of the accelerator are changed, update
+    recalculates only their matrices and the products which depend on them,
+    which costs O(k log N) matrix products for k changed elements out of N.
+    The one-turn matrix and tunes are then available at once, and the Twiss
+    parameters are obtained from all cumulative matrices, which are
+    computed level by level from the tree.
+
+    The closed orbit is calculated only when the object is created or
+    refreshed, so the matrices of updated elements are calculated around
+    the previous orbit. This is exact for changes which do not affect the
+    orbit, like quadrupole strengths with the beam on axis.
+
+    Examples:
+        >>> optics = IncrementalOptics(accelerator)
+        >>> qf_idx = accelerator.fam_index['QF']
+        >>> lattice.set_attribute_bulk(accelerator, 'K', qf_idx, 1.1)
+        >>> optics.update(qf_idx)
+        >>> optics.tunes
+        >>> twiss = optics.calc_twiss()
+
+    """
+
+    def __init__(self, accelerator, energy_offset=0.0):
+        """Calculate closed orbit and matrices of all elements.
+
+        Args:
+            accelerator (pyaccel.accelerator.Accelerator): lattice model,
+                which is not copied, so that its changes can be passed to
+                update.
+            energy_offset (float, optional): energy deviation, used only
+                when the cavity is off. Defaults to 0.0.
+
+        """
+        self._acc = accelerator
+        self._energy_offset = energy_offset
+        self._orbit = None
+        self._tree = None
+        self.refresh()
+
+    @property
+    def accelerator(self):
+        """Accelerator model."""
+        return self._acc
+
+    @property
+    def energy_offset(self):
+        """Energy deviation."""
+        return self._energy_offset
+
+    @property
+    def orbit(self):
+        """Closed orbit at the entrance of the elements and at the end."""
+        return self._orbit.copy()
+
+    @property
+    def m66(self):
+        """One-turn transfer matrix."""
+        return self._tree.total.copy()
+
+    @property
+    def tunes(self):
+        """Fractional horizontal and vertical tunes."""
+        m66 = self._tree.total
+        return _np.array(
+            [self._calc_periodic(m66, plane)[0] for plane in (0, 2)])
+
+    def refresh(self):
+        """Calculate closed orbit and matrices of all elements again."""
+        acc = self._acc
+        if acc.cavity_on:
+            self._orbit = _tracking.find_orbit6(acc, indices='closed')
+        else:
+            orb4 = _tracking.find_orbit4(
+                acc, energy_offset=self._energy_offset, indices='closed')
+            self._orbit = _np.zeros((6, orb4.shape[1]))
+            self._orbit[:4] = orb4
+            self._orbit[4] = self._energy_offset
+
+        # matrices of all elements from the cumulative ones of a single
+        # pass, as M_i = C_{i+1} C_i^-1:
+        _, cumul = _tracking.find_m66(
+            acc, indices='closed', fixed_point=self._orbit[:, 0])
+        mats = _np.linalg.solve(
+            cumul[:-1].transpose(0, 2, 1), cumul[1:].transpose(0, 2, 1))
+        self._tree = _MatrixTree(mats.transpose(0, 2, 1))
+
+    def update(self, indices):
+        """Recalculate matrices of changed elements.
+
+        Args:
+            indices (int, list, tuple, numpy.ndarray): indices of the
+                changed elements.
+
+        Raises:
+            pyaccel.optics.OpticsException: when the number of elements of
+                the accelerator changed, which requires refresh.
+
+        """
+        if len(self._acc) != self._tree.size:
+            raise _OpticsException(
+                'number of elements changed, refresh must be used')
+        indices = _np.unique(_np.array(indices, dtype=int, ndmin=1))
+        if indices.size:
+            self._tree.update(indices, self._calc_element_matrices(indices))
+
+    def calc_cumul_matrices(self, indices='open'):
+        """Return transfer matrices from the start to the elements.
+
+        Args:
+            indices (str, list, tuple, numpy.ndarray, optional): 'open',
+                'closed' or indices of the elements. Defaults to 'open'.
+
+        Returns:
+            numpy.ndarray: (len(indices), 6, 6) cumulative matrices at the
+                entrance of the elements.
+
+        """
+        indices = _tracking._process_indices(self._acc, indices)
+        return self._tree.prefixes()[indices]
+
+    def calc_twiss(self, indices='open'):
+        """Return Twiss parameters of uncoupled dynamics.
+
+        Args:
+            indices (str, list, tuple, numpy.ndarray, optional): 'open',
+                'closed' or indices of the elements. Defaults to 'open'.
+
+        Raises:
+            pyaccel.optics.OpticsException: when the motion is unstable.
+
+        Returns:
+            pyaccel.optics.TwissArray: Twiss parameters at the entrance of
+                the elements.
+
+        """
+        indices = _tracking._process_indices(self._acc, indices)
+        cumul = self._tree.prefixes()
+        m66 = self._tree.total
+        order = _Twiss.ORDER
+
+        twiss = _np.zeros((cumul.shape[0], len(order)))
+        twiss[:, order.spos] = self._acc.spos
+        cols = (order.rx, order.px, order.ry, order.py, order.de, order.dl)
+        twiss[:, cols] = self._orbit.T
+
+        planes = (
+            (0, order.betax, order.alphax, order.mux, order.etax,
+             order.etapx),
+            (2, order.betay, order.alphay, order.muy, order.etay,
+             order.etapy))
+        for plane, beta, alpha, mu, eta, etap in planes:
+            _, beta0, alpha0 = self._calc_periodic(m66, plane)
+            gamma0 = (1 + alpha0*alpha0)/beta0
+            sub = cumul[:, plane:plane+2, plane:plane+2]
+            c00, c01 = sub[:, 0, 0], sub[:, 0, 1]
+            c10, c11 = sub[:, 1, 0], sub[:, 1, 1]
+            twiss[:, beta] = c00*c00*beta0 - 2*c00*c01*alpha0 + \
+                c01*c01*gamma0
+            twiss[:, alpha] = -c00*c10*beta0 + (c00*c11 + c01*c10)*alpha0 - \
+                c01*c11*gamma0
+            phase = _np.arctan2(c01, c00*beta0 - c01*alpha0)
+            # advances of elements are small, so wrap them to (-pi, pi]:
+            dphase = _np.pi - (_np.pi - _np.diff(phase)) % (2*_np.pi)
+            twiss[1:, mu] = _np.cumsum(dphase)
+
+            mat = m66[plane:plane+2, plane:plane+2]
+            disp0 = _np.linalg.solve(
+                _np.eye(2) - mat, m66[plane:plane+2, 4])
+            disp = sub @ disp0 + cumul[:, plane:plane+2, 4]
+            twiss[:, eta], twiss[:, etap] = disp[:, 0], disp[:, 1]
+        return _TwissArray(twiss, copy=False)[indices]
+
+    # --- private methods ---
+
+    def _calc_element_matrices(self, indices):
+        """Return matrices of some elements around the stored orbit.
+
+        Each element is tracked from its own point of the orbit, so it
+        needs a separate call to find_m66. refresh gets all matrices from
+        a single pass instead.
+
+        """
+        mats = _np.zeros((indices.size, 6, 6))
+        for i, idx in enumerate(indices):
+            mats[i] = _tracking.find_m66(
+                self._acc[int(idx):int(idx)+1],
+                fixed_point=self._orbit[:, idx])
+        return mats
+
+    @staticmethod
+    def _calc_periodic(m66, plane):
+        """Return fractional tune, beta and alpha of the periodic solution."""
+        mat = m66[plane:plane+2, plane:plane+2]
+        cos = (mat[0, 0] + mat[1, 1])/2
+        if abs(cos) >= 1:
+            raise _OpticsException('unstable motion')
+        sin = _np.sign(mat[0, 1]) * _np.sqrt(1 - cos*cos)
+        tune = _np.arctan2(sin, cos) / (2*_np.pi) % 1
+        return tune, mat[0, 1]/sin, (mat[0, 0] - mat[1, 1])/(2*sin)
+
+
+class _MatrixTree:
+    """Segment tree of products of 6x6 matrices.
+
+    Leaves are stored at positions [cap, cap + size) of a complete binary
+    tree, padded with identities, and each node is the product of its
+    children, the right one multiplying on the left.
+
+    """
+
+    def __init__(self, mats):
+        self.size = mats.shape[0]
+        self.cap = 1 << max(self.size - 1, 0).bit_length()
+        self.nodes = _np.tile(_np.eye(6), (2*self.cap, 1, 1))
+        self.nodes[self.cap:self.cap+self.size] = mats
+        level = self.cap // 2
+        while level:
+            idcs = _np.arange(level, 2*level)
+            self._combine(idcs)
+            level //= 2
+
+    @property
+    def total(self):
+        """Product of all matrices."""
+        return self.nodes[1]
+
+    def update(self, indices, mats):
+        """Replace some matrices and recompute their ancestors."""
+        idcs = self.cap + indices
+        self.nodes[idcs] = mats
+        idcs = _np.unique(idcs // 2)
+        while idcs.size and idcs[0] > 0:
+            self._combine(idcs)
+            idcs = _np.unique(idcs // 2)
+
+    def prefixes(self):
+        """Return (size + 1, 6, 6) products of the first i matrices."""
+        pre = _np.empty_like(self.nodes)
+        pre[1] = _np.eye(6)
+        level = 1
+        while level < self.cap:
+            idcs = _np.arange(level, 2*level)
+            pre[2*idcs] = pre[idcs]
+            pre[2*idcs+1] = self.nodes[2*idcs] @ pre[idcs]
+            level *= 2
+        return _np.concatenate((
+            pre[self.cap:self.cap+self.size], self.total[None]))
+
+    def _combine(self, idcs):
+        self.nodes[idcs] = self.nodes[2*idcs+1] @ self.nodes[2*idcs]
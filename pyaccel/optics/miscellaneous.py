@@ -13,19 +13,18 @@ class OpticsException(Exception):
 @_interactive
 def get_rf_frequency(accelerator):
     """Return the frequency of the first RF cavity in the lattice."""
-    for e in accelerator:
-        if e.frequency != 0.0:
-            return e.frequency
+    freqs = accelerator.to_table('frequency')['frequency']
+    freqs = freqs[freqs != 0.0]
+    if freqs.size:
+        return freqs[0]
     raise OpticsException('no cavity element in the lattice')
 
 
 @_interactive
 def get_rf_voltage(accelerator):
     """Return the voltage of the first RF cavity in the lattice."""
-    voltages = []
-    for e in accelerator:
-        if e.voltage != 0.0:
-            voltages.append(e.voltage)
+    voltages = accelerator.to_table('voltage')['voltage']
+    voltages = voltages[voltages != 0.0].tolist()
     if voltages:
         if len(voltages) == 1:
             return voltages[0]
@@ -145,3 +144,39 @@ def get_curlyh(beta, alpha, x, xl):
     """."""
     gamma = (1 + alpha*alpha) / beta
     return beta*xl*xl + 2*alpha*x*xl + gamma*x*x
+
+
+def _get_superperiod(accelerator, symmetry):
+    """Return copy of the first of symmetry superperiods of accelerator."""
+    symmetry = int(symmetry)
+    nr_eles = len(accelerator)
+    if symmetry < 1 or nr_eles % symmetry:
+        raise OpticsException(
+            'number of elements is not a multiple of symmetry')
+    return accelerator[:nr_eles // symmetry]
+
+
+def _extend_periodic(data, symmetry, columns):
+    """Extend optics of one superperiod to the whole ring.
+
+    The superperiods are assumed to be identical, which is not checked.
+
+    Args:
+        data (numpy.ndarray): (nr_elements+1, nr_columns) optics of the
+            superperiod, at the entrance of its elements and at its end.
+        symmetry (int): number of superperiods of the ring.
+        columns (list): columns of data accumulated along the ring, like
+            longitudinal position, phase advances and path length deviation
+            of the orbit, which are shifted by their superperiod increments.
+
+    Returns:
+        numpy.ndarray: (symmetry*nr_elements+1, nr_columns) optics of the
+            ring.
+
+    """
+    nr_eles = data.shape[0] - 1
+    full = _np.vstack([_np.tile(data[:-1], (symmetry, 1)), data[-1:]])
+    shifts = _np.r_[_np.repeat(_np.arange(symmetry), nr_eles), symmetry - 1]
+    incs = data[-1, columns] - data[0, columns]
+    full[:, columns] += shifts[:, None] * incs
+    return full
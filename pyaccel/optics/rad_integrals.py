@@ -7,20 +7,34 @@ import mathphys as _mp
 
 from .. import lattice as _lattice
 from .. import accelerator as _accelerator
+from .. import tracking as _tracking
 
 from .twiss import calc_twiss as _calc_twiss
 from .miscellaneous import get_rf_voltage as _get_rf_voltage, \
     get_revolution_frequency as _get_revolution_frequency, \
-    get_curlyh as _get_curlyh, get_mcf as _get_mcf
+    get_curlyh as _get_curlyh, get_mcf as _get_mcf, _get_superperiod
 
 
 class EqParamsFromRadIntegrals:
     """."""
 
-    def __init__(self, accelerator, energy_offset=0.0):
-        """."""
+    def __init__(self, accelerator, energy_offset=0.0, symmetry=1):
+        """Calculate radiation integrals of the accelerator.
+
+        Args:
+            accelerator (pyaccel.accelerator.Accelerator): lattice model.
+            energy_offset (float, optional): energy deviation.
+                Defaults to 0.0.
+            symmetry (int, optional): number of identical superperiods of
+                the ring. The integrals are calculated for the first one,
+                with cavity and radiation off, and the optics is extended
+                to the whole ring. The superperiods are assumed to be
+                identical, which is not checked. Defaults to 1.
+
+        """
         self._acc = _accelerator.Accelerator()
         self._energy_offset = energy_offset
+        self._symmetry = int(symmetry)
         self._m66 = None
         self._twi = None
         self._alpha = 0.0
@@ -97,6 +111,16 @@ class EqParamsFromRadIntegrals:
         self._energy_offset = float(value)
         self._calc_radiation_integrals()
 
+    @property
+    def symmetry(self):
+        """."""
+        return self._symmetry
+
+    @symmetry.setter
+    def symmetry(self, value):
+        self._symmetry = int(value)
+        self._calc_radiation_integrals()
+
     @property
     def twiss(self):
         """."""
@@ -364,23 +388,27 @@ class EqParamsFromRadIntegrals:
     def _calc_radiation_integrals(self):
         """Calculate radiation integrals for periodic systems."""
         acc = self._acc
+        symm = self._symmetry
+        if symm != 1:
+            acc = acc[:]
+            _tracking.set_4d_tracking(acc)
         twi, m66 = _calc_twiss(
-            acc, indices='closed', energy_offset=self._energy_offset)
+            acc, indices='closed', energy_offset=self._energy_offset,
+            symmetry=symm)
         self._twi = twi
         self._m66 = m66
+        if symm != 1:
+            acc = _get_superperiod(acc, symm)
+            twi = twi[:len(acc)+1]
         self._alpha = _get_mcf(acc, energy_offset=self._energy_offset)
 
         spos = _lattice.find_spos(acc, indices='closed')
         etax, etapx, betax, alphax = twi.etax, twi.etapx, twi.betax, twi.alphax
         etay, etapy, betay, alphay = twi.etay, twi.etapy, twi.betay, twi.alphay
 
-        n = len(acc)
-        angle, angle_in, angle_out, K = _np.zeros((4, n))
-        for i in range(n):
-            angle[i] = acc[i].angle
-            angle_in[i] = acc[i].angle_in
-            angle_out[i] = acc[i].angle_out
-            K[i] = acc[i].K
+        table = acc.to_table(('angle', 'angle_in', 'angle_out', 'K'))
+        angle, angle_in = table['angle'], table['angle_in']
+        angle_out, K = table['angle_out'], table['K']
 
         idx, *_ = _np.nonzero(angle)
         leng = spos[idx+1]-spos[idx]
@@ -425,7 +453,7 @@ class EqParamsFromRadIntegrals:
         integralsx[5] = _np.dot(Hx_avg / rho3abs, leng)
         integralsx[6] = _np.dot((K*etax_avg)**2, leng)
 
-        self._integralsx = integralsx
+        self._integralsx = integralsx * symm
 
         integralsy = _np.zeros(7)
         integralsy[0] = _np.dot(etay_avg/rho, leng)
@@ -440,4 +468,4 @@ class EqParamsFromRadIntegrals:
 
         integralsy[5] = _np.dot(Hy_avg / rho3abs, leng)
         integralsy[6] = _np.dot((K*etay_avg)**2, leng)
-        self._integralsy = integralsy
+        self._integralsy = integralsy * symm
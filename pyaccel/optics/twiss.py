@@ -1,5 +1,7 @@
 """Twiss Module."""
 
+import multiprocessing as _multiproc
+
 import numpy as _np
 
 import mathphys as _mp
@@ -8,7 +10,8 @@ import trackcpp as _trackcpp
 from .. import tracking as _tracking
 from ..utils import interactive as _interactive
 
-from .miscellaneous import OpticsException as _OpticsException
+from .miscellaneous import OpticsException as _OpticsException, \
+    _get_superperiod, _extend_periodic
 
 
 class Twiss(_np.record):
@@ -399,7 +402,7 @@ class TwissArray(_np.ndarray):
 @_interactive
 def calc_twiss(
         accelerator=None, init_twiss=None, fixed_point=None,
-        indices='open', energy_offset=None):
+        indices='open', energy_offset=None, symmetry=1, parallel=False):
     """Return Twiss parameters of uncoupled dynamics.
 
     Args:
@@ -409,8 +412,19 @@ def calc_twiss(
         fixed_point (numpy.ndarray, optional): 6D position at the start of
             first element. Defaults to None.
         indices (str, optional): 'open' or 'closed'. Defaults to 'open'.
-        energy_offset (float, optional): float denoting the energy deviation
-            (used only for periodic solutions). Defaults to None.
+        energy_offset (float, numpy.ndarray, optional): float denoting the
+            energy deviation (used only for periodic solutions). If an array
+            is given, the periodic solutions of all energy deviations are
+            calculated, each closed orbit search starting from the orbit of
+            the previous energy deviation. Defaults to None.
+        symmetry (int, optional): number of identical superperiods of the
+            ring. The periodic solution is calculated for the first one and
+            extended to the whole ring. The superperiods are assumed to be
+            identical, which is not checked. Only for periodic solutions with
+            cavity off. Defaults to 1.
+        parallel (bool, int, optional): whether to split an array of energy
+            deviations among processes, or number of processes. Defaults to
+            False.
 
     Raises:
         pyaccel.tracking.TrackingException: When find_orbit fails to converge.
@@ -418,14 +432,51 @@ def calc_twiss(
             when accelerator is not configured properly.
 
     Returns:
-        Twiss: object (closed orbit data is in the objects vector)
-        numpy.ndarray: one-turn transfer matrix
+        Twiss: object (closed orbit data is in the objects vector). For an
+            array of energy deviations it is a TwissArray with shape
+            (len(energy_offset), len(indices)), where rows of energy
+            deviations whose calculation failed are filled with NaN.
+        numpy.ndarray: one-turn transfer matrix, or (len(energy_offset), 6,
+            6) matrices for an array of energy deviations.
 
     """
     indices = _tracking._process_indices(accelerator, indices)
 
-    _m66 = _trackcpp.Matrix()
-    twiss = _np.zeros((len(accelerator)+1, len(Twiss.ORDER)), dtype=_np.float)
+    if symmetry != 1:
+        if init_twiss is not None or accelerator.cavity_on:
+            raise _OpticsException(
+                'symmetry is only supported for periodic solutions with '
+                'cavity off')
+        accelerator = _get_superperiod(accelerator, symmetry)
+
+    if _np.ndim(energy_offset) > 0:
+        if init_twiss is not None or fixed_point is not None:
+            raise _OpticsException(
+                'arrays of energy_offset are only supported for periodic '
+                'solutions without fixed_point')
+        _check_periodic(accelerator)
+        energy_offset = _np.asarray(energy_offset, dtype=float).ravel()
+        if not parallel:
+            twiss, m66 = _calc_twiss_offsets(accelerator, energy_offset)
+        else:
+            slcs = _tracking._get_slices_multiprocessing(
+                parallel, energy_offset.size)
+            with _multiproc.Pool(processes=len(slcs)) as pool:
+                res = [
+                    pool.apply_async(_calc_twiss_offsets, (
+                        accelerator, energy_offset[slc])) for slc in slcs]
+                res = [re_.get() for re_ in res]
+            twiss = _np.concatenate([re_[0] for re_ in res])
+            m66 = _np.concatenate([re_[1] for re_ in res])
+        if symmetry != 1:
+            twiss = _np.array([
+                _extend_periodic(twi, symmetry, _CUMULATIVE_COLUMNS)
+                for twi in twiss])
+            m66 = _np.linalg.matrix_power(m66, symmetry)
+        twiss = twiss[:, indices]
+        twiss = TwissArray(
+            twiss.reshape(-1, len(Twiss.ORDER)), copy=False)
+        return twiss.reshape(energy_offset.size, -1), m66
 
     if init_twiss is not None:
         # as a transport line: uses init_twiss
@@ -437,34 +488,13 @@ def calc_twiss(
                 'arguments init_twiss and fixed_point are mutually exclusive')
     else:
         # as a periodic system: try to find periodic solution
-        if accelerator.harmonic_number == 0:
-            raise _OpticsException(
-                'Either harmonic number was not set or calc_twiss was'
-                'invoked for transport line without initial twiss')
+        _check_periodic(accelerator)
 
         if fixed_point is None:
-            _closed_orbit = _trackcpp.CppDoublePosVector()
             _fixed_point_guess = _trackcpp.CppDoublePos()
             if energy_offset is not None:
                 _fixed_point_guess.de = energy_offset
-
-            if not accelerator.cavity_on and not accelerator.radiation_on:
-                r = _trackcpp.track_findorbit4(
-                    accelerator.trackcpp_acc, _closed_orbit,
-                    _fixed_point_guess)
-            elif not accelerator.cavity_on and accelerator.radiation_on:
-                raise _OpticsException(
-                    'The radiation is on but the cavity is off')
-            else:
-                r = _trackcpp.track_findorbit6(
-                    accelerator.trackcpp_acc, _closed_orbit,
-                    _fixed_point_guess)
-
-            if r > 0:
-                raise _tracking.TrackingException(
-                    _trackcpp.string_error_messages[r])
-            _fixed_point = _closed_orbit[0]
-
+            _fixed_point = _find_fixed_point(accelerator, _fixed_point_guess)
         else:
             _fixed_point = _tracking._Numpy2CppDoublePos(fixed_point)
             if energy_offset is not None:
@@ -472,12 +502,83 @@ def calc_twiss(
 
         _init_twiss = _trackcpp.Twiss()
 
+    twiss, m66 = _calc_twiss_wrapper(accelerator, _fixed_point, _init_twiss)
+    if symmetry != 1:
+        twiss = _extend_periodic(twiss, symmetry, _CUMULATIVE_COLUMNS)
+        m66 = _np.linalg.matrix_power(m66, symmetry)
+    twiss = TwissArray(twiss, copy=False)
+
+    return twiss[indices], m66
+
+
+# columns of Twiss accumulated along the ring:
+_CUMULATIVE_COLUMNS = [
+    Twiss.ORDER.spos, Twiss.ORDER.mux, Twiss.ORDER.muy, Twiss.ORDER.dl]
+
+
+def _check_periodic(accelerator):
+    if accelerator.harmonic_number == 0:
+        raise _OpticsException(
+            'Either harmonic number was not set or calc_twiss was'
+            'invoked for transport line without initial twiss')
+
+
+def _find_fixed_point(accelerator, fixed_point_guess):
+    """Return closed orbit at the start of the ring as trackcpp.CppDoublePos.
+    """
+    _closed_orbit = _trackcpp.CppDoublePosVector()
+    if not accelerator.cavity_on and not accelerator.radiation_on:
+        r = _trackcpp.track_findorbit4(
+            accelerator.trackcpp_acc, _closed_orbit, fixed_point_guess)
+    elif not accelerator.cavity_on and accelerator.radiation_on:
+        raise _OpticsException(
+            'The radiation is on but the cavity is off')
+    else:
+        r = _trackcpp.track_findorbit6(
+            accelerator.trackcpp_acc, _closed_orbit, fixed_point_guess)
+
+    if r > 0:
+        raise _tracking.TrackingException(
+            _trackcpp.string_error_messages[r])
+    return _closed_orbit[0]
+
+
+def _calc_twiss_wrapper(accelerator, fixed_point, init_twiss):
+    """Return (len(accelerator)+1, len(Twiss.ORDER)) array and m66."""
+    _m66 = _trackcpp.Matrix()
+    twiss = _np.zeros((len(accelerator)+1, len(Twiss.ORDER)), dtype=float)
     r = _trackcpp.calc_twiss_wrapper(
-        accelerator.trackcpp_acc, _fixed_point, _m66, twiss, _init_twiss)
+        accelerator.trackcpp_acc, fixed_point, _m66, twiss, init_twiss)
     if r > 0:
         raise _OpticsException(_trackcpp.string_error_messages[r])
+    return twiss, _tracking._CppMatrix2Numpy(_m66)
 
-    twiss = TwissArray(twiss, copy=False)
-    m66 = _tracking._CppMatrix2Numpy(_m66)
 
-    return twiss[indices], m66
+def _calc_twiss_offsets(accelerator, energy_offsets):
+    """Return Twiss data and one-turn matrices of many energy deviations.
+
+    The closed orbit search of each energy deviation starts from the orbit
+    of the previous one. Failed calculations are filled with NaN.
+
+    """
+    nr_offsets = energy_offsets.size
+    twiss = _np.full(
+        (nr_offsets, len(accelerator)+1, len(Twiss.ORDER)), _np.nan)
+    m66 = _np.full((nr_offsets, 6, 6), _np.nan)
+    _guess = _trackcpp.CppDoublePos()
+    for i, delta in enumerate(energy_offsets):
+        _guess.de = float(delta)
+        try:
+            _fixed_point = _find_fixed_point(accelerator, _guess)
+            twi, mat = _calc_twiss_wrapper(
+                accelerator, _fixed_point, _trackcpp.Twiss())
+        except (_OpticsException, _tracking.TrackingException):
+            _guess = _trackcpp.CppDoublePos()
+            continue
+        if _np.isnan(twi[0, Twiss.ORDER.betax]):
+            _guess = _trackcpp.CppDoublePos()
+            continue
+        twiss[i], m66[i] = twi, mat
+        _guess = _tracking._Numpy2CppDoublePos(
+            _tracking._CppDoublePos2Numpy(_fixed_point))
+    return twiss, m66
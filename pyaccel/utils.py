@@ -35,23 +35,67 @@ def deprecated(function):
     return new_function
 
 
+def _get_ufunc_targets(method, inputs, kwargs):
+    """Return arrays written by a ufunc call."""
+    targets = [out for out in kwargs.get('out', ()) if out is not None]
+    if method == 'at':
+        targets.append(inputs[0])
+    return targets
+
+
+def _call_ufunc(cls, ufunc, method, inputs, kwargs):
+    """Call ufunc on plain ndarray views of the instances of cls.
+
+    Results are plain arrays, except for outputs given in kwargs, which
+    are returned as they are, as required by in-place operators.
+
+    """
+    inputs = [
+        inp.view(_numpy.ndarray) if isinstance(inp, cls) else inp
+        for inp in inputs]
+    outs = kwargs.get('out')
+    if outs:
+        kwargs['out'] = tuple(
+            out.view(_numpy.ndarray) if isinstance(out, cls) else out
+            for out in outs)
+    result = getattr(ufunc, method)(*inputs, **kwargs)
+    if outs and method != 'at':
+        return outs[0] if len(outs) == 1 else outs
+    return result
+
+
 class Polynom(_numpy.ndarray):
     """."""
 
-    def __new__(cls, polynom):
+    def __new__(cls, polynom, on_change=None):
         """."""
         shape = (len(polynom),)
         array = _numpy.ndarray.__new__(cls, shape=shape)
         array[:] = polynom[:]
         array._polynom = polynom
+        array._on_change = on_change
         return array
 
     def __setitem__(self, index, value):
         """."""
         if hasattr(self, '_polynom'):
+            if self._on_change is not None:
+                self._on_change()
             self._polynom[index] = value
         super().__setitem__(index, value)
 
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """."""
+        targets = _get_ufunc_targets(method, inputs, kwargs)
+        result = _call_ufunc(Polynom, ufunc, method, inputs, kwargs)
+        # in-place operations do not call __setitem__:
+        for arr in targets:
+            if isinstance(arr, Polynom) and hasattr(arr, '_polynom'):
+                if arr._on_change is not None:
+                    arr._on_change()
+                arr._polynom[:] = [float(val) for val in arr]
+        return result
+
     def __eq__(self, other):
         """."""
         if not isinstance(other, Polynom):
@@ -6,6 +6,8 @@ import test_accelerator
 import test_tracking
 import test_lattice
 import test_optics
+import test_naff
+import test_ensemble
 
 
 suite_list = []
@@ -14,6 +16,8 @@ suite_list.append(test_accelerator.get_suite())
 suite_list.append(test_lattice.get_suite())
 suite_list.append(test_tracking.get_suite())
 suite_list.append(test_optics.get_suite())
+suite_list.append(test_naff.get_suite())
+suite_list.append(test_ensemble.get_suite())
 
 tests = unittest.TestSuite(suite_list)
 unittest.TextTestRunner(verbosity=2).run(tests)
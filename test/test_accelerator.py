@@ -1,4 +1,5 @@
 
+import pickle
 import unittest
 import numpy
 import pyaccel
@@ -109,9 +110,155 @@ class TestAcceleratorAuxMethods(unittest.TestCase):
         self.assertEqual(a[329+n].fam_name, self.the_ring[329].fam_name)
         self.assertEqual(a[329+n].length, self.the_ring[329].length)
 
+    def test_extend(self):
+        n = len(self.the_ring)
+        a = self.the_ring[:10]
+        a.extend(a)
+        a.extend(self.the_ring)
+        self.assertEqual(len(a), 20 + n)
+        self.assertEqual(a[15].fam_name, self.the_ring[5].fam_name)
+        self.assertEqual(a[20 + 329].length, self.the_ring[329].length)
+
     def test_rmul_unsupported_type(self):
         self.assertRaises(TypeError, self.rmul_the_ring_and_value, (1.0))
 
+    def test_fam_index(self):
+        mia = [1, 327, 655, 983, 1311, 1639, 1967, 2295, 2623, 2951]
+        self.assertEqual(self.the_ring.fam_index['mia'].tolist(), mia)
+        self.the_ring[2].fam_name = 'mia'
+        self.assertEqual(
+            self.the_ring.fam_index['mia'].tolist(), [1, 2] + mia[1:])
+        self.the_ring.insert(0, pyaccel.elements.marker('mia'))
+        self.assertEqual(self.the_ring.fam_index['mia'][:3].tolist(), [0, 2, 3])
+        del self.the_ring[0]
+        self.assertEqual(
+            self.the_ring.fam_index['mia'].tolist(), [1, 2] + mia[1:])
+
+    def test_spos_element_at(self):
+        spos = self.the_ring.spos
+        self.assertEqual(len(spos), len(self.the_ring) + 1)
+        self.assertAlmostEqual(spos[-1], 518.396)
+        self.assertIs(self.the_ring.spos, spos)
+
+        indices, fractions = self.the_ring.element_at([0.5, 0.625, 3.45])
+        self.assertEqual(indices.tolist(), [4, 4, 8])
+        self.assertAlmostEqual(fractions[1], 0.25)
+
+        self.the_ring[4].length = 1.0
+        self.assertIsNot(self.the_ring.spos, spos)
+        self.assertAlmostEqual(self.the_ring.spos[-1], 518.896)
+
+    def test_to_table(self):
+        table = self.the_ring.to_table()
+        self.assertEqual(
+            set(table), set(pyaccel.accelerator.Accelerator.TABLE_ATTRIBUTES))
+        self.assertAlmostEqual(sum(table['length']), 518.396)
+        for i in (0, 1, 329, 3278):
+            ele = self.the_ring[i]
+            self.assertEqual(table['fam_name'][i], ele.fam_name)
+            self.assertEqual(table['pass_method'][i], ele.pass_method)
+            self.assertEqual(table['hmax'][i], ele.hmax)
+            self.assertEqual(table['K'][i], ele.K)
+
+    def test_version_fingerprint(self):
+        version = self.the_ring.version
+        fingerprint = self.the_ring.fingerprint
+        self.assertEqual(self.the_ring[:].fingerprint, fingerprint)
+
+        self.the_ring[1].t_in[0] = 1e-6
+        self.assertGreater(self.the_ring.version, version)
+        self.assertNotEqual(self.the_ring.fingerprint, fingerprint)
+
+        version = self.the_ring.version
+        self.the_ring[1].t_in[0] = 0.0
+        self.assertGreater(self.the_ring.version, version)
+        self.assertEqual(self.the_ring.fingerprint, fingerprint)
+
+        version = self.the_ring.version
+        self.the_ring.energy = 2*self.the_ring.energy
+        self.assertGreater(self.the_ring.version, version)
+
+    def test_copy_on_write_views(self):
+        kval = self.the_ring[329].K
+        view = self.the_ring[320:340]
+        self.assertEqual(len(view), 20)
+        self.assertEqual(view[9].K, kval)
+
+        view[9].K = kval + 1
+        self.assertEqual(view[9].K, kval + 1)
+        self.assertEqual(self.the_ring[329].K, kval)
+
+        view = self.the_ring[[329, 330]]
+        ele = view[0]
+        self.the_ring[329].K = kval + 2
+        self.assertEqual(ele.K, kval)
+        self.assertEqual(view[0].K, kval)
+
+    def test_copy_on_write_reads(self):
+        kval = self.the_ring[329].K
+        view = self.the_ring[320:340]
+        polb, t_in = view[9].polynom_b, view[9].t_in
+        self.assertEqual(view[9].matrix66[0, 0], 1)
+        self.assertIsNotNone(view._view)
+
+        polb[1] = kval + 1
+        t_in[0] = 1e-6
+        self.assertIsNone(view._view)
+        self.assertEqual(view[9].K, kval + 1)
+        self.assertEqual(view[9].t_in[0], 1e-6)
+        self.assertEqual(self.the_ring[329].K, kval)
+        self.assertEqual(self.the_ring[329].t_in[0], 0)
+
+        view = self.the_ring[:]
+        self.the_ring.trackcpp_acc = trackcpp.Accelerator()
+        self.assertIsNone(view._view)
+        self.assertEqual(view[329].K, kval)
+
+    def test_copy_on_write_inplace_operations(self):
+        kval = self.the_ring[329].K
+        view = self.the_ring[:]
+        version = self.the_ring.version
+        polb = self.the_ring[329].polynom_b
+        polb *= 2
+        self.assertGreater(self.the_ring.version, version)
+        self.assertAlmostEqual(self.the_ring[329].K, 2*kval)
+        self.assertAlmostEqual(view[329].K, kval)
+
+        view = self.the_ring[:]
+        sval = self.the_ring[329].polynom_b[2]
+        pyaccel.lattice.add_error_multipoles(
+            self.the_ring, [329], 0.012, 2, Bn_norm=[0, 0, 1e-3])
+        self.assertNotEqual(self.the_ring[329].polynom_b[2], sval)
+        self.assertEqual(view[329].polynom_b[2], sval)
+
+        view = self.the_ring[:]
+        mat = self.the_ring[329].matrix66
+        mat *= 2
+        self.assertEqual(self.the_ring[329].matrix66[0, 0], 2)
+        self.assertEqual(view[329].matrix66[0, 0], 1)
+
+    def test_iteration(self):
+        eles = list(self.the_ring)
+        self.assertEqual(len(eles), len(self.the_ring))
+        self.assertAlmostEqual(sum(ele.length for ele in eles), 518.396)
+        eles[329].fam_name = 'test'
+        self.assertEqual(self.the_ring[329].fam_name, 'test')
+        self.assertRaises(AttributeError, setattr, eles[0], 'foo', 1)
+
+    def test_pickle(self):
+        self.the_ring[329].K += 0.1
+        data = pickle.dumps(self.the_ring)
+        self.assertEqual(pickle.dumps(self.the_ring), data)
+        self.assertIs(
+            self.the_ring.__getstate__(), self.the_ring.__getstate__())
+        acc = pickle.loads(data)
+        self.assertEqual(acc, self.the_ring)
+        self.assertEqual(acc.energy, self.the_ring.energy)
+        self.assertAlmostEqual(acc.brho, self.the_ring.brho)
+
+        self.the_ring[329].K += 0.1
+        self.assertNotEqual(pickle.loads(pickle.dumps(self.the_ring)), acc)
+
     def add_the_ring_and_value(self, value):
         return self.the_ring + value
 
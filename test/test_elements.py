@@ -166,6 +166,34 @@ class TestTrackCppElement(unittest.TestCase):
         cpp_value = trackcpp.c_array_get(self.trackcpp_element.r_out, 2*6 + 5)
         self.assertAlmostEqual(cpp_value, value)
 
+    def test_polynom_b(self):
+        value = -1.2345
+        self.element.polynom_b[1] = value
+        self.assertAlmostEqual(self.trackcpp_element.polynom_b[1], value)
+        self.element.polynom_b = [1.0, 2.0, 3.0, 4.0]
+        self.assertEqual(list(self.trackcpp_element.polynom_b), [1, 2, 3, 4])
+        self.element.polynom_b *= 2
+        self.assertEqual(list(self.trackcpp_element.polynom_b), [2, 4, 6, 8])
+
+        polynom = self.element.polynom_b
+        self.assertIs(polynom == self.element.polynom_b, True)
+        polynom[0] = value
+        self.assertIs(polynom == self.element.polynom_b, True)
+        polynom += 1
+        self.assertAlmostEqual(self.trackcpp_element.polynom_b[3], 9)
+        self.element.polynom_b = [0.0, 1.0]
+        self.assertIs(polynom == self.element.polynom_b, False)
+        self.assertEqual(list(polynom[1:]), [5, 7, 9])
+
+    def test_matrix66(self):
+        value = -1.2345
+        self.element.matrix66[1, 0] = value
+        self.assertAlmostEqual(self.trackcpp_element.matrix66[1][0], value)
+        self.element.matrix66 = 2*numpy.eye(6)
+        self.assertAlmostEqual(self.trackcpp_element.matrix66[5][5], 2.0)
+        self.element.KyL = value
+        self.assertAlmostEqual(self.trackcpp_element.matrix66[3][2], -value)
+
 
 class TestCreationFunctions(unittest.TestCase):
 
@@ -0,0 +1,77 @@
+
+import unittest
+import numpy
+import pyaccel
+import models
+
+
+def _get_misalignments(accelerator):
+    indices = pyaccel.lattice.find_indices(accelerator, 'fam_name', 'qfa')
+    return {
+        'dx': pyaccel.lattice.get_error_misalignment_x(accelerator, indices),
+        'length': accelerator.length}
+
+
+def _raise_error(accelerator):
+    raise ValueError('no model of ' + str(len(accelerator)) + ' elements')
+
+
+class TestErrorEnsemble(unittest.TestCase):
+
+    def setUp(self):
+        self.the_ring = models.create_accelerator()
+        self.indices = pyaccel.lattice.find_indices(
+            self.the_ring, 'fam_name', 'qfa')
+        self.ensemble = pyaccel.ensemble.ErrorEnsemble(self.the_ring, 5)
+
+    def test_add_errors(self):
+        values = self.ensemble.add_errors(
+            'misalignment_x', self.indices, 1e-4, cutoff=1)
+        self.assertEqual(values.shape, (5, len(self.indices)))
+        self.assertLessEqual(numpy.abs(values).max(), 1e-4)
+        self.assertRaises(
+            pyaccel.ensemble.EnsembleException,
+            self.ensemble.add_errors, 'misalignment_z', self.indices, 1e-4)
+
+    def test_get_seed(self):
+        values = self.ensemble.add_errors(
+            'misalignment_x', self.indices, 1e-4)
+        acc = self.ensemble.get_seed(2)
+        numpy.testing.assert_allclose(
+            pyaccel.lattice.get_error_misalignment_x(acc, self.indices),
+            values[2])
+        self.assertTrue(numpy.all(
+            pyaccel.lattice.get_error_misalignment_x(
+                self.the_ring, self.indices) == 0))
+
+    def test_evaluate(self):
+        values = self.ensemble.add_errors(
+            'misalignment_x', self.indices, 1e-4)
+        results, failed = self.ensemble.evaluate(
+            _get_misalignments, nr_procs=1)
+        self.assertFalse(failed.any())
+        numpy.testing.assert_allclose(results['dx'], values)
+        self.assertEqual(results['length'].shape, (5, ))
+
+        results, failed = self.ensemble.evaluate(
+            _get_misalignments, seeds=[1, 3], nr_procs=1)
+        numpy.testing.assert_allclose(results['dx'], values[[1, 3]])
+
+    def test_evaluate_failures(self):
+        with self.assertWarnsRegex(UserWarning, 'seed 3 failed') as warn:
+            results, failed = self.ensemble.evaluate(
+                _raise_error, seeds=[1, 3], nr_procs=1)
+        self.assertIn('ValueError: no model of', str(warn.warning))
+        self.assertTrue(failed.all())
+        self.assertTrue(numpy.isnan(results).all())
+
+
+def ensemble_suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestErrorEnsemble)
+    return suite
+
+
+def get_suite():
+    suite_list = []
+    suite_list.append(ensemble_suite())
+    return unittest.TestSuite(suite_list)
@@ -56,6 +56,38 @@ class TestLattice(unittest.TestCase):
         self.assertEqual(len(lattice), len(self.the_ring))
         self.assertEqual(lattice[0].fam_name, fam_name)
 
+    def test_insert_markers_at_positions(self):
+        spos = pyaccel.lattice.find_spos(self.the_ring)
+        positions = [spos[329] + 1e-3, 3.45, spos[20], 1000.0]
+        names = ['m1', 'm2', 'm3', 'm4']
+        acc = pyaccel.lattice.insert_markers_at_positions(
+            self.the_ring, positions, names)
+        self.assertAlmostEqual(acc.length, self.the_ring.length)
+        self.assertEqual(acc[-1].fam_name, 'm4')
+        new_spos = pyaccel.lattice.find_spos(acc)
+        for pos, name in zip(positions[:3], names):
+            idx = pyaccel.lattice.find_indices(acc, 'fam_name', name)
+            self.assertEqual(len(idx), 1)
+            self.assertAlmostEqual(new_spos[idx[0]], pos)
+
+    def test_refine_lattice(self):
+        acc, old2new, new2old = pyaccel.lattice.refine_lattice(
+            self.the_ring, max_length=0.1, return_index_maps=True)
+        self.assertAlmostEqual(acc.length, self.the_ring.length)
+        self.assertEqual(len(old2new), len(self.the_ring) + 1)
+        self.assertEqual(old2new[-1], len(acc))
+        self.assertEqual(len(new2old), len(acc))
+        lengths = pyaccel.lattice.get_attribute(acc, 'length')
+        self.assertLessEqual(max(lengths), 0.1 + 1e-12)
+        spos = pyaccel.lattice.find_spos(self.the_ring)
+        new_spos = pyaccel.lattice.find_spos(acc)
+        numpy.testing.assert_allclose(new_spos[old2new[:-1]], spos)
+        for idx in (1, 329, 3278):
+            self.assertEqual(
+                acc[old2new[idx]].fam_name, self.the_ring[idx].fam_name)
+            segs = new2old[old2new[idx]:old2new[idx+1]]
+            self.assertTrue((segs == idx).all())
+
     def test_find_indices(self):
         indices_bc = pyaccel.lattice.find_indices(self.the_ring, 'polynom_b', [0, -0.0001586, -28.62886])
         for i in indices_bc:
@@ -66,6 +98,24 @@ class TestLattice(unittest.TestCase):
         for i in range(len(mia)):
             self.assertEqual(indices_mia[i], mia[i])
 
+    def test_query(self):
+        spos = self.the_ring.spos
+        indices = pyaccel.lattice.query(
+            self.the_ring, fam_name='q[fd]a', K=(0, None), spos=(10, 200))
+        expected = [
+            i for i, ele in enumerate(self.the_ring)
+            if ele.fam_name in ('qfa', 'qda') and ele.K >= 0 and
+            10 <= spos[i] <= 200]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(indices.tolist(), expected)
+
+        indices = pyaccel.lattice.query(self.the_ring, fam_name=['mia'])
+        self.assertEqual(
+            indices.tolist(), self.the_ring.fam_index['mia'].tolist())
+        self.the_ring[0].fam_name = 'mia'
+        indices = pyaccel.lattice.query(self.the_ring, fam_name='mi.')
+        self.assertEqual(indices[0], 0)
+
     def test_get_attribute(self):
         length = pyaccel.lattice.get_attribute(self.the_ring, 'length')
         self.assertAlmostEqual(sum(length),518.396)
@@ -101,6 +151,220 @@ class TestLattice(unittest.TestCase):
         pyaccel.lattice.set_attribute(self.the_ring, 'r_in', 1, [numpy.zeros((6,6))])
         self.assertEqual(self.the_ring[1].r_in[0,0], 0)
 
+    def test_set_attribute_bulk(self):
+        idcs = [1, 2, 3]
+        pyaccel.lattice.set_attribute_bulk(
+            self.the_ring, 'hkick', idcs, [1e-3, 2e-3, 3e-3])
+        self.assertEqual(self.the_ring[2].hkick, 2e-3)
+
+        pyaccel.lattice.set_attribute_bulk(
+            self.the_ring, 't_in', idcs, 1e-4, m=0, increment=True)
+        pyaccel.lattice.set_attribute_bulk(
+            self.the_ring, 't_in', idcs, 1e-4, m=0, increment=True)
+        for idx in idcs:
+            self.assertAlmostEqual(self.the_ring[idx].t_in[0], 2e-4)
+
+        rot = numpy.eye(6)
+        rot[0, 2] = 0.5
+        pyaccel.lattice.set_attribute_bulk(self.the_ring, 'r_out', idcs, rot)
+        self.assertEqual(self.the_ring[3].r_out[0, 2], 0.5)
+
+    def test_errors_misalignment_x(self):
+        idcs = [[1, 2], [5, 6]]
+        pyaccel.lattice.set_error_misalignment_x(
+            self.the_ring, idcs, [1e-4, 2e-4])
+        pyaccel.lattice.add_error_misalignment_x(
+            self.the_ring, idcs, [1e-4, 1e-4])
+        errs = pyaccel.lattice.get_error_misalignment_x(self.the_ring, idcs)
+        numpy.testing.assert_allclose(
+            numpy.array(errs, dtype=float).ravel(), [2e-4, 2e-4, 3e-4, 3e-4])
+
+    def test_errors_duplicate_indices(self):
+        quad = int(self.the_ring.fam_index['qfa'][0])
+        dip = int(self.the_ring.fam_index['bc'][0])
+        ring = self.the_ring[:]
+        for idx in (quad, quad):
+            pyaccel.lattice.add_error_excitation_main(ring, idx, 0.1)
+            pyaccel.lattice.add_error_rotation_roll(ring, [idx, dip], 1e-3)
+        pyaccel.lattice.add_error_excitation_kdip(ring, dip, 0.1)
+        pyaccel.lattice.add_error_excitation_kdip(ring, dip, 0.1)
+
+        pyaccel.lattice.add_error_excitation_main(
+            self.the_ring, [quad, quad], 0.1)
+        pyaccel.lattice.add_error_rotation_roll(
+            self.the_ring, [quad, dip, quad, dip], 1e-3)
+        pyaccel.lattice.add_error_excitation_kdip(
+            self.the_ring, [dip, dip], 0.1)
+        for idx in (quad, dip):
+            numpy.testing.assert_allclose(
+                self.the_ring[idx].polynom_b, ring[idx].polynom_b)
+            numpy.testing.assert_allclose(
+                self.the_ring[idx].polynom_a, ring[idx].polynom_a,
+                atol=1e-15)
+            numpy.testing.assert_allclose(
+                self.the_ring[idx].r_in, ring[idx].r_in, atol=1e-15)
+
+    def test_errors_rotations_duplicate_indices(self):
+        quad = int(self.the_ring.fam_index['qfa'][0])
+        dip = int(self.the_ring.fam_index['bc'][0])
+        groups = [[quad, quad+1], [quad], [dip], [quad, quad+1], [dip]]
+        values = [1e-3, 2e-3, -1e-3, 5e-4, 3e-4]
+        lattice = pyaccel.lattice
+        pyaccel.lattice.add_error_misalignment_y(self.the_ring, quad, 1e-5)
+        pyaccel.lattice.add_error_misalignment_x(self.the_ring, quad, 2e-5)
+        tests = [
+            (lattice.set_error_rotation_roll, self._roll_reference, ()),
+            (lattice.add_error_rotation_roll, self._roll_reference, (True, )),
+            (lattice.set_error_rotation_pitch, self._rotation_reference,
+             (2, )),
+            (lattice.add_error_rotation_pitch, self._rotation_reference,
+             (2, True)),
+            (lattice.set_error_rotation_yaw, self._rotation_reference, (0, )),
+            (lattice.add_error_rotation_yaw, self._rotation_reference,
+             (0, True)),
+            ]
+        for func, reference, args in tests:
+            ring, ref = self.the_ring[:], self.the_ring[:]
+            func(ring, groups, values)
+            reference(ref, groups, values, *args)
+            for idx in (quad, quad+1, dip):
+                for attr in ('t_in', 't_out', 'r_in', 'r_out'):
+                    numpy.testing.assert_allclose(
+                        getattr(ring[idx], attr), getattr(ref[idx], attr),
+                        atol=1e-15)
+                numpy.testing.assert_allclose(
+                    ring[idx].polynom_a, ref[idx].polynom_a, atol=1e-15)
+                numpy.testing.assert_allclose(
+                    ring[idx].polynom_b, ref[idx].polynom_b, atol=1e-15)
+
+    @staticmethod
+    def _roll_reference(ring, groups, values, add=False):
+        for segs, val in zip(groups, values):
+            cos, sin = numpy.cos(val), numpy.sin(val)
+            rot = numpy.diag([cos, cos, cos, cos, 1.0, 1.0])
+            rot[0, 2], rot[1, 3], rot[2, 0], rot[3, 1] = sin, sin, -sin, -sin
+            for idx in segs:
+                ele = ring[idx]
+                if ele.angle != 0 and ele.length != 0:
+                    rho = ele.length / ele.angle
+                    orig_s = ele.polynom_a[0] * rho
+                    orig_c = ele.polynom_b[0] * rho + 1.0
+                    ele.polynom_a[0] = (orig_s*cos + orig_c*sin)/rho
+                    ele.polynom_b[0] = (orig_c*cos - orig_s*sin - 1.0)/rho
+                elif add:
+                    ele.r_in = numpy.dot(rot, ele.r_in)
+                    ele.r_out = numpy.dot(ele.r_out, rot.T)
+                else:
+                    ele.r_in = rot
+                    ele.r_out = rot.T
+
+    @staticmethod
+    def _rotation_reference(ring, groups, values, coord, add=False):
+        for segs, ang in zip(groups, values):
+            ang = -ang
+            hlen = sum(ring[idx].length for idx in segs)/2
+            first, last = ring[segs[0]], ring[segs[-1]]
+            if add:
+                old = first.t_in[coord+1]
+                path = -hlen*((ang+old)*(ang+old) - old*old)
+                first.t_in[coord] += -hlen*ang
+                first.t_in[coord+1] += ang
+                last.t_out[coord] += -hlen*ang
+                last.t_out[coord+1] += -ang
+                last.t_out[5] += path
+                continue
+            mis = (first.t_in[coord] - last.t_out[coord])/2
+            old = first.t_in[3-coord]
+            path = -hlen*(ang*ang + old*old)
+            first.t_in[coord] = -hlen*ang + mis
+            last.t_out[coord] = -hlen*ang - mis
+            first.t_in[coord+1] = ang
+            last.t_out[coord+1] = -ang
+            last.t_out[5] = path
+
+    def test_segment_groups(self):
+        acc = pyaccel.lattice.refine_lattice(
+            self.the_ring, max_length=0.1, fam_names=['bc'])
+        bc_idx = pyaccel.lattice.find_indices(acc, 'fam_name', 'bc')
+        segs = pyaccel.lattice.find_segment_groups(acc, 'bc')
+        self.assertEqual([i for seg in segs for i in seg], bc_idx)
+        self.assertLess(len(segs), len(bc_idx))
+        for gid, seg in zip(segs.group_ids, segs):
+            self.assertTrue(numpy.all(acc.segment_index[seg] == gid))
+        self.assertEqual(
+            pyaccel.lattice.get_segment_groups(acc, segs.group_ids), segs)
+
+        pyaccel.lattice.add_error_misalignment_x(acc, segs, 1e-5)
+        dx = pyaccel.lattice.get_error_misalignment_x(acc, bc_idx)
+        numpy.testing.assert_allclose(dx, 1e-5)
+
+    def test_segment_groups_adjacent_magnets(self):
+        drift = pyaccel.elements.drift('d', 1.0)
+        quad = pyaccel.elements.quadrupole('qf', 0.2, 1.0)
+        acc = pyaccel.accelerator.Accelerator(
+            energy=3e9, lattice=[drift, quad, quad, drift, quad])
+
+        # distinct magnets of one family with no element between them are
+        # taken as the segments of a single magnet:
+        segs = pyaccel.lattice.find_segment_groups(acc, 'qf')
+        self.assertEqual(list(segs), [[1, 2], [4]])
+        self.assertEqual(acc.segment_index.tolist(), [0, 1, 1, 2, 3])
+        pyaccel.lattice.add_error_rotation_pitch(acc, segs, 1e-3)
+        self.assertAlmostEqual(acc[1].t_in[2], 0.2*1e-3)
+        self.assertEqual(acc[2].t_in[2], 0)
+
+        # nested lists of indices keep them apart:
+        acc = pyaccel.accelerator.Accelerator(
+            energy=3e9, lattice=[drift, quad, quad, drift, quad])
+        pyaccel.lattice.add_error_rotation_pitch(acc, [[1], [2], [4]], 1e-3)
+        self.assertAlmostEqual(acc[1].t_in[2], 0.1*1e-3)
+        self.assertAlmostEqual(acc[2].t_in[2], 0.1*1e-3)
+
+    def test_knob(self):
+        bc_idx = pyaccel.lattice.find_indices(self.the_ring, 'fam_name', 'bc')
+        knob = pyaccel.lattice.Knob(self.the_ring, 'bc', 'K')
+        self.assertEqual(knob.indices.tolist(), bc_idx)
+        base = knob.value
+        self.assertEqual(len(base), knob.nr_groups)
+
+        knob.add(0.1)
+        numpy.testing.assert_allclose(knob.value, base + 0.1)
+        self.assertAlmostEqual(self.the_ring[bc_idx[0]].K, base[0] + 0.1)
+        snap = knob.snapshot()
+        knob.set(1.0)
+        self.assertEqual(self.the_ring[bc_idx[-1]].K, 1.0)
+        knob.restore(snap)
+        numpy.testing.assert_allclose(knob.value, base + 0.1)
+        knob.undo()
+        knob.undo()
+        self.assertEqual(self.the_ring[bc_idx[0]].K, 1.0)
+        knob.reset()
+        numpy.testing.assert_allclose(knob.value, base)
+
+        mia = pyaccel.lattice.Knob(self.the_ring, 'mia', 'hmax')
+        pyaccel.lattice.set_knobs([knob, mia], [0.1, 0.02], increment=True)
+        numpy.testing.assert_allclose(knob.value, base + 0.1)
+        mia.undo()
+        numpy.testing.assert_allclose(knob.value, base + 0.1)
+
+    def test_diff_apply_patch(self):
+        acc = self.the_ring[:]
+        patch = pyaccel.lattice.diff(self.the_ring, acc)
+        self.assertEqual(len(patch['indices']), 0)
+
+        acc[329].K += 0.1
+        acc[10].fam_name = 'test'
+        acc[20].polynom_b = [0, 0, 1, 2]
+        acc.cavity_on = True
+        patch = pyaccel.lattice.diff(self.the_ring, acc)
+        self.assertEqual(patch['indices'].tolist(), [10, 20, 329])
+        self.assertEqual(patch['parameters'], {'cavity_on': True})
+        self.assertEqual(patch['elements']['fam_name'][0].tolist(), [10])
+
+        pyaccel.lattice.apply_patch(self.the_ring, patch)
+        self.assertEqual(self.the_ring, acc)
+        self.assertTrue(self.the_ring.cavity_on)
+
     def test_find_dict(self):
         names_dict=pyaccel.lattice.find_dict(self.the_ring, 'fam_name')
         for key in names_dict.keys():
@@ -151,6 +415,44 @@ class TestFlatFile(unittest.TestCase):
         self.assertTrue((a[1].t_in == t).all())
         self.assertTrue((a[1].t_out == -t).all())
 
+    def test_read_flat_file_cache(self):
+        filename = os.path.join(self.test_dir, 'flatfile.txt')
+        pyaccel.lattice.clear_flat_file_cache()
+        a = pyaccel.lattice.read_flat_file(filename, cache=True)
+        self.assertEqual(a, self.a)
+        self.assertEqual(len(pyaccel.lattice._FLAT_FILE_CACHE), 1)
+        a = pyaccel.lattice.read_flat_file(filename, cache=True)
+        self.assertEqual(a, self.a)
+        self.assertAlmostEqual(a.energy, self.a.energy, 9)
+        pyaccel.lattice.clear_flat_file_cache()
+
+    def test_read_flat_file_elements(self):
+        filename = os.path.join(self.test_dir, 'flatfile.txt')
+        a, indices = pyaccel.lattice.read_flat_file_elements(
+            filename, fam_names=['l50', 'end'])
+        self.assertEqual(indices.tolist(), [1, 2])
+        self.assertEqual(a[0].fam_name, 'l50')
+        self.assertAlmostEqual(a[0].length, 0.5, 16)
+        self.assertEqual(a.harmonic_number, 864)
+        a, indices = pyaccel.lattice.read_flat_file_elements(
+            filename, indices=slice(0, 2))
+        self.assertEqual(indices.tolist(), [0, 1])
+        self.assertEqual(a, self.a[:2])
+
+    def test_read_write_binary(self):
+        t = numpy.array([1.0e-6, 2.0e-6, 3.0e-6, 4.0e-6, 5.0e-6, 6.0e-6])
+        self.a[1].t_in = t
+        self.a[2].polynom_b = [0.0, 1.0, 2.0, 3.0, 4.0]
+        filename = os.path.join(self.test_dir, 'flatfile2.npz')
+        pyaccel.lattice.write_binary(self.a, filename)
+        a = pyaccel.lattice.read_binary(filename)
+        os.remove(filename)
+
+        self.assertEqual(a, self.a)
+        self.assertEqual(a.energy, self.a.energy)
+        self.assertTrue((a[1].t_in == t).all())
+        self.assertEqual(list(a[2].polynom_b), [0.0, 1.0, 2.0, 3.0, 4.0])
+
 
 def lattice_suite():
     suite = unittest.TestLoader().loadTestsFromTestCase(TestLattice)
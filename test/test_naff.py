@@ -0,0 +1,118 @@
+
+"""."""
+
+import unittest
+import numpy
+
+import pyaccel
+
+
+class TestNaffNumpy(unittest.TestCase):
+
+    def setUp(self):
+        self.turns = numpy.arange(6*100 + 1)
+        self.tunes = numpy.array([0.2345, 0.1234567, 0.41])
+        self.signal = numpy.exp(
+            2j*numpy.pi*self.tunes[:, None]*self.turns[None, :])
+        self.signal += 0.1*numpy.exp(2j*numpy.pi*0.37*self.turns)
+
+    def test_complex_signal(self):
+        freqs, fourier = pyaccel.naff.naff_numpy(self.signal, nr_ff=2)
+        self.assertEqual(freqs.shape, (3, 2))
+        for i, tune in enumerate(self.tunes):
+            self.assertAlmostEqual(freqs[i, 0], tune, places=6)
+            self.assertAlmostEqual(freqs[i, 1], 0.37, places=5)
+            self.assertAlmostEqual(abs(fourier[i, 0]), 1.0, places=3)
+            self.assertAlmostEqual(abs(fourier[i, 1]), 0.1, places=3)
+
+    def test_real_signal(self):
+        signal = numpy.cos(
+            2*numpy.pi*self.tunes[:, None]*self.turns[None, :] + 0.3)
+        freqs, _ = pyaccel.naff.naff_numpy(signal, nr_ff=1)
+        for freq, tune in zip(freqs, self.tunes):
+            self.assertAlmostEqual(freq, tune, places=5)
+
+    def test_engines_agree(self):
+        freqs_np, _ = pyaccel.naff.naff_general(
+            self.signal, is_real=False, nr_ff=1, engine='numpy',
+            chunk_size=2)
+        freqs_cpp, _ = pyaccel.naff.naff_general(
+            self.signal, is_real=False, nr_ff=1, engine='trackcpp')
+        for freq_np, freq_cpp in zip(freqs_np, freqs_cpp):
+            self.assertAlmostEqual(freq_np, freq_cpp, places=6)
+
+    def test_parallel(self):
+        freqs, fourier = pyaccel.naff.naff_general(
+            self.signal, is_real=False, nr_ff=2)
+        freqs_par, fourier_par = pyaccel.naff.naff_general(
+            self.signal, is_real=False, nr_ff=2, chunk_size=2, parallel=2)
+        numpy.testing.assert_allclose(freqs_par, freqs)
+        numpy.testing.assert_allclose(fourier_par, fourier)
+
+    def test_empty_signal(self):
+        freqs, fourier = pyaccel.naff.naff_general(
+            numpy.zeros((0, 601)), nr_ff=2, parallel=2)
+        self.assertEqual(freqs.shape, (0, 2))
+        self.assertEqual(fourier.shape, (0, 2))
+
+
+class TestTuneTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.turns = numpy.arange(3000)
+
+    def track(self, signal, window_size, step, block_size=437):
+        tracker = pyaccel.naff.TuneTracker(window_size, step)
+        turns, tunes = [], []
+        for ini in range(0, signal.size, block_size):
+            trns, tns, *_ = tracker.update(signal[ini:ini+block_size])
+            turns.extend(trns)
+            tunes.extend(numpy.atleast_1d(tns))
+        self.assertEqual(turns, tracker.turns.tolist())
+        numpy.testing.assert_allclose(tunes, tracker.tunes)
+        return tracker
+
+    def test_windows(self):
+        signal = numpy.exp(2j*numpy.pi*0.21*self.turns)
+        tracker = self.track(signal, window_size=605, step=200)
+        self.assertEqual(tracker.window_size, 601)
+        nr_windows = (self.turns.size - 601)//200 + 1
+        self.assertEqual(tracker.turns.tolist(), list(range(0, 2201, 200)))
+        self.assertEqual(len(tracker.tunes), nr_windows)
+        numpy.testing.assert_allclose(tracker.tunes, 0.21, atol=1e-8)
+        numpy.testing.assert_allclose(tracker.amplitudes, 1.0, atol=1e-6)
+
+    def test_chirp(self):
+        tune0, rate = 0.21, 1e-6
+        signal = numpy.exp(
+            2j*numpy.pi*(tune0*self.turns + rate*self.turns**2/2))
+        tracker = self.track(signal, window_size=601, step=200)
+        # instantaneous tune at the center of each window:
+        tunes = tune0 + rate*(tracker.turns + 300)
+        numpy.testing.assert_allclose(tracker.tunes, tunes, atol=1e-8)
+
+    def test_tune_jump(self):
+        tunes = numpy.where(self.turns < 1500, 0.21, 0.23)
+        phase = 2*numpy.pi*numpy.r_[0, numpy.cumsum(tunes[:-1])]
+        tracker = self.track(numpy.exp(1j*phase), window_size=601, step=150)
+        before = tracker.turns + 601 <= 1500
+        after = tracker.turns >= 1500
+        numpy.testing.assert_allclose(tracker.tunes[before], 0.21, atol=1e-8)
+        numpy.testing.assert_allclose(tracker.tunes[after], 0.23, atol=1e-8)
+
+
+def naff_numpy_suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestNaffNumpy)
+    return suite
+
+
+def tune_tracker_suite():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestTuneTracker)
+    return suite
+
+
+def get_suite():
+    suite_list = []
+    suite_list.append(naff_numpy_suite())
+    suite_list.append(tune_tracker_suite())
+    return unittest.TestSuite(suite_list)
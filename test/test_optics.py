@@ -220,6 +220,66 @@ class TestOptics(unittest.TestCase):
         f = pyaccel.optics.get_revolution_frequency(self.accelerator)
         self.assertAlmostEqual(f, 1.0/1.7291829520280572e-06, 15)
 
+    def test_calc_twiss_symmetry(self):
+        self.accelerator.cavity_on = False
+        ring = 4*self.accelerator
+        twiss, m66 = pyaccel.optics.calc_twiss(ring, indices='closed')
+        twiss_s, m66_s = pyaccel.optics.calc_twiss(
+            ring, indices='closed', symmetry=4)
+        self.assertEqual(len(twiss_s), len(twiss))
+        numpy.testing.assert_allclose(twiss_s.spos, twiss.spos, atol=1e-9)
+        numpy.testing.assert_allclose(twiss_s.mux, twiss.mux, atol=1e-6)
+        numpy.testing.assert_allclose(twiss_s.betay, twiss.betay, rtol=1e-6)
+        numpy.testing.assert_allclose(m66_s, m66, atol=1e-6)
+
+        twiss, _ = pyaccel.optics.calc_twiss(
+            ring, indices='closed', energy_offset=0.01)
+        twiss_s, _ = pyaccel.optics.calc_twiss(
+            ring, indices='closed', energy_offset=0.01, symmetry=4)
+        numpy.testing.assert_allclose(twiss_s.dl, twiss.dl, atol=1e-9)
+
+    def test_calc_twiss_energy_offsets(self):
+        self.accelerator.cavity_on = False
+        energy_offsets = numpy.array([-0.01, 0.0, 0.01, 0.5])
+        twiss, m66 = pyaccel.optics.calc_twiss(
+            self.accelerator, energy_offset=energy_offsets, indices='closed')
+        self.assertEqual(twiss.shape, (4, len(self.accelerator)+1))
+        self.assertEqual(m66.shape, (4, 6, 6))
+        for i, delta in enumerate(energy_offsets[:3]):
+            twi, mat = pyaccel.optics.calc_twiss(
+                self.accelerator, energy_offset=delta, indices='closed')
+            numpy.testing.assert_allclose(twiss.betax[i], twi.betax, rtol=1e-6)
+            numpy.testing.assert_allclose(twiss.rx[i], twi.rx, atol=1e-9)
+            numpy.testing.assert_allclose(m66[i], mat, atol=1e-8)
+        self.assertTrue(numpy.all(numpy.isnan(twiss.betax[3])))
+        self.assertTrue(numpy.all(numpy.isnan(m66[3])))
+
+        twiss_par, _ = pyaccel.optics.calc_twiss(
+            self.accelerator, energy_offset=energy_offsets, indices='closed',
+            parallel=2)
+        numpy.testing.assert_allclose(
+            twiss_par.betax, twiss.betax, rtol=1e-6)
+
+    def test_incremental_optics(self):
+        self.accelerator.cavity_on = False
+        optics = pyaccel.optics.IncrementalOptics(self.accelerator)
+        twiss, m66 = pyaccel.optics.calc_twiss(self.accelerator)
+        numpy.testing.assert_allclose(optics.m66, m66, atol=1e-8)
+
+        qfa = self.accelerator.fam_index['qfa']
+        kval = 1.01*self.accelerator[qfa[0]].K
+        pyaccel.lattice.set_attribute_bulk(
+            self.accelerator, 'polynom_b', qfa, kval, m=1)
+        optics.update(qfa)
+        twiss, m66 = pyaccel.optics.calc_twiss(self.accelerator)
+        twiss_inc = optics.calc_twiss()
+        numpy.testing.assert_allclose(optics.m66, m66, atol=1e-8)
+        numpy.testing.assert_allclose(twiss_inc.betax, twiss.betax, rtol=1e-6)
+        numpy.testing.assert_allclose(twiss_inc.muy, twiss.muy, atol=1e-6)
+        numpy.testing.assert_allclose(twiss_inc.etax, twiss.etax, atol=1e-8)
+        tunes = pyaccel.optics.get_frac_tunes(self.accelerator, dim='4D')
+        numpy.testing.assert_allclose(optics.tunes, tunes[:2], atol=1e-8)
+
     def test_get_frac_tunes(self):
         self.accelerator.cavity_on = True
         self.accelerator.radiation_on = False